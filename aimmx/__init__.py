@@ -1,3 +1,3 @@
-from .aimmx import AIMMX
+from .aimmx import AIMMX, warmup
 
-__all__ = ["AIMMX"]
+__all__ = ["AIMMX", "warmup"]
@@ -1,32 +1,216 @@
-from github3 import login, GitHubEnterprise, exceptions
-
-from .util.gh_utils import merge_metadata, get_all_files_from_folder, get_blob_link, get_tree_link, get_file_from_repo, is_binary_ext
-from .util.special_file_detector import detect_special_files, is_special_file
+from .util.gh_utils import merge_metadata, get_blob_link, get_tree_link, is_binary_ext
+from .util.contributor_resolver import ContributorResolver
+from .util.repo_snapshot import RepoSnapshot
+from .util.archive_snapshot import ArchiveSnapshot
+from .util.bulk import imap_completed, skip_repeated, Checkpoint, DEFAULT_MAX_WORKERS
+from .util.special_file_detector import detect_special_files, is_special_file, special_files_fingerprint
+from .util.stage_cache import StageCache, StageRun
+from .util.instrumentation import Tracer, tracing, span, run_in_context
 from .util.readme_cleanup import readme_cleanup
-from .readme_parsers import readme_parse, readme_parse_text, get_readme_contents, get_readme_contents_from_path, is_readme_file, get_readme_contents_from_docstring
-from .framework_detector.framework_detector import repo_framework
-from .framework_detector.framework_extractor import extract_framework
-from .dataset_detector.dataset_detector import detect_datasets_list
-from .domain_inference.domain_inference import domain_inference
-from .is_ai_inference.is_ai_inference import is_ai_inference
+from .readme_parsers import readme_parse_text, is_readme_file, get_docstring
+from .framework_detector.framework_extractor import extract_framework, frameworks_from_imports
+from .framework_detector.clone import DEFAULT_MAX_FILE_SIZE, DEFAULT_MAX_TOTAL_SIZE
+from .dataset_detector.dataset_detector import detect_datasets_list, dataset_list_fingerprint
+from .domain_inference.domain_inference import domain_inference, models_fingerprint, warmup as warmup_domain_inference
+from .is_ai_inference.is_ai_inference import is_ai_inference, warmup as warmup_is_ai_inference
 from .util.caffe2_utils import value_json_to_schema
+from .reference_detector.arxiv_reader import configure_arxiv_cache
+from .framework_detector import framework_util
+import hashlib
 import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# stages of repo_parse that are skipped when none of the requested fields need them
+STAGES = ["files", "contributors", "topics", "license", "readme", "references",
+    "special_files", "domain", "datasets", "frameworks"]
+
+# stages whose outputs are inputs of other stages
+STAGE_DEPENDENCIES = {
+    "references": ["readme"],
+    # domain inference and abstract dataset detection also run on reference abstracts
+    "domain": ["readme", "references"],
+    "datasets": ["readme", "references"],
+}
+
+# fields of the result (top level keys or dotted paths) and the stages producing them,
+# a field not listed here is resolved by its longest listed prefix
+FIELD_STAGES = {
+    "name": ["readme"],
+    "description": [],
+    "visibility": ["license"],
+    "visibility.visibility": [],
+    "definition": ["files", "license", "readme", "special_files", "frameworks"],
+    "definition.code": ["files", "license", "readme", "frameworks"],
+    "trained_model": ["files", "readme", "special_files"],
+    "training": ["readme", "special_files", "datasets"],
+    "training.datasets": ["readme", "datasets"],
+    "training.hyperparameters": ["special_files"],
+    "training.features": ["special_files"],
+    "authors": ["contributors", "readme"],
+    "tags": ["topics"],
+    "references": ["references"],
+    "references_truncated": ["references"],
+    "evaluations": ["readme"],
+    "pipeline": ["special_files"],
+    "domain": ["domain"],
+    "extraction": ["readme", "frameworks"],
+    "extraction.frameworks": ["frameworks"],
+    "extraction.modules": ["frameworks"],
+}
+
+def resolve_stages(fields=None):
+    """ Returns the set of repo_parse stages needed to produce fields (all if None). """
+    if fields is None:
+        return set(STAGES)
+    stages = set()
+    for field in fields:
+        parts = field.split(".")
+        for i in range(len(parts), 0, -1):
+            prefix = ".".join(parts[:i])
+            if prefix in FIELD_STAGES:
+                stages.update(FIELD_STAGES[prefix])
+                break
+        else:
+            raise ValueError("Unknown field: {}".format(field))
+    to_check = list(stages)
+    while to_check:
+        for dependency in STAGE_DEPENDENCIES.get(to_check.pop(), []):
+            if dependency not in stages:
+                stages.add(dependency)
+                to_check.append(dependency)
+    return stages
+
+# keeps only the given (dotted) fields of result, lists are projected element-wise
+def project_fields(result, fields):
+    projected = {}
+    for field in fields:
+        _project_path(result, projected, field.split("."))
+    return projected
+
+def _project_path(source, target, path):
+    key = path[0]
+    if key not in source:
+        return
+    value = source[key]
+    if len(path) == 1:
+        target[key] = value
+    elif isinstance(value, dict):
+        _project_path(value, target.setdefault(key, {}), path[1:])
+    elif isinstance(value, list):
+        if key not in target:
+            target[key] = [{} if isinstance(v, dict) else v for v in value]
+        for v, t in zip(value, target[key]):
+            if isinstance(v, dict):
+                _project_path(v, t, path[1:])
+
+# versions of the incremental stages, bump one when the stage gives another output
+# for the same inputs so that the outputs kept by incremental extraction are recomputed
+STAGE_VERSIONS = {
+    "readme": 1,
+    "folder_readme": 1,
+    "docstring": 1,
+    "special_files": 1,
+    "domain": 1,
+    "frameworks": 1,
+}
+
+# stages parsing a README, their datasets are matched against the dataset list
+README_STAGES = ("readme", "folder_readme", "docstring")
+
+def stage_salt(stage):
+    """ Returns what the output of an incremental stage depends on besides its inputs:
+    the stage version, and the models, dataset list or framework list it uses. """
+    salt = [STAGE_VERSIONS.get(stage, 0)]
+    if stage in README_STAGES:
+        salt.append(dataset_list_fingerprint())
+    elif stage == "domain":
+        salt.append(models_fingerprint())
+    elif stage == "frameworks":
+        libraries = json.dumps(sorted(framework_util.libraries.items()))
+        salt.append(hashlib.sha1(libraries.encode("utf-8")).hexdigest())
+    return salt
+
+def warmup():
+    """ Loads the inference models up front instead of on the first extraction. """
+    warmup_domain_inference()
+    warmup_is_ai_inference()
 
 # aimmx client class
 class AIMMX:
     """ Client for AIMMX."""
 
-    def __init__(self, public_gh_token, enterprise_gh_creds=None):
+    def __init__(self, public_gh_token, enterprise_gh_creds=None, cache=None, contributor_resolver=None,
+        arxiv_cache=None, clone_options=None, incremental=False, timeout=None, on_span=None, archive=False,
+        reference_time_budget=None):
         """
-
+        public_gh_token: GitHub token, or a list of tokens (or a TokenPool) to spread the
+        requests over, each request uses the token with the most rate limit budget left
+        cache: optional store for immutable GitHub objects (blobs and trees) keyed
+        by SHA, any object with get(key, default) and set(key, value) such as
+        aimmx.util.sqlite_cache.SqliteCache. Other GitHub responses are also kept in
+        it and revalidated with conditional requests (ETag / Last-Modified), so it
+        should be bounded, e.g. SqliteCache(path, max_bytes=...)
+        contributor_resolver: ContributorResolver used to look up authors, configures
+        the top-N contributor cap, user cache TTL and lookup concurrency
+        arxiv_cache: path to a SQLite file (or a cache object) to keep arXiv records in,
+        applies to the whole process, see configure_arxiv_cache
+        clone_options: dict of options for the framework extraction clone, e.g.
+        {"tmp_dir": "/dev/shm", "max_file_size": ..., "max_total_size": ...}
+        incremental: keep the output of each stage in cache with the fingerprint of its
+        inputs (README blob SHA, special file SHAs, HEAD SHA for the clone) and only
+        rerun a stage on the next extraction of the same URL if they changed
+        timeout: connect and read timeout in seconds of the GitHub requests
+        on_span: callback called with each finished aimmx.util.instrumentation.Span
+        (stage name, wall and CPU time) of the extractions
+        archive: read the files of each repository from its tarball, downloaded once and
+        streamed through in a single pass, instead of listing the tree and fetching
+        files with the API and cloning it for framework extraction
+        reference_time_budget: seconds the reference patterns may spend on a README,
+        for predictable latency in bulk runs (no limit by default). A result cut short
+        has "references_truncated": True and is not kept by incremental extraction
         """
+        # github3 is imported here rather than at module level to keep `import aimmx` fast
+        from github3 import login, GitHubEnterprise
         self._public_token = public_gh_token
-        self._gh = login(token=public_gh_token)
+        self._cache = cache
+        self._contributor_resolver = contributor_resolver or ContributorResolver()
+        self._clone_options = clone_options or {}
+        self._on_span = on_span
+        self._archive = archive
+        self._reference_time_budget = reference_time_budget
+        if incremental and cache is None:
+            raise ValueError("incremental extraction needs a cache")
+        self._stage_cache = StageCache(cache, salt=stage_salt) if incremental else None
+        if isinstance(arxiv_cache, str):
+            configure_arxiv_cache(path=arxiv_cache)
+        elif arxiv_cache is not None:
+            configure_arxiv_cache(cache=arxiv_cache)
+        if isinstance(public_gh_token, str):
+            self._gh = login(token=public_gh_token)
+        else:
+            from .util.token_pool import TokenPool, TokenPoolAuth
+            pool = public_gh_token
+            if not isinstance(pool, TokenPool):
+                pool = TokenPool(pool)
+            self._gh = login(token=pool.tokens[0])
+            self._gh.session.auth = TokenPoolAuth(pool)
+        self._gh_ent = None
         if enterprise_gh_creds:
             self._enterprise_login = enterprise_gh_creds[0]
             self._enterprise_token = enterprise_gh_creds[1]
             gh = GitHubEnterprise("https://github.ibm.com")
             self._gh_ent = gh.login(enterprise_gh_creds[0], password=enterprise_gh_creds[1])
+        for gh in (self._gh, self._gh_ent):
+            if timeout is not None and gh is not None:
+                gh.session.default_connect_timeout = timeout
+                gh.session.default_read_timeout = timeout
+        if cache is not None:
+            from .util.conditional_cache import enable_conditional_requests
+            enable_conditional_requests(self._gh.session, cache)
+            if self._gh_ent is not None:
+                enable_conditional_requests(self._gh_ent.session, cache)
 
     def is_ai(self, repo_url):
         if "github.ibm.com" in repo_url:
@@ -52,22 +236,52 @@ class AIMMX:
             if s[5] == "blob":
                 blob_path = s[7:]
 
+        snapshot = RepoSnapshot(repo, ref=branch, cache=self._cache)
+
         # Gets readme and does analysis
         readme_content = None
         # For single file case, treats docstring as the readme
         if blob_path:
-            readme_content = get_readme_contents_from_docstring(repo, files[0][2].sha)
+            code = snapshot.read("/".join(blob_path))
+            if code is not None:
+                readme_content = get_docstring(code)
+            tree_path = blob_path[:-1]
         # Subfolder case and also if single file does not contain docstring
-        if tree_path and (not blob_path or readme_content is None):
-            readme_content = get_readme_contents_from_path(repo, tree_path)
+        if tree_path and readme_content is None:
+            readme_content = snapshot.readme(tree_path)
         # if subfolder case does not find a README, try with repo-level README
         if readme_content is None:
-            readme_content = get_readme_contents(repo)
+            readme_content = snapshot.readme()
         plain_readme = readme_cleanup(readme_content)
         return is_ai_inference(plain_readme)
 
-    def repo_parse(self, repo_url):
+    def repo_parse(self, repo_url, fields=None, timings=False, archive_path=None):
+        """
+        fields: optional collection of result fields to extract, as top level keys or
+        dotted paths (e.g. {"domain", "training.datasets"}). Only the stages needed
+        for these fields are run and the result is limited to them.
+        timings: add the count, wall and CPU time of each stage to the result under
+        "timings"
+        archive_path: local .tar.gz of the repository (as downloaded from its tarball URL)
+        to read the files from, see the archive option of the client
+        """
+        if not timings and self._on_span is None:
+            # still traced if the caller made a tracer active
+            with span("repo_parse", url=repo_url):
+                return self._repo_parse(repo_url, fields, archive_path)
+
+        tracer = Tracer(self._on_span)
+        with tracing(tracer):
+            with span("repo_parse", url=repo_url):
+                result = self._repo_parse(repo_url, fields, archive_path)
+        if timings:
+            result["timings"] = tracer.summary()
+        return result
+
+    def _repo_parse(self, repo_url, fields, archive_path=None):
+        from github3 import exceptions
 
+        stages = resolve_stages(fields)
         result = {}
 
         if "github.ibm.com" in repo_url:
@@ -86,9 +300,10 @@ class AIMMX:
         s = repo_url.split("/")
         owner = s[3]
         repo_name = s[4]
-        repo = gh.repository(owner, repo_name)
+        with span("repository"):
+            repo = gh.repository(owner, repo_name)
 
-        print("Extracting AI model metadata from: ", repo)
+        logger.info("Extracting AI model metadata from: %s", repo)
 
         # check if the url given is a directory or single file
         branch = None
@@ -101,6 +316,23 @@ class AIMMX:
             if s[5] == "blob":
                 blob_path = s[7:]
 
+        # all the files and READMEs are read from the same commit, each at most once
+        if self._archive or archive_path is not None:
+            snapshot = ArchiveSnapshot(repo, ref=branch, cache=self._cache, path=archive_path,
+                keep_paths=["/".join(blob_path)] if blob_path else (),
+                max_file_size=self._clone_options.get("max_file_size", DEFAULT_MAX_FILE_SIZE),
+                max_total_size=self._clone_options.get("max_total_size", DEFAULT_MAX_TOTAL_SIZE))
+            # a single download for all the stages reading files
+            if stages & {"files", "readme", "special_files", "frameworks"}:
+                with span("archive"):
+                    snapshot.entries()
+        else:
+            snapshot = RepoSnapshot(repo, ref=branch, cache=self._cache)
+        if self._stage_cache is not None:
+            stage_run = self._stage_cache.begin(repo_url)
+        else:
+            stage_run = StageRun(None, None)
+
         # NOTE: need preview accept header for topics, may be brittle
         gh.session.headers["Accept"] = "application/vnd.github.mercy-preview+json"
 
@@ -122,16 +354,24 @@ class AIMMX:
 
 
         # Get all the files in the repo
+        files = []
         if not blob_path:
-            files = get_all_files_from_folder(repo, tree_path=tree_path)
+            if "files" in stages:
+                with span("listing"):
+                    files = snapshot.listing(tree_path)
         else:
-            # Single file case
-            f = (blob_path[-1], "file", repo.file_contents("/".join(blob_path)))
-            files = [f]
+            # Single file case, the file is also needed to read its docstring
+            if "files" in stages or "readme" in stages:
+                with span("listing"):
+                    entry = snapshot.entry("/".join(blob_path))
+                if entry is not None:
+                    files = [(blob_path[-1], "file", entry)]
             tree_path = blob_path[:-1]
         blob_link = get_blob_link(repo, tree_path=tree_path, branch_name=branch)
 
         for f in files:
+            if "files" not in stages:
+                break
             if is_special_file(f[0]):
                 continue
             if is_readme_file(f[0]):
@@ -150,7 +390,7 @@ class AIMMX:
                 code_meta["size"] = f[2].size
                 code_meta["connection"]["source"] = {"url": blob_link + "/" + f[0]}
             elif f[1] == "dir":
-                code_meta["num_files"] = len(f[2].tree)
+                code_meta["num_files"] = f[2].num_entries
                 code_meta["connection"]["source"] = {
                     "url": get_tree_link(repo, tree_path=tree_path, branch_name=branch) + "/" + f[0]
                 }
@@ -169,31 +409,25 @@ class AIMMX:
             # Caffe2 special case
             # NOTE: should later be refactored into a caffe2 specific portion
             if f[0] == "value_info.json":
-                schema_contents = f[2].decoded
+                schema_contents = snapshot.blob(f[2].sha).decode_content()
                 input_schema = value_json_to_schema(schema_contents)
                 if input_schema:
                     result["trained_model"]["input_data_schema"] = input_schema
 
-        for c in repo.contributors():
-            if "authors" not in result:
-                result["authors"] = []
-            user = gh.user(c.login)
-            author = {}
-            if (user.name and len(user.name) > 0):
-                author["name"] = user.name
-            else:
-                author["name"] = c.login
-            if (user.email and len(user.email) > 0):
-                author["email"] = user.email
-            author["github_id"] = c.login
-            result["authors"].append(author)
+        if "contributors" in stages:
+            with span("contributors"):
+                authors = self._contributor_resolver.resolve(gh, repo)
+            if len(authors) > 0:
+                result["authors"] = authors
 
         # Gets all the topics/tags in GitHub repo
-        topics = repo.topics()
-        if topics:
-            result["tags"] = []
-            for t in topics.names:
-                result["tags"].append(t)
+        if "topics" in stages:
+            with span("topics"):
+                topics = repo.topics()
+            if topics:
+                result["tags"] = []
+                for t in topics.names:
+                    result["tags"].append(t)
 
         repo_desc = None
         if repo.description:
@@ -210,21 +444,27 @@ class AIMMX:
 
         # Gets readme and does analysis
         readme_content = None
+        # blob SHA readme_content comes from, fingerprint of the stages using it
+        readme_sha = None
         # For single file case, treats docstring as the readme
-        if blob_path:
-            readme_content = get_readme_contents_from_docstring(repo, files[0][2].sha)
+        if "readme" in stages and blob_path and files:
+            with span("readme_fetch"):
+                readme_content = get_docstring(snapshot.blob(files[0][2].sha).decode_content())
+            readme_sha = files[0][2].sha
             if readme_content is not None:
                 extraction["readme"] = readme_content
                 extraction["readme_url"] = repo_url
         # Subfolder case and also if single file does not contain docstring
-        if tree_path and (not blob_path or readme_content is None):
-            readme_content = get_readme_contents_from_path(repo, tree_path)
+        if "readme" in stages and tree_path and (not blob_path or readme_content is None):
+            with span("readme_fetch"):
+                readme_content, readme_sha = self._read_readme(snapshot, tree_path)
             if readme_content is not None:
                 extraction["readme"] = readme_content
                 extraction["readme_url"] = repo_url
         # if subfolder case does not find a README, try with repo-level README
-        if readme_content is None:
-            readme_content = get_readme_contents(repo)
+        if "readme" in stages and readme_content is None:
+            with span("readme_fetch"):
+                readme_content, readme_sha = self._read_readme(snapshot)
             if readme_content is not None:
                 extraction["readme"] = readme_content
                 extraction["readme_url"] = "/".join(s[:5])
@@ -232,13 +472,16 @@ class AIMMX:
         result["extraction"] = [extraction]
 
         repo_license = None
-        try:
-            if repo.license():
-                repo_license = repo.license().license.name
-                result["visibility"]["license"] = repo_license
-                result["definition"]["code"][0]["license"] = repo_license
-        except exceptions.NotFoundError:
-            pass
+        if "license" in stages:
+            try:
+                with span("license"):
+                    license_content = repo.license()
+                if license_content:
+                    repo_license = license_content.license.name
+                    result["visibility"]["license"] = repo_license
+                    result["definition"]["code"][0]["license"] = repo_license
+            except exceptions.NotFoundError:
+                pass
 
         # outdated framework extraction
         # frameworks = repo_framework(repo)
@@ -253,22 +496,35 @@ class AIMMX:
         #         # NOTE: for now, framework is singular, change this later
         #         result["definition"]["code"][0]["framework"] = fw_insert
 
-        readme_info = readme_parse(repo, branch_name=branch, check_datasets=True)
-        readme_name = None
-        if "name" in readme_info:
-            readme_name = readme_info["name"]
-        result = merge_metadata(result, readme_info)
-
-        if tree_path:
-            readme_info = readme_parse(repo, branch_name=branch, tree_path=tree_path, check_datasets=True)
-            # special case for subfolders, if there's no other name, take it from the folder
-            if "name" not in readme_info:
-                readme_info["name"] = "/".join(tree_path)
-            result = merge_metadata(result, readme_info)
-
-        if blob_path:
-            readme_info = readme_parse_text(readme_content, blob_link, check_datasets=True)
-            result = merge_metadata(result, readme_info)
+        if "readme" in stages:
+            check_datasets = "datasets" in stages
+            check_references = "references" in stages
+            root_readme, root_sha = self._read_readme(snapshot)
+            if root_readme:
+                root_link = get_blob_link(repo, branch_name=branch)
+                readme_info = stage_run.run("readme", [root_sha, root_link, check_datasets, check_references],
+                    readme_parse_text, root_readme, root_link, check_datasets=check_datasets,
+                    check_references=check_references, reference_time_budget=self._reference_time_budget)
+                result = merge_metadata(result, readme_info)
+
+            if tree_path:
+                readme_info = {}
+                folder_readme, folder_sha = self._read_readme(snapshot, tree_path)
+                if folder_readme:
+                    readme_info = stage_run.run("folder_readme",
+                        [folder_sha, blob_link, check_datasets, check_references],
+                        readme_parse_text, folder_readme, blob_link, check_datasets=check_datasets,
+                        check_references=check_references, reference_time_budget=self._reference_time_budget)
+                # special case for subfolders, if there's no other name, take it from the folder
+                if "name" not in readme_info:
+                    readme_info["name"] = "/".join(tree_path)
+                result = merge_metadata(result, readme_info)
+
+            if blob_path and readme_content:
+                readme_info = stage_run.run("docstring", [readme_sha, blob_link, check_datasets, check_references],
+                    readme_parse_text, readme_content, blob_link, check_datasets=check_datasets,
+                    check_references=check_references, reference_time_budget=self._reference_time_budget)
+                result = merge_metadata(result, readme_info)
 
         # special case to add frameworks to code files
         if "definition" in result and "framework" in result["definition"]:
@@ -278,14 +534,14 @@ class AIMMX:
                 }
 
         # Special files check, doesn't make sense in single-file case
-        if not blob_path:
-            specialfiles = detect_special_files(repo, tree_path=tree_path)
+        if "special_files" in stages and not blob_path:
+            with span("special_files"):
+                specialfiles = stage_run.run("special_files", special_files_fingerprint(snapshot, tree_path),
+                    detect_special_files, repo, tree_path=tree_path, snapshot=snapshot)
             result = merge_metadata(result, specialfiles)
 
         # if README exists, attempt domain Inference and dataset detection
-        if readme_content:
-            plain_readme = readme_cleanup(readme_content)
-
+        if readme_content and ("domain" in stages or "datasets" in stages):
             abstracts = ""
             if "references" in result:
                 for r in result["references"]:
@@ -293,14 +549,25 @@ class AIMMX:
                         abstract = r["abstract"]
                         abstract = abstract.strip().replace("\n", " ")
                         abstracts +=  "\n{}".format(abstract)
-            if len(abstracts) > 0:
-                plain_readme += abstracts
 
-            domain = domain_inference(plain_readme)
-            result["domain"] = domain
+            if "domain" in stages:
+                def infer_domain():
+                    with span("readme_cleanup"):
+                        plain_readme = readme_cleanup(readme_content)
+                    if len(abstracts) > 0:
+                        plain_readme += abstracts
+                    with span("domain_inference"):
+                        return domain_inference(plain_readme)
+
+                abstracts_sha = hashlib.sha1(abstracts.encode("utf-8")).hexdigest()
+                domain = stage_run.run("domain", [readme_sha, abstracts_sha], infer_domain)
+                result["domain"] = domain
 
             # NOTE: currently only running on abstracts, should refactor to run on abstract + readme
-            abs_datasets = detect_datasets_list(abstracts)
+            abs_datasets = []
+            if "datasets" in stages:
+                with span("detect_datasets_list"):
+                    abs_datasets = detect_datasets_list(abstracts)
             if len(abs_datasets) > 0:
 
                 if "training" in result and "datasets" in result["training"]:
@@ -316,7 +583,26 @@ class AIMMX:
                     result["training"] = { "datasets": abs_datasets }
 
         # attempt to extract framework via cloning
-        framework_result = extract_framework(repo_url)
+        framework_result = {"success": False}
+        if "frameworks" in stages and isinstance(snapshot, ArchiveSnapshot):
+            # the imports were scanned while reading the archive
+            framework_result = stage_run.run("frameworks", [snapshot.sha], frameworks_from_imports,
+                snapshot.imports())
+        elif "frameworks" in stages:
+            clone_options = dict(self._clone_options)
+            # the clone is of the default branch, its listing in the snapshot has the
+            # file sizes so that large files can be skipped before downloading anything
+            # (unless it was truncated, listing every folder would cost more)
+            head_sha = None
+            if snapshot.ref == repo.default_branch:
+                if snapshot.complete:
+                    clone_options["entries"] = snapshot.entries().values()
+                head_sha = snapshot.sha
+            elif stage_run.enabled:
+                head_sha = RepoSnapshot(repo).sha
+            with span("extract_framework"):
+                framework_result = stage_run.run("frameworks", [head_sha], extract_framework, repo_url,
+                    **clone_options)
         if framework_result["success"]:
             if "frameworks" in framework_result:
                 result["extraction"][0]["frameworks"] = framework_result["frameworks"]
@@ -327,4 +613,64 @@ class AIMMX:
                 if "code" in result["definition"]:
                     result["definition"]["code"][0]["modules"] = framework_result["modules"]
 
+        stage_run.save()
+        if fields is not None:
+            result = project_fields(result, fields)
         return result
+
+    # Returns the README of a folder (or of the repository) and its blob SHA
+    def _read_readme(self, snapshot, tree_path=None):
+        path = snapshot.readme_path(tree_path)
+        if path is None:
+            return None, None
+        return snapshot.read(path), snapshot.entry(path).sha
+
+    def repo_parse_many(self, repo_urls, max_workers=DEFAULT_MAX_WORKERS, output_path=None,
+        checkpoint_path=None, fields=None, retry_errors=False, timeout=None):
+        """ Extracts many repositories concurrently, yielding records in completion order.
+
+        Each record is {"url": ..., "result": metadata} or {"url": ..., "error": message},
+        a failing repository does not stop the others. repo_urls can be a lazy iterator,
+        a URL repeated within the last DEFAULT_REPEAT_WINDOW distinct ones is skipped.
+        output_path: JSONL file the records are appended to as they complete
+        checkpoint_path: SQLite file of the extracted URLs (see Checkpoint), URLs already
+        in it are skipped so that an interrupted run resumes where it stopped. A record
+        can be written twice if the run stops between the two writes.
+        fields: passed to repo_parse
+        retry_errors: extract again the URLs that failed in an earlier run of the checkpoint
+        timeout: seconds an extraction may take, a repository still running after that gives
+        an error record (see imap_completed, its extraction finishes in the background)
+        """
+        checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+        output = open(output_path, mode="a") if output_path else None
+
+        def todo():
+            for url in skip_repeated(url.strip() for url in repo_urls):
+                if not url:
+                    continue
+                if checkpoint is not None:
+                    status = checkpoint.status(url)
+                    if status is not None and not (retry_errors and status == "error"):
+                        continue
+                yield url
+
+        try:
+            # spans of the worker threads go to the caller's tracer if there is one
+            parse = run_in_context(lambda u: self.repo_parse(u, fields=fields))
+            for url, result, error in imap_completed(parse,
+                todo(), max_workers=max_workers, timeout=timeout):
+                if error is None:
+                    record = {"url": url, "result": result}
+                else:
+                    record = {"url": url, "error": type(error).__name__ + ": " + str(error)}
+                if output is not None:
+                    output.write(json.dumps(record, default=str) + "\n")
+                    output.flush()
+                if checkpoint is not None:
+                    checkpoint.add(url, "ok" if error is None else "error")
+                yield record
+        finally:
+            if output is not None:
+                output.close()
+            if checkpoint is not None:
+                checkpoint.close()
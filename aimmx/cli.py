@@ -0,0 +1,172 @@
+"""
+    Command line bulk runner.
+
+    Reads repository URLs (one per line, or JSON objects with a "url" key) from
+    files or stdin and writes one JSON record per repository to stdout as the
+    extractions complete. Both sides are streamed, so it can sit in a pipe.
+
+    Usage: aimmx [options] [INPUT ...] > results.jsonl
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+TOKEN_ENV = "GITHUB_TOKEN"
+DEFAULT_CACHE_SIZE = 2048
+PROGRESS_INTERVAL = 10
+
+def read_urls(paths):
+    """ Lazily yields the URLs of the input files ("-" is stdin). """
+    for path in paths:
+        f = sys.stdin if path == "-" else open(path, mode="r")
+        try:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("{"):
+                    record = json.loads(line)
+                    url = record.get("url") or record.get("repo_url")
+                    if url:
+                        yield url
+                else:
+                    yield line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+class Progress:
+    """ Reports the number of finished repositories and the throughput on stderr. """
+
+    def __init__(self, stream=sys.stderr, interval=PROGRESS_INTERVAL):
+        self.stream = stream
+        self.interval = interval
+        self.done = 0
+        self.errors = 0
+        self.start = time.time()
+        self._last = self.start
+
+    def update(self, record):
+        self.done += 1
+        if "error" in record:
+            self.errors += 1
+        now = time.time()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.report()
+
+    def report(self):
+        elapsed = max(time.time() - self.start, 1e-9)
+        self.stream.write("[aimmx] {} done, {} errors, {:.1f} repos/min, {:.0f}s elapsed\n".format(
+            self.done, self.errors, 60 * self.done / elapsed, elapsed))
+        self.stream.flush()
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="aimmx",
+        description="Extracts AI model metadata from GitHub repositories, writing NDJSON records.")
+    parser.add_argument("inputs", nargs="*", default=["-"], metavar="INPUT",
+        help="files of URLs or JSONL records with a url key, - for stdin (default)")
+    parser.add_argument("-o", "--output", default="-",
+        help="NDJSON file to append the records to, - for stdout (default)")
+    parser.add_argument("-j", "--concurrency", type=int, default=8,
+        help="number of repositories extracted at a time (default 8)")
+    parser.add_argument("-f", "--fields", default=None,
+        help="comma separated fields to extract, e.g. domain,training.datasets (default all)")
+    parser.add_argument("-t", "--token", action="append", default=None,
+        help="GitHub token, can be repeated to use a pool of tokens (default $" + TOKEN_ENV +
+            ", comma separated)")
+    parser.add_argument("--cache-dir", default=None,
+        help="folder of the persistent GitHub and arXiv caches")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+        help="megabytes the GitHub cache is kept under, least recently used responses are dropped (default " +
+            str(DEFAULT_CACHE_SIZE) + ")")
+    parser.add_argument("--incremental", action="store_true",
+        help="only rerun the stages whose inputs changed since the last run (needs --cache-dir)")
+    parser.add_argument("--checkpoint", default=None,
+        help="SQLite file of the URLs already extracted, they are skipped when the run is restarted")
+    parser.add_argument("--retry-errors", action="store_true",
+        help="extract again the URLs of the checkpoint that failed")
+    parser.add_argument("--timeout", type=float, default=None,
+        help="seconds a repository may take, after which it gets an error record and the run goes on")
+    parser.add_argument("--request-timeout", type=float, default=None,
+        help="connect and read timeout of the GitHub requests, in seconds (default --timeout)")
+    parser.add_argument("--reference-time-budget", type=float, default=None,
+        help="seconds the reference patterns may spend on a README, results cut short get "
+            "references_truncated (default no limit)")
+    parser.add_argument("--clone-dir", default=None,
+        help="where repositories are cloned for framework extraction, e.g. /dev/shm")
+    parser.add_argument("--archive", action="store_true",
+        help="read the files of each repository from a single tarball download instead of the API and a clone")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress report")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    tokens = args.token
+    if not tokens and os.getenv(TOKEN_ENV):
+        tokens = [t.strip() for t in os.getenv(TOKEN_ENV).split(",") if t.strip()]
+    if not tokens:
+        sys.stderr.write("aimmx: a GitHub token is needed, use --token or $" + TOKEN_ENV + "\n")
+        return 2
+    if args.incremental and not args.cache_dir:
+        sys.stderr.write("aimmx: --incremental needs --cache-dir\n")
+        return 2
+
+    from .aimmx import AIMMX, resolve_stages
+    fields = None
+    if args.fields:
+        fields = [f.strip() for f in args.fields.split(",") if f.strip()]
+        try:
+            resolve_stages(fields)
+        except ValueError as e:
+            sys.stderr.write("aimmx: " + str(e) + "\n")
+            return 2
+
+    cache = None
+    arxiv_cache = None
+    if args.cache_dir:
+        from .util.sqlite_cache import SqliteCache
+        cache = SqliteCache(os.path.join(args.cache_dir, "github.db"), max_bytes=args.cache_size * 1024 * 1024)
+        arxiv_cache = os.path.join(args.cache_dir, "arxiv.db")
+    clone_options = {"tmp_dir": args.clone_dir} if args.clone_dir else None
+    # a request cannot usefully outlive the repository it is for
+    request_timeout = args.request_timeout if args.request_timeout is not None else args.timeout
+
+    client = AIMMX(tokens[0] if len(tokens) == 1 else tokens, cache=cache, arxiv_cache=arxiv_cache,
+        clone_options=clone_options, incremental=args.incremental, timeout=request_timeout, archive=args.archive,
+        reference_time_budget=args.reference_time_budget)
+
+    # warnings of the extraction go to stderr, stdout is kept for the records
+    logging.basicConfig(stream=sys.stderr, level=logging.WARNING, format="[aimmx] %(levelname)s %(name)s: %(message)s")
+    out = sys.stdout if args.output == "-" else open(args.output, mode="a")
+
+    progress = None if args.quiet else Progress()
+    try:
+        for record in client.repo_parse_many(read_urls(args.inputs), max_workers=args.concurrency,
+            checkpoint_path=args.checkpoint, fields=fields, retry_errors=args.retry_errors,
+            timeout=args.timeout):
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+            if progress is not None:
+                progress.update(record)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # the reader went away (e.g. piped into head), stop writing to it
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, out.fileno())
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if progress is not None:
+            progress.report()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
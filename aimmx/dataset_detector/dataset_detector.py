@@ -3,6 +3,8 @@
 """
 
 import re
+from functools import lru_cache
+from .dataset_matcher import DatasetMatcher
 try:
     import importlib.resources as pkg_resources
 except ImportError:
@@ -16,15 +18,16 @@ BOUNDRY_PATTERN = "(\s|\W)?"
 DATASET_LIST_PATH = "sota-datasets.csv"
 
 def detect_datasets_list(readme):
-    dataset_list = load_dataset_list()
-    list_datasets = find_dataset_from_list(readme, dataset_list)
+    dataset_matcher = get_dataset_matcher()
+    list_datasets = find_dataset_from_list(readme, dataset_matcher)
     return list_datasets
 
-def detect_datasets(readme, blob_link):
-    dataset_list = load_dataset_list()
+# index is the ReadmeIndex of readme if it was already built
+def detect_datasets(readme, blob_link, index=None):
+    dataset_matcher = get_dataset_matcher()
     datasets_found = []
-    link_datasets = get_dataset_links(readme, blob_link)
-    list_datasets = find_dataset_from_list(readme, dataset_list)
+    link_datasets = get_dataset_links(readme, blob_link, index)
+    list_datasets = find_dataset_from_list(readme, dataset_matcher)
     datasets_found += link_datasets
 
     # resolve possible duplicates between the two, prioritize link datasets
@@ -40,32 +43,49 @@ def detect_datasets(readme, blob_link):
     #print(datasets_found)
     return datasets_found
 
+# returns the dataset names in file order, without duplicates
 def load_dataset_list(dataset_list_path=DATASET_LIST_PATH):
-    datasets = set()
-    header = True
+    datasets = {}
     with pkg_resources.open_text("aimmx", dataset_list_path) as f:
         for line in f:
-            datasets.add(line.strip())
-    return datasets
+            dataset = line.strip()
+            if dataset:
+                datasets[dataset] = True
+    return list(datasets)
+
+# SHA-1 of the dataset list file, changes when datasets are added or removed
+@lru_cache(maxsize=None)
+def dataset_list_fingerprint(dataset_list_path=DATASET_LIST_PATH):
+    import hashlib
+    with pkg_resources.open_binary("aimmx", dataset_list_path) as f:
+        return hashlib.sha1(f.read()).hexdigest()
 
+# the matcher is built once per list and shared between calls and threads
+@lru_cache(maxsize=None)
+def get_dataset_matcher(dataset_list_path=DATASET_LIST_PATH):
+    return DatasetMatcher(load_dataset_list(dataset_list_path))
+
+# dataset_list is either a DatasetMatcher or an iterable of dataset names
 def find_dataset_from_list(readme, dataset_list):
+    if isinstance(dataset_list, DatasetMatcher):
+        dataset_matcher = dataset_list
+    else:
+        dataset_matcher = DatasetMatcher(dataset_list)
     datasets_found = []
-    for dataset in dataset_list:
-        boundry_re = re.compile("(\W|\A)" + dataset.lower() + "(\W|\Z)", re.M)
-        #print(boundry_re)
-        #print(boundry_re.search(readme.lower()))
-        if boundry_re.search(readme.lower()):
-            d = {
-                "name": dataset
-            }
-            datasets_found.append(d)
+    for dataset in dataset_matcher.find(readme):
+        d = {
+            "name": dataset
+        }
+        datasets_found.append(d)
     return datasets_found
 
-def get_dataset_links(readme, blob_link):
-    link_re = re.compile(LINK_PATTERN)
-
+def get_dataset_links(readme, blob_link, index=None):
     # extract out links and look for "dataset or data set" and an actual link
-    matches = link_re.findall(readme)
+    if index is not None:
+        matches = [(link.text, link.url) for link in index.links]
+    else:
+        link_re = re.compile(LINK_PATTERN)
+        matches = link_re.findall(readme)
     datasets = []
     if (matches and len(matches) > 0):
         for m in matches:
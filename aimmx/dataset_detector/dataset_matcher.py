@@ -0,0 +1,99 @@
+"""
+    Aho-Corasick automaton that matches a list of dataset names against text
+    in a single pass, regardless of the number of names.
+"""
+
+class DatasetMatcher:
+    """ Case insensitive multi-name matcher with word boundary semantics.
+
+    A name only matches when it is not directly preceded or followed by a word
+    character, the same as the regex (\\W|\\A)name(\\W|\\Z). Names are matched
+    literally. The automaton is read-only once built and can be shared across
+    calls and threads.
+    """
+
+    def __init__(self, names):
+        self.names = []
+        self._lengths = []
+        # trie transitions, failure links and names (indices) ending at each node
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        seen = set()
+        for name in names:
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            key = name.lower()
+            node = 0
+            for c in key:
+                nxt = self._goto[node].get(c)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][c] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = nxt
+            self._out[node] += (len(self.names),)
+            self.names.append(name)
+            self._lengths.append(len(key))
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for c, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and c not in goto[f]:
+                    f = fail[f]
+                fail_node = goto[f].get(c, 0)
+                fail[nxt] = fail_node
+                if out[fail_node]:
+                    out[nxt] = out[nxt] + out[fail_node]
+
+    def __len__(self):
+        return len(self.names)
+
+    def find(self, text):
+        """ Returns the names found in text, in the order they were given. """
+        text = text.lower()
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        lengths = self._lengths
+        text_len = len(text)
+
+        found = set()
+        node = 0
+        for i, c in enumerate(text):
+            while node and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            if not out[node]:
+                continue
+            # end boundary is shared by every name ending here
+            if i + 1 < text_len and _is_word_char(text[i + 1]):
+                continue
+            for name_index in out[node]:
+                if name_index in found:
+                    continue
+                start = i + 1 - lengths[name_index]
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                found.add(name_index)
+
+        return [self.names[i] for i in sorted(found)]
+
+# same definition of a word character as \w in re
+def _is_word_char(c):
+    return c.isalnum() or c == "_"
@@ -0,0 +1,281 @@
+"""
+    Compact on-disk format of the domain and task models, read with mmap so
+    that the worker processes of a node share the pages of the arrays instead
+    of each unpickling its own copy of the pipelines.
+
+    A model directory holds a manifest.json and NumPy .npy files: for each
+    distinct featurization (CountVectorizer and TfidfTransformer) a hash table
+    of the vocabulary and the idf vector, for each pipeline the coefficients of
+    its LinearSVC and the sigmoid parameters of its calibration. Inference only
+    needs NumPy and gives the predict_proba of the original pipelines.
+
+    Usage: python -m aimmx.domain_inference.compact_models [OUTPUT_DIR]
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import unicodedata
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+class CompactFeaturizer:
+    """ CountVectorizer and TfidfTransformer (l2 norm) of a compact model directory.
+
+    The vocabulary is a table of 64-bit term hashes sorted for binary search, with
+    the UTF-8 terms to rule out collisions and the column of each term.
+    """
+
+    def __init__(self, directory, prefix, params):
+        import numpy as np
+        self.params = params
+        self.token_re = re.compile(params["token_pattern"])
+        self.hashes = np.load(os.path.join(directory, prefix + "-vocab_hashes.npy"), mmap_mode="r")
+        self.columns = np.load(os.path.join(directory, prefix + "-vocab_columns.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, prefix + "-vocab_offsets.npy"), mmap_mode="r")
+        self.terms = np.load(os.path.join(directory, prefix + "-vocab_terms.npy"), mmap_mode="r")
+        self.idf = np.load(os.path.join(directory, prefix + "-idf.npy"), mmap_mode="r")
+
+    def lookup(self, terms):
+        """ Returns the feature column of each of terms, -1 if not in the vocabulary. """
+        import numpy as np
+        encoded = [term.encode("utf-8") for term in terms]
+        hashes = np.array([term_hash(e) for e in encoded], dtype=np.uint64)
+        starts = np.searchsorted(self.hashes, hashes)
+        columns = np.full(len(terms), -1, dtype=np.int64)
+        for j, i in enumerate(starts.tolist()):
+            # terms with the same hash are next to each other
+            while i < len(self.hashes) and self.hashes[i] == hashes[j]:
+                if self.terms[self.offsets[i]:self.offsets[i + 1]].tobytes() == encoded[j]:
+                    columns[j] = self.columns[i]
+                    break
+                i += 1
+        return columns
+
+    def transform(self, readmes):
+        """ Returns [(columns, tf-idf weights)] of readmes, one sparse row per readme. """
+        import numpy as np
+        rows = []
+        for readme in readmes:
+            counts = {}
+            for token in self.token_re.findall(self.preprocess(readme)):
+                counts[token] = counts.get(token, 0) + 1
+            columns = self.lookup(list(counts))
+            values = np.array(list(counts.values()), dtype=np.float64)
+            found = columns >= 0
+            columns = columns[found]
+            values = values[found]
+            if self.params["binary"]:
+                values = np.minimum(values, 1.0)
+            if self.params["sublinear_tf"]:
+                values = np.log(values) + 1
+            if self.params["use_idf"]:
+                values = values * self.idf[columns]
+            if self.params["norm"] == "l2" and len(values) > 0:
+                norm = np.sqrt(np.dot(values, values))
+                if norm > 0:
+                    values = values / norm
+            rows.append((columns, values))
+        return rows
+
+    def preprocess(self, readme):
+        if self.params["lowercase"]:
+            readme = readme.lower()
+        if self.params["strip_accents"] == "unicode":
+            readme = strip_accents_unicode(readme)
+        return readme
+
+class CompactPipeline:
+    """ A cv, tf, CalibratedClassifierCV(LinearSVC, method="sigmoid") pipeline read from
+    a compact model directory, predict_proba as the original. """
+
+    def __init__(self, directory, name, featurizer, classes):
+        import numpy as np
+        self.name = name
+        self.featurizer = featurizer
+        self.classes_ = np.array(classes)
+        # one entry per calibrated classifier (the first axis)
+        self.coef = np.load(os.path.join(directory, name + "-coef.npy"), mmap_mode="r")
+        self.intercept = np.load(os.path.join(directory, name + "-intercept.npy"), mmap_mode="r")
+        self.sigmoid_a = np.load(os.path.join(directory, name + "-sigmoid_a.npy"), mmap_mode="r")
+        self.sigmoid_b = np.load(os.path.join(directory, name + "-sigmoid_b.npy"), mmap_mode="r")
+        self.positions = np.load(os.path.join(directory, name + "-positions.npy"), mmap_mode="r")
+
+    def transform(self, readmes):
+        return self.featurizer.transform(readmes)
+
+    def predict_proba(self, readmes):
+        return self.predict_proba_features(self.transform(readmes))
+
+    def predict_proba_features(self, rows):
+        import numpy as np
+        n_classes = len(self.classes_)
+        mean_proba = np.zeros((len(rows), n_classes))
+        for c in range(self.coef.shape[0]):
+            # decision function of the LinearSVC, (documents, heads)
+            df = np.array([self.coef[c][:, columns].dot(values) for columns, values in rows])
+            df = df.reshape(len(rows), self.coef.shape[1]) + self.intercept[c]
+            proba = np.zeros((len(rows), n_classes))
+            for k in range(df.shape[1]):
+                position = self.positions[c][k]
+                proba[:, position] = 1.0 / (1.0 + np.exp(self.sigmoid_a[c][k] * df[:, k] + self.sigmoid_b[c][k]))
+            if n_classes == 2:
+                proba[:, 0] = 1.0 - proba[:, 1]
+            else:
+                total = proba.sum(axis=1)[:, np.newaxis]
+                proba = np.divide(proba, total, out=np.full_like(proba, 1.0 / n_classes), where=total != 0)
+            proba[(1.0 < proba) & (proba <= 1.0 + 1e-5)] = 1.0
+            mean_proba += proba
+        return mean_proba / self.coef.shape[0]
+
+class CompactLabelEncoder:
+    """ The classes of a LabelEncoder. """
+
+    def __init__(self, classes):
+        import numpy as np
+        self.classes_ = np.array(classes)
+
+    def inverse_transform(self, y):
+        import numpy as np
+        return self.classes_[np.asarray(y)]
+
+def term_hash(encoded):
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "little")
+
+# as sklearn's strip_accents_unicode
+def strip_accents_unicode(s):
+    try:
+        s.encode("ASCII", errors="strict")
+        return s
+    except UnicodeEncodeError:
+        normalized = unicodedata.normalize("NFKD", s)
+        return "".join([c for c in normalized if not unicodedata.combining(c)])
+
+def has_compact_models(directory):
+    return directory is not None and os.path.isfile(os.path.join(directory, MANIFEST_FILE))
+
+def load_compact_models(directory):
+    """ Returns {name: CompactPipeline or CompactLabelEncoder} of a model directory,
+    pipelines exported with the same featurization share one CompactFeaturizer. """
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError("unsupported compact model format {} in {}".format(manifest.get("format"), directory))
+    featurizers = {}
+    for prefix, params in manifest["featurizations"].items():
+        featurizers[prefix] = CompactFeaturizer(directory, prefix, params)
+    loaded = {}
+    for name, info in manifest["pipelines"].items():
+        loaded[name] = CompactPipeline(directory, name, featurizers[info["featurization"]], info["classes"])
+    for name, classes in manifest["label_encoders"].items():
+        loaded[name] = CompactLabelEncoder(classes)
+    return loaded
+
+def export_models(loaded, directory):
+    """ Writes the pipelines and label encoders of loaded ({name: fitted object}) to
+    directory in the compact format. Pipelines with equal featurization steps (see
+    share_featurizations) store them once. """
+    import numpy as np
+    from .domain_inference import share_featurizations
+
+    os.makedirs(directory, exist_ok=True)
+    pipelines = [name for name, model in loaded.items() if hasattr(model, "steps")]
+    featurizations = share_featurizations(loaded, pipelines)
+    manifest = {"format": FORMAT_VERSION, "featurizations": {}, "pipelines": {}, "label_encoders": {}}
+
+    for name in pipelines:
+        pipeline = loaded[name]
+        prefix = featurizations[name] + "-featurization"
+        if prefix not in manifest["featurizations"]:
+            manifest["featurizations"][prefix] = _export_featurization(pipeline, directory, prefix)
+        classes = _export_classifier(pipeline.steps[-1][1], directory, name)
+        manifest["pipelines"][name] = {"featurization": prefix, "classes": classes}
+
+    for name, model in loaded.items():
+        if not hasattr(model, "steps"):
+            manifest["label_encoders"][name] = np.asarray(model.classes_).tolist()
+
+    with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return manifest
+
+def _export_featurization(pipeline, directory, prefix):
+    import numpy as np
+    if len(pipeline.steps) != 3:
+        raise ValueError("expected a cv, tf, clf pipeline, got steps {}".format([n for n, _ in pipeline.steps]))
+    cv = pipeline.steps[0][1]
+    tf = pipeline.steps[1][1]
+    if (cv.analyzer != "word" or tuple(cv.ngram_range) != (1, 1) or cv.tokenizer is not None
+            or cv.preprocessor is not None or cv.strip_accents not in (None, "unicode")):
+        raise ValueError("unsupported CountVectorizer parameters in " + prefix)
+    if tf.norm not in (None, "l2"):
+        raise ValueError("unsupported TfidfTransformer norm {} in {}".format(tf.norm, prefix))
+
+    encoded = [(term_hash(term.encode("utf-8")), term.encode("utf-8"), column)
+        for term, column in cv.vocabulary_.items()]
+    encoded.sort()
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(term) for _, term, _ in encoded])
+    np.save(os.path.join(directory, prefix + "-vocab_hashes.npy"), np.array([h for h, _, _ in encoded], dtype=np.uint64))
+    np.save(os.path.join(directory, prefix + "-vocab_columns.npy"), np.array([c for _, _, c in encoded], dtype=np.int64))
+    np.save(os.path.join(directory, prefix + "-vocab_offsets.npy"), offsets)
+    np.save(os.path.join(directory, prefix + "-vocab_terms.npy"),
+        np.frombuffer(b"".join(term for _, term, _ in encoded), dtype=np.uint8))
+    idf = np.asarray(tf.idf_, dtype=np.float64) if tf.use_idf else np.ones(len(encoded))
+    np.save(os.path.join(directory, prefix + "-idf.npy"), idf)
+    return {
+        "token_pattern": cv.token_pattern,
+        "lowercase": bool(cv.lowercase),
+        "strip_accents": cv.strip_accents,
+        "binary": bool(cv.binary),
+        "norm": tf.norm,
+        "use_idf": bool(tf.use_idf),
+        "sublinear_tf": bool(tf.sublinear_tf)
+    }
+
+def _export_classifier(clf, directory, name):
+    import numpy as np
+    coefs, intercepts, sigmoid_a, sigmoid_b, positions = [], [], [], [], []
+    for calibrated in clf.calibrated_classifiers_:
+        # attribute names of scikit-learn before and after 0.24
+        base = getattr(calibrated, "base_estimator", None) or getattr(calibrated, "estimator")
+        calibrators = getattr(calibrated, "calibrators_", None) or getattr(calibrated, "calibrators")
+        method = getattr(calibrated, "method", getattr(clf, "method", None))
+        if method != "sigmoid" or not hasattr(base, "coef_"):
+            raise ValueError("only sigmoid calibrated linear classifiers can be exported, not " + name)
+        n_classes = len(clf.classes_)
+        # the columns of predict_proba the calibrators give, as in _CalibratedClassifier
+        position = np.searchsorted(np.sort(clf.classes_), base.classes_)[:len(calibrators)]
+        if n_classes == 2:
+            position = position + 1
+        coefs.append(np.asarray(base.coef_, dtype=np.float64))
+        intercepts.append(np.asarray(base.intercept_, dtype=np.float64))
+        sigmoid_a.append([float(c.a_) for c in calibrators])
+        sigmoid_b.append([float(c.b_) for c in calibrators])
+        positions.append(position)
+    np.save(os.path.join(directory, name + "-coef.npy"), np.stack(coefs))
+    np.save(os.path.join(directory, name + "-intercept.npy"), np.stack(intercepts))
+    np.save(os.path.join(directory, name + "-sigmoid_a.npy"), np.array(sigmoid_a, dtype=np.float64))
+    np.save(os.path.join(directory, name + "-sigmoid_b.npy"), np.array(sigmoid_b, dtype=np.float64))
+    np.save(os.path.join(directory, name + "-positions.npy"), np.array(positions, dtype=np.int64))
+    return np.asarray(clf.classes_).tolist()
+
+def main(argv=None):
+    import argparse
+    from .domain_inference import COMPACT_MODELS_DIR, load_joblib_models
+    arg_parser = argparse.ArgumentParser(description="Exports the domain and task models to the compact format.")
+    arg_parser.add_argument("output_dir", nargs="?", default=COMPACT_MODELS_DIR)
+    args = arg_parser.parse_args(argv)
+
+    loaded = load_joblib_models()
+    manifest = export_models(loaded, args.output_dir)
+    print("exported {} pipelines and {} label encoders to {}".format(
+        len(manifest["pipelines"]), len(manifest["label_encoders"]), args.output_dir))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,11 @@
-from joblib import load
-import numpy as np
+import functools
+import hashlib
+import logging
+import os
+import threading
 
 from . import models
+from ..util.batch_utils import map_batches, DEFAULT_BATCH_SIZE
 
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -12,96 +16,237 @@ except ImportError:
     # Try backported to PY<37 `importlib_resources`.
     import importlib_resources as pkg_resources
 
-with pkg_resources.path(models, 'vision-domain-pipeline.joblib') as f:
-    vision_domain_pipeline = load(f)
-
-with pkg_resources.path(models, 'nlp-domain-pipeline.joblib') as f:
-    nlp_domain_pipeline = load(f)
-
-with pkg_resources.path(models, 'other-domain-pipeline.joblib') as f:
-    other_domain_pipeline = load(f)
-
-with pkg_resources.path(models, 'vision-task-pipeline.joblib') as f:
-    vision_task_pipeline = load(f)
-
-with pkg_resources.path(models, 'vision-le-preprocessing.joblib') as f:
-    vision_le = load(f)
-
-with pkg_resources.path(models, 'nlp-task-pipeline.joblib') as f:
-    nlp_task_pipeline = load(f)
-
-with pkg_resources.path(models, 'nlp-le-preprocessing.joblib') as f:
-    nlp_le = load(f)
-
-with pkg_resources.path(models, 'other-task-pipeline.joblib') as f:
-    other_pipeline = load(f)
-
-with pkg_resources.path(models, 'other-le-preprocessing.joblib') as f:
-    other_le = load(f)
-
-# vision_domain_pipeline = load('models/vision-domain-pipeline.joblib')
-# nlp_domain_pipeline = load('models/nlp-domain-pipeline.joblib')
-# other_domain_pipeline = load('models/other-domain-pipeline.joblib')
-# vision_task_pipeline = load('models/vision-task-pipeline.joblib')
-# vision_le = load('models/vision-le-preprocessing.joblib')
-# nlp_task_pipeline = load('models/nlp-task-pipeline.joblib')
-# nlp_le = load('models/nlp-le-preprocessing.joblib')
-# other_pipeline = load('models/other-task-pipeline.joblib')
-# other_le = load('models/other-le-preprocessing.joblib')
-
+MODEL_FILES = {
+    "vision_domain_pipeline": "vision-domain-pipeline.joblib",
+    "nlp_domain_pipeline": "nlp-domain-pipeline.joblib",
+    "other_domain_pipeline": "other-domain-pipeline.joblib",
+    "vision_task_pipeline": "vision-task-pipeline.joblib",
+    "vision_le": "vision-le-preprocessing.joblib",
+    "nlp_task_pipeline": "nlp-task-pipeline.joblib",
+    "nlp_le": "nlp-le-preprocessing.joblib",
+    "other_pipeline": "other-task-pipeline.joblib",
+    "other_le": "other-le-preprocessing.joblib"
+}
+
+DOMAIN_PIPELINES = ["vision_domain_pipeline", "nlp_domain_pipeline", "other_domain_pipeline"]
+
+logger = logging.getLogger(__name__)
+
+# models exported by compact_models are used instead of the joblib files when present,
+# from the folder in this environment variable or else from models/compact
+COMPACT_MODELS_ENV = "AIMMX_COMPACT_MODELS"
+COMPACT_MODELS_DIR = os.path.join(os.path.dirname(models.__file__), "compact")
+
+# models are loaded on first use (or by warmup), not at import time
+_models = None
+_models_lock = threading.Lock()
+# pipeline name to the name of the first pipeline with the same featurization
+_featurizations = None
+
+def load_models():
+    global _models, _featurizations
+    if _models is None:
+        with _models_lock:
+            if _models is None:
+                from .compact_models import has_compact_models, load_compact_models
+                compact_dir = _compact_models_dir()
+                if has_compact_models(compact_dir):
+                    loaded = load_compact_models(compact_dir)
+                else:
+                    loaded = load_joblib_models()
+                check_models(loaded)
+                _featurizations = share_featurizations(loaded, DOMAIN_PIPELINES)
+                _models = loaded
+    return _models
+
+def _compact_models_dir():
+    return os.getenv(COMPACT_MODELS_ENV) or COMPACT_MODELS_DIR
+
+def models_fingerprint():
+    """ Returns a hash of the model files load_models uses, without loading them. """
+    from .compact_models import has_compact_models
+    compact_dir = _compact_models_dir()
+    if has_compact_models(compact_dir):
+        paths = [os.path.join(compact_dir, name) for name in sorted(os.listdir(compact_dir))]
+    else:
+        paths = [os.path.join(os.path.dirname(models.__file__), filename)
+            for filename in sorted(MODEL_FILES.values())]
+    return _files_fingerprint(tuple(p for p in paths if os.path.isfile(p)))
+
+@functools.lru_cache(maxsize=None)
+def _files_fingerprint(paths):
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(os.path.basename(path).encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def check_models(loaded):
+    """ Raises if a domain pipeline is missing from loaded, and warns about each missing
+    task model (the task of its domain is then left out of the results). """
+    missing = [MODEL_FILES[name] for name in DOMAIN_PIPELINES if name not in loaded]
+    if missing:
+        raise FileNotFoundError("Missing domain model files: {}".format(", ".join(missing)))
+    for name, filename in MODEL_FILES.items():
+        if name not in loaded and name not in DOMAIN_PIPELINES:
+            logger.warning("Missing task model file %s, its domain gets no task", filename)
+
+def load_joblib_models():
+    """ Returns {name: model} of the MODEL_FILES that exist. """
+    from joblib import load
+    loaded = {}
+    for name, filename in MODEL_FILES.items():
+        with pkg_resources.path(models, filename) as f:
+            if not os.path.exists(f):
+                continue
+            loaded[name] = load(f)
+    return loaded
+
+def share_featurizations(loaded, names):
+    """ Finds the pipelines of names whose steps before the classifier are equal.
+
+    The domain pipelines were trained with the same CountVectorizer and TfidfTransformer,
+    these are then vectorized once per batch, and the duplicated steps are replaced by the
+    steps of the first pipeline so that they are only kept in memory once. Returns a dict
+    of pipeline name to the name of the first pipeline featurizing documents the same way.
+    """
+    featurizations = {}
+    for name in names:
+        pipeline = loaded[name]
+        featurizations[name] = name
+        for other in featurizations:
+            if other == name:
+                break
+            if hasattr(pipeline, "featurizer"):
+                # compact pipelines exported with the same featurization share it already
+                if pipeline.featurizer is loaded[other].featurizer:
+                    featurizations[name] = other
+                    break
+                continue
+            steps = loaded[other].steps[:-1]
+            if len(steps) == len(pipeline.steps) - 1 and all(
+                    _same_state(step, pipeline.steps[i][1]) for i, (_, step) in enumerate(steps)):
+                pipeline.steps[:-1] = steps
+                featurizations[name] = other
+                break
+    return featurizations
+
+# attributes that differ between equal estimators (the id of the stop word list
+# CountVectorizer checked last)
+IGNORED_ATTRIBUTES = {"_stop_words_id"}
+
+# fitted estimators are equal if they are of the same class with equal attributes
+def _same_state(a, b):
+    import numpy as np
+    if a is b:
+        return True
+    if type(a) is not type(b) or vars(a).keys() != vars(b).keys():
+        return False
+    for key, x in vars(a).items():
+        if key in IGNORED_ATTRIBUTES:
+            continue
+        y = vars(b)[key]
+        if hasattr(x, "toarray"):
+            # scipy sparse matrix
+            if x.shape != y.shape or (x != y).nnz > 0:
+                return False
+        elif isinstance(x, np.ndarray):
+            if not np.array_equal(x, y):
+                return False
+        else:
+            try:
+                if not x == y:
+                    return False
+            except (TypeError, ValueError):
+                # e.g. containers of arrays, which have no single truth value
+                return False
+    return True
+
+def predict_proba_shared(m, names, readmes):
+    """ predict_proba of the pipelines names on readmes, vectorizing the readmes once
+    per featurization (see share_featurizations). """
+    features = {}
+    probas = []
+    for name in names:
+        pipeline = m[name]
+        key = _featurizations.get(name, name) if _featurizations else name
+        if hasattr(pipeline, "featurizer"):
+            if key not in features:
+                features[key] = pipeline.transform(readmes)
+            probas.append(pipeline.predict_proba_features(features[key]))
+            continue
+        if key not in features:
+            X = readmes
+            for _, step in pipeline.steps[:-1]:
+                X = step.transform(X)
+            features[key] = X
+        probas.append(pipeline.steps[-1][1].predict_proba(features[key]))
+    return probas
+
+def warmup():
+    """ Loads the domain and task models ahead of the first inference. """
+    load_models()
+
+CATEGORIES = ["Computer Vision", "Natural Language Processing", "Other", "Unknown"]
 
 def domain_inference(readme):
-    return_json = { "domain_type": "Unknown" }
-
-    predicted_vision = vision_domain_pipeline.predict_proba([readme])
-    predicted_nlp = nlp_domain_pipeline.predict_proba([readme])
-    predicted_other = other_domain_pipeline.predict_proba([readme])
-
-    categories = ["Computer Vision", "Natural Language Processing", "Other", "Unknown"]
-    # print(predicted_vision, predicted_nlp, predicted_other)
-    probs = np.array([ max(predicted_vision[0]), max(predicted_nlp[0]), max(predicted_other[0])])
-    results = np.array([ np.argmax(predicted_vision[0]), np.argmax(predicted_nlp[0]), np.argmax(predicted_other[0])])
-    # print(probs, results)
-
-    # if only one is True
-    cat_index = -1
-    trues = np.sum(results)
-    if trues == 0:
-        cat_index = 3
-    elif trues == 1:
-        cat_index = np.where(results == 1)[0][0]
-    elif trues >= 2:
-        true_index = np.where(results == 1)[0]
-        for i in range(len(results)):
-            if i not in true_index:
-                probs[i] = 0
-        cat_index = np.argmax(probs)
-
-    if cat_index != 3 and probs[cat_index] > 0.5:
-        return_json["domain_type"] = categories[cat_index]
-        return_json["domain_prob"] = probs[cat_index]
-        # do the task or other
-        if categories[cat_index] == "Computer Vision":
-            predicted = vision_task_pipeline.predict_proba([readme])
-            # print("predicted", predicted)
-            prob = max(predicted[0])
-            result_index = np.argmax(predicted[0])
-            label = vision_le.inverse_transform([result_index])
-            return_json["task"] = label[0]
-            return_json["task_prob"] = prob
-        elif categories[cat_index] == "Natural Language Processing":
-            predicted = nlp_task_pipeline.predict_proba([readme])
-            prob = max(predicted[0])
-            result_index = np.argmax(predicted[0])
-            label = nlp_le.inverse_transform([result_index])
-            return_json["task"] = label[0]
-            return_json["task_prob"] = prob
-        else:
-            predicted = other_pipeline.predict_proba([readme])
-            prob = max(predicted[0])
-            result_index = np.argmax(predicted[0])
-            label = other_le.inverse_transform([result_index])
-            return_json["domain_type"] = label[0]
-            return_json["domain_prob"] = prob
-
-    return return_json
+    return _domain_inference_batch([readme])[0]
+
+def domain_inference_many(readmes, n_jobs=None, batch_size=DEFAULT_BATCH_SIZE):
+    """ Batched domain_inference, returns one result per readme in the same order.
+
+    Each batch is vectorized once per pipeline, n_jobs > 1 shards batches across processes.
+    """
+    return map_batches(_domain_inference_batch, readmes, n_jobs=n_jobs, batch_size=batch_size)
+
+def _domain_inference_batch(readmes):
+    if len(readmes) == 0:
+        return []
+
+    import numpy as np
+    m = load_models()
+
+    # (documents, domains, classes), the domain pipelines share their featurization
+    predicted = np.stack(predict_proba_shared(m, DOMAIN_PIPELINES, readmes), axis=1)
+    probs = predicted.max(axis=2)
+    results = predicted.argmax(axis=2)
+
+    # unknown if no domain is True, otherwise the most probable of the True domains
+    trues = results.sum(axis=1)
+    true_probs = np.where(results == 1, probs, 0)
+    cat_indices = np.where(trues == 0, 3, true_probs.argmax(axis=1))
+    cat_probs = probs[np.arange(len(readmes)), np.minimum(cat_indices, 2)]
+    is_known = (cat_indices != 3) & (cat_probs > 0.5)
+
+    return_jsons = []
+    for i in range(len(readmes)):
+        return_json = { "domain_type": "Unknown" }
+        if is_known[i]:
+            return_json["domain_type"] = CATEGORIES[cat_indices[i]]
+            return_json["domain_prob"] = cat_probs[i]
+        return_jsons.append(return_json)
+
+    # do the task or other, one batch per domain (skipped if its model files are missing)
+    task_pipelines = [
+        (m.get("vision_task_pipeline"), m.get("vision_le"), "task"),
+        (m.get("nlp_task_pipeline"), m.get("nlp_le"), "task"),
+        (m.get("other_pipeline"), m.get("other_le"), "domain_type")
+    ]
+    for cat_index, (pipeline, le, key) in enumerate(task_pipelines):
+        doc_indices = np.where(is_known & (cat_indices == cat_index))[0]
+        if len(doc_indices) == 0 or pipeline is None or le is None:
+            continue
+        predicted = pipeline.predict_proba([readmes[i] for i in doc_indices])
+        task_probs = predicted.max(axis=1)
+        labels = le.inverse_transform(predicted.argmax(axis=1))
+        for j, i in enumerate(doc_indices):
+            if key == "task":
+                return_jsons[i]["task"] = labels[j]
+                return_jsons[i]["task_prob"] = task_probs[j]
+            else:
+                return_jsons[i]["domain_type"] = labels[j]
+                return_jsons[i]["domain_prob"] = task_probs[j]
+
+    return return_jsons
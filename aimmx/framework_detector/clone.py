@@ -1,36 +1,47 @@
 import os
 import fnmatch
+import logging
+import shutil
 import tempfile
 import re
-import json
-from git import Repo
 
+from ..util.gh_utils import TreeEntry
+from .import_scanner import ImportRecord, scan_file, scan_source, top_level_modules
+
+logger = logging.getLogger(__name__)
+
+# Returns the top-level modules imported by Python source code
 def extract_modules(text):
-    importsRegEx = r"(?:import|from) ([\w\-]+)((?:(,\s*))[\w\-]+)*\s*(?:\s+as\s+\w*)?(?:import\s\w*)?[\n.]"
-    # importsRegEx = r"(?:from|import)\s+(\w+)(?:\s+as\s+\w*)?[\n.]"
-    mods = re.findall(importsRegEx, text)
-    # return mods
-    # if len(mods) > 0:
-    #     print(text, " --- ", mods)
-    modules = []
-    for imp in mods:
-        for i in imp:
-            if len(i.strip()) > 0:
-                modules.append(i.replace(",","").strip())
-    # # print(modules)
-    return modules
-
-def get_py_modules(org, repo, repoPath=""):
-    # TODO implement directory
-    # TODO implement single file
-    # create a temporary directory
-    with tempfile.TemporaryDirectory() as directory:
-        # if org == "tensorflow":
-        #     return ["tensorflow"]
-        imports = []
+    return top_level_modules(scan_source(text))
+
+# source files scanned for imports
+SOURCE_PATTERNS = ["*.py", "*.ipynb"]
+CAFFE2_FILES = ("init_net.pb", "predict_net.pb")
+GITHUB_GIT_URL = "https://github.com/"
+# files above max_file_size are skipped, checkout stops adding files at max_total_size
+DEFAULT_MAX_FILE_SIZE = 5 * 1024 * 1024
+DEFAULT_MAX_TOTAL_SIZE = 200 * 1024 * 1024
+
+def get_py_modules(org, repo, repoPath="", **clone_options):
+    """ Returns the sorted top-level modules imported by the Python files and notebooks
+    of a repository, see get_py_imports for the options. """
+    return sorted(top_level_modules(get_py_imports(org, repo, repoPath, **clone_options)))
 
-        Repo.clone_from("git://"+"github.com/"+org+"/"+repo, directory, depth=1, no_checkout=False, single_branch=True)
+def get_py_imports(org, repo, repoPath="", tmp_dir=None, max_file_size=DEFAULT_MAX_FILE_SIZE,
+    max_total_size=DEFAULT_MAX_TOTAL_SIZE, entries=None, git_url=GITHUB_GIT_URL):
+    """ Returns an ImportRecord for every import of the Python files and notebooks of a
+    repository, with paths relative to the repository.
 
+    Only the tree and the source files are downloaded (blob-less partial clone and
+    sparse checkout), falling back to a full shallow clone if the local git does not
+    support it. tmp_dir is where the clone is made, e.g. "/dev/shm" for tmpfs. entries
+    is the repository listing (TreeEntry objects with sizes) if already known, it lets
+    the size caps be applied before anything is downloaded. Without it the sizes are
+    only known after the checkout: every source file is downloaded and the caps only
+    bound the files scanned.
+    """
+    # create a temporary directory
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as directory:
         if len(repoPath) > 0 and repoPath[0] != "/":
             repoPath = "/"+repoPath
         fileName = None
@@ -38,48 +49,115 @@ def get_py_modules(org, repo, repoPath=""):
         if pathParts[-1].find(".") > 0:
             fileName = pathParts[-1]
             repoPath = "/".join(pathParts[:-1])
-        # print("pathParts", pathParts)
-        # print("repoPath", repoPath)
-        # print("fileName", fileName)
-        all_code_lines = []
-        for path, subdirs, files in os.walk(directory+repoPath):
-            innerPath = path[len(directory):]
-            if innerPath.startswith("/."):
+
+        url = git_url + org + "/" + repo
+        try:
+            sources, caffe2_path = sparse_clone(url, directory, repoPath.strip("/"), fileName,
+                max_file_size, max_total_size, entries)
+        except Exception as e:
+            logger.warning("Partial clone failed, falling back to a full clone %s: %s", url, e)
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory, exist_ok=True)
+            sources, caffe2_path = full_clone(url, directory, repoPath, fileName)
+
+        records = []
+        if caffe2_path is not None:
+            records.append(ImportRecord("caffe2", caffe2_path, None))
+        total_size = 0
+        for path in sources:
+            # sizes are only known up front when entries are given
+            full_path = os.path.join(directory, path)
+            size = os.path.getsize(full_path) if os.path.exists(full_path) else 0
+            if size > max_file_size or total_size + size > max_total_size:
                 continue
-            if "init_net.pb" in files and "predict_net.pb" in files:
-                if "caffe2" not in imports:
-                    imports.append("caffe2")
-            for name in files:
-                if fileName is not None and name != fileName:
-                    continue
-                # print(path, innerPath, name)
-                if fnmatch.fnmatch(name, "*.py"):
-                    try:
-                        with open(os.path.join(path, name), mode="r") as f:
-                            lines = f.read()
-                            all_code_lines += lines
-                            result = extract_modules(lines)
-                            for imp in result:
-                                if imp not in imports:
-                                    imports.append(imp)
-                    except Exception as e:
-                        print("Unable to read python file", os.path.join(path, name))
-                if fnmatch.fnmatch(name, "*.ipynb"):
-                    try:
-                        with open(os.path.join(path, name), mode="r") as f:
-                            code = json.load(f)
-                            if 'cells' in code:
-                                lines = []
-                                for cell in code['cells']:
-                                    if cell['cell_type'] == 'code':
-                                        for line in cell['source']:
-                                            lines.append(line)
-                                all_code_lines += lines
-                                result = extract_modules(" ".join(lines))
-                                for imp in result:
-                                    if imp not in imports:
-                                        imports.append(imp)
-                    except Exception as e:
-                        print("Unable to parse ipynb file", os.path.join(path, name))
-        #print("".join(all_code_lines[:10]))
-        return sorted(imports)
+            total_size += size
+            # one file at a time, nothing is kept but the records
+            for record in scan_file(full_path):
+                records.append(record._replace(path=path))
+        return records
+
+def sparse_clone(url, directory, folder="", fileName=None, max_file_size=DEFAULT_MAX_FILE_SIZE,
+    max_total_size=DEFAULT_MAX_TOTAL_SIZE, entries=None):
+    """ Clones only the source files of the repository (or of folder) into directory.
+
+    Returns the paths (relative to directory) of the checked out source files and the
+    path of a caffe2 model file (None if there are none), caffe2 models are detected
+    from the listing without downloading them.
+    """
+    from git import Repo
+    cloned = Repo.clone_from(url, directory, depth=1, no_checkout=True, single_branch=True,
+        filter="blob:none")
+
+    if entries is None:
+        # NOTE: no sizes, ls-tree -l would download every blob to get them, so the
+        # size caps cannot be applied to what is checked out (see get_py_imports)
+        entries = []
+        listing = cloned.git.ls_tree("-r", "-z", "HEAD", stdout_as_string=False)
+        for record in listing.split(b"\0"):
+            if not record:
+                continue
+            info, path = record.decode("utf-8", "surrogateescape").split("\t", 1)
+            mode, git_type, sha = info.split()
+            if git_type == "blob":
+                entries.append(TreeEntry(path, "file", sha, None, mode))
+
+    prefix = folder + "/" if folder else ""
+    selected = []
+    total_size = 0
+    folders = {}
+    for entry in entries:
+        path = entry.path
+        if entry.type != "file" or path.startswith(".") or not path.startswith(prefix):
+            continue
+        parent, _, name = path.rpartition("/")
+        if name in CAFFE2_FILES:
+            folders.setdefault(parent, set()).add(name)
+        if fileName is not None and name != fileName:
+            continue
+        if not any(fnmatch.fnmatch(name, p) for p in SOURCE_PATTERNS):
+            continue
+        if entry.size is not None:
+            if entry.size > max_file_size or total_size + entry.size > max_total_size:
+                continue
+            total_size += entry.size
+        selected.append(path)
+    caffe2_path = None
+    for parent, names in folders.items():
+        if len(names) == len(CAFFE2_FILES):
+            caffe2_path = parent + "/" + CAFFE2_FILES[0] if parent else CAFFE2_FILES[0]
+            break
+
+    if selected:
+        # exact paths as non-cone patterns, so nothing else is downloaded
+        patterns = ["/" + re.sub(r"([\\*?\[\]!#])", r"\\\1", p) for p in selected]
+        with _lines_file(patterns) as f:
+            cloned.git.sparse_checkout("set", "--no-cone", "--stdin", istream=f)
+        cloned.git.checkout(cloned.active_branch.name)
+    return selected, caffe2_path
+
+def full_clone(url, directory, repoPath="", fileName=None):
+    """ Shallow clones the whole repository, returns the same as sparse_clone. """
+    from git import Repo
+    Repo.clone_from(url, directory, depth=1, no_checkout=False, single_branch=True)
+
+    sources = []
+    caffe2_path = None
+    for path, subdirs, files in os.walk(directory+repoPath):
+        innerPath = path[len(directory):]
+        if innerPath.startswith("/."):
+            continue
+        if caffe2_path is None and all(f in files for f in CAFFE2_FILES):
+            caffe2_path = os.path.join(innerPath, CAFFE2_FILES[0]).lstrip("/")
+        for name in files:
+            if fileName is not None and name != fileName:
+                continue
+            if any(fnmatch.fnmatch(name, p) for p in SOURCE_PATTERNS):
+                sources.append(os.path.join(innerPath, name).lstrip("/"))
+    return sources, caffe2_path
+
+# GitPython passes istream as the stdin of the git process, the caller closes the file
+def _lines_file(lines):
+    f = tempfile.TemporaryFile()
+    f.write(("\n".join(lines) + "\n").encode("utf-8"))
+    f.seek(0)
+    return f
@@ -2,8 +2,7 @@
     Given a GitHub repo, attempts to automatically identify frameworks used
 """
 
-from github3.exceptions import NotFoundError
-import base64, re
+import re
 from ..util.gh_utils import get_file_from_repo
 
 FRAMEWORKS = ["tensorflow", "scikit-learn", "scikit_learn", "sklearn", "keras", "theanos", "torch", "caffe", "caffe2", "nltk", "theano", "lasagne", "mxnet"]
@@ -1,10 +1,9 @@
-import sys
 from .clone import get_py_modules
+from .import_scanner import top_level_modules
 from .framework_util import getFrameworks
-from git.exc import GitCommandError
-import traceback
 
-def extract_framework(repo_url):
+# clone_options are passed to get_py_modules (tmp_dir, size caps, entries)
+def extract_framework(repo_url, **clone_options):
 
     url_parts = repo_url.split("/")
     for i in range(0, len(url_parts)):
@@ -21,7 +20,13 @@ def extract_framework(repo_url):
 
     response_json['success'] = True
     #response_json["modules"] = get_py_modules(org, reponame)
-    modules = get_py_modules(org, reponame)
+    modules = get_py_modules(org, reponame, **clone_options)
     response_json["frameworks"] = getFrameworks(modules)
     #print(response_json)
     return response_json
+
+# the result of extract_framework from imports that are already scanned, e.g. by an
+# ArchiveSnapshot
+def frameworks_from_imports(records):
+    modules = sorted(top_level_modules(records))
+    return {"success": True, "frameworks": getFrameworks(modules)}
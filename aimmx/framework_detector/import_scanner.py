@@ -0,0 +1,224 @@
+"""
+    Finds the modules imported by Python files and notebooks.
+
+    Sources are parsed with ast, falling back to the tokenizer for files that do
+    not parse (e.g. Python 2). Files too large to hold a syntax tree of are read
+    line by line and only the import statements are tokenized. Every import is
+    returned with the file and line it comes from.
+"""
+
+import ast
+import io
+import json
+import logging
+import os
+import tokenize
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# module is the full dotted name, line is 1-based, cell is the notebook cell index
+ImportRecord = namedtuple("ImportRecord", ["module", "path", "line", "cell"], defaults=[None])
+
+# files larger than this are streamed instead of parsed into a tree, which takes
+# about 300 times the size of the source
+MAX_AST_BYTES = 256 * 1024
+
+# IPython lines that are not Python, e.g. %matplotlib inline or !pip install
+MAGIC_PREFIXES = ("%", "!", "?")
+
+# fields of compound statements (and of their handlers and match cases) holding statements
+STATEMENT_FIELDS = ("body", "orelse", "finalbody", "handlers", "cases")
+IMPORT_KEYWORDS = ("import", "from")
+# statements whose body can follow the colon on the same line, e.g. try: import x
+COMPOUND_KEYWORDS = ("if", "elif", "else", "for", "while", "try", "except", "finally", "with", "def",
+    "class", "async", "case")
+MAX_STATEMENT_LINES = 100
+
+def scan_file(path, max_ast_bytes=MAX_AST_BYTES):
+    """ Returns the ImportRecords of a .py or .ipynb file, [] if it cannot be read. """
+    if path.endswith(".ipynb"):
+        return scan_notebook(path)
+    try:
+        if os.path.getsize(path) > max_ast_bytes:
+            with tokenize.open(path) as f:
+                return _scan_lines(f, path)
+        with tokenize.open(path) as f:
+            source = f.read()
+    except (OSError, SyntaxError, UnicodeDecodeError):
+        logger.warning("Unable to read python file %s", path)
+        return []
+    return scan_source(source, path)
+
+def scan_source(source, path=None, cell=None):
+    """ Returns the ImportRecords of Python source code. """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return _scan_tokens(io.StringIO(source).readline, path, cell)
+    records = []
+    # imports are statements, expressions are not visited
+    statements = list(tree.body)
+    while statements:
+        node = statements.pop()
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                records.append(ImportRecord(alias.name, path, node.lineno, cell))
+        elif isinstance(node, ast.ImportFrom):
+            # relative imports are modules of the repository itself
+            if node.level == 0 and node.module:
+                records.append(ImportRecord(node.module, path, node.lineno, cell))
+        else:
+            for field in STATEMENT_FIELDS:
+                children = getattr(node, field, None)
+                if children:
+                    statements.extend(children)
+    records.sort(key=lambda r: r.line)
+    return records
+
+def scan_bytes(data, path, max_ast_bytes=MAX_AST_BYTES):
+    """ Returns the ImportRecords of the contents of a .py or .ipynb file, e.g. read
+    from an archive, [] if it cannot be decoded. """
+    if path.endswith(".ipynb"):
+        try:
+            notebook = json.loads(data)
+        except ValueError:
+            logger.warning("Unable to parse ipynb file %s", path)
+            return []
+        return scan_notebook_cells(notebook, path)
+    try:
+        encoding = tokenize.detect_encoding(io.BytesIO(data).readline)[0]
+        source = data.decode(encoding)
+    except (SyntaxError, UnicodeDecodeError, LookupError):
+        logger.warning("Unable to read python file %s", path)
+        return []
+    if len(data) > max_ast_bytes:
+        return _scan_lines(io.StringIO(source), path)
+    return scan_source(source, path)
+
+def scan_notebook(path):
+    """ Returns the ImportRecords of the code cells of a notebook, cell by cell. """
+    try:
+        with open(path, mode="r") as f:
+            notebook = json.load(f)
+    except (OSError, ValueError):
+        logger.warning("Unable to parse ipynb file %s", path)
+        return []
+    return scan_notebook_cells(notebook, path)
+
+def scan_notebook_cells(notebook, path=None):
+    """ Returns the ImportRecords of the code cells of a parsed notebook. """
+    records = []
+    for index, cell in enumerate(notebook.get("cells", [])):
+        if cell.get("cell_type") != "code":
+            continue
+        source = cell.get("source", "")
+        if isinstance(source, list):
+            source = "".join(source)
+        # magics are blanked rather than removed to keep the line numbers
+        lines = []
+        for line in source.split("\n"):
+            if line.lstrip().startswith(MAGIC_PREFIXES):
+                line = ""
+            lines.append(line)
+        records += scan_source("\n".join(lines), path, index)
+    return records
+
+def top_level_modules(records):
+    """ Returns the distinct top-level package names of records, in order. """
+    return list(dict.fromkeys(r.module.split(".")[0] for r in records))
+
+# Reads a file line by line and only tokenizes the statements with an import
+# (or starting with from), including their continuation lines
+def _scan_lines(f, path=None, cell=None):
+    records = []
+    statement = None
+    for number, line in enumerate(f, 1):
+        if statement is None:
+            stripped = line.lstrip()
+            # imports can also follow a colon or a semicolon, e.g. try: import x
+            if "import" not in stripped and not stripped.startswith("from"):
+                continue
+            statement = []
+            start = number
+        statement.append(line.lstrip())
+        text = "".join(statement)
+        # a parenthesis in a comment or string could otherwise keep the statement open
+        unfinished = text.count("(") > text.count(")") or text.rstrip().endswith("\\")
+        if unfinished and len(statement) < MAX_STATEMENT_LINES:
+            continue
+        for record in _scan_tokens(io.StringIO(text).readline, path, cell):
+            records.append(record._replace(line=start + record.line - 1))
+        statement = None
+    return records
+
+# Streams the tokens of a source, only the current line is held in memory. Stops
+# (keeping what was found) at the first error, e.g. inconsistent indentation.
+def _scan_tokens(readline, path=None, cell=None):
+    records = []
+    statement_start = True
+    # None outside imports, "import" while reading imported names, "from" before the module
+    state = None
+    name = ""
+    line = 0
+    # whether the statement is a compound statement header and the bracket depth, a
+    # colon closing the header starts a statement
+    compound = False
+    depth = 0
+    try:
+        for tok in tokenize.generate_tokens(readline):
+            if tok.type in (tokenize.COMMENT, tokenize.NL):
+                continue
+            if tok.type in (tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER) \
+                or (tok.type == tokenize.OP and tok.string == ";"):
+                if state == "import" and name:
+                    records.append(ImportRecord(name, path, line, cell))
+                state = None
+                name = ""
+                statement_start = True
+                compound = False
+                depth = 0
+                continue
+
+            if tok.type == tokenize.OP:
+                if tok.string in ("(", "[", "{"):
+                    depth += 1
+                elif tok.string in (")", "]", "}"):
+                    depth -= 1
+                elif tok.string == ":" and compound and depth == 0:
+                    compound = False
+                    statement_start = True
+                    continue
+
+            if statement_start and tok.type == tokenize.NAME and tok.string in ("import", "from"):
+                state = tok.string
+                name = ""
+                line = tok.start[0]
+            elif statement_start and tok.type == tokenize.NAME and tok.string in COMPOUND_KEYWORDS:
+                compound = True
+            elif state == "import":
+                if tok.type == tokenize.NAME and tok.string == "as":
+                    records.append(ImportRecord(name, path, line, cell))
+                    state = "alias"
+                elif tok.type == tokenize.OP and tok.string == ",":
+                    if name:
+                        records.append(ImportRecord(name, path, line, cell))
+                    name = ""
+                elif tok.type == tokenize.NAME or (tok.type == tokenize.OP and tok.string == "."):
+                    name += tok.string
+            elif state == "alias":
+                if tok.type == tokenize.OP and tok.string == ",":
+                    state = "import"
+                    name = ""
+            elif state == "from":
+                if tok.type == tokenize.NAME and tok.string == "import":
+                    # relative imports start with a dot
+                    if name and not name.startswith("."):
+                        records.append(ImportRecord(name, path, line, cell))
+                    state = "names"
+                elif tok.type == tokenize.NAME or (tok.type == tokenize.OP and tok.string in (".", "...")):
+                    name += tok.string
+            statement_start = False
+    except (tokenize.TokenError, SyntaxError, UnicodeDecodeError):
+        pass
+    return records
@@ -1,7 +1,7 @@
-from joblib import load
-import numpy as np
+import threading
 
 from . import models
+from ..util.batch_utils import map_batches, DEFAULT_BATCH_SIZE
 
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -12,9 +12,35 @@ except ImportError:
     # Try backported to PY<37 `importlib_resources`.
     import importlib_resources as pkg_resources
 
-with pkg_resources.path(models, 'isai.joblib') as f:
-    is_ai_pipeline = load(f)
+MODEL_FILE = "isai.joblib"
+
+# the model is loaded on first use (or by warmup), not at import time
+_is_ai_pipeline = None
+_is_ai_pipeline_lock = threading.Lock()
+
+def load_model():
+    global _is_ai_pipeline
+    if _is_ai_pipeline is None:
+        with _is_ai_pipeline_lock:
+            if _is_ai_pipeline is None:
+                from joblib import load
+                with pkg_resources.path(models, MODEL_FILE) as f:
+                    _is_ai_pipeline = load(f)
+    return _is_ai_pipeline
+
+def warmup():
+    """ Loads the is-AI model ahead of the first inference. """
+    load_model()
 
 def is_ai_inference(readme):
-    result = is_ai_pipeline.predict([readme])
-    return bool(result[0])
+    return _is_ai_inference_batch([readme])[0]
+
+def is_ai_inference_many(readmes, n_jobs=None, batch_size=DEFAULT_BATCH_SIZE):
+    """ Batched is_ai_inference, returns one bool per readme in the same order. """
+    return map_batches(_is_ai_inference_batch, readmes, n_jobs=n_jobs, batch_size=batch_size)
+
+def _is_ai_inference_batch(readmes):
+    if len(readmes) == 0:
+        return []
+    results = load_model().predict(readmes)
+    return [bool(r) for r in results]
@@ -2,12 +2,14 @@
     Given a GitHub repo, extracts the readme and tries to find useful information
 """
 
-from github3.exceptions import NotFoundError
 import base64, re
+from functools import lru_cache
 from .reference_detector.arxiv_reader import look_for_arxiv_fulltext, parse_arxiv_url
-from .util.gh_utils import merge_metadata, path_to_object, get_file_from_repo, get_blob_link
+from .util.gh_utils import merge_metadata, path_to_object, get_file_from_repo, get_blob_link, get_git_blob
 from .dataset_detector.dataset_detector import detect_datasets
 from .reference_detector.reference_detector import detect_references
+from .util.instrumentation import span
+from .util.readme_index import ReadmeIndex
 
 LINK_PATTERN = "\[([^\]]+?)\]\(([^\)]+?)\)"
 ANCHOR_PATTERN = "^#\S+"
@@ -33,6 +35,21 @@ CODE_BLOCK_HEADERS_DICT = {
 }
 
 README_FILES = ["README.md", "README", "readme.md", "readme"]
+
+# lines skipped when looking for the title
+TITLE_SKIP_PATTERNS = [
+    # RST table
+    "^(\|[^\|]+?\|_\s*)+",
+    # link and image
+    "^\[!\[([^\]]+?)\]\(([^\)]+?)\)\]\(([^\)]+?)\)",
+    # image
+    "^!\[([^\]]+?)\]\(([^\)]+?)\)",
+    # nothing but "-" or "=" or "*" or "_"
+    "^[-=\*_]+"
+]
+TITLE_SKIP_RE = re.compile("|".join("(?:" + p + ")" for p in TITLE_SKIP_PATTERNS))
+TITLE_HASHES_RE = re.compile("^#+ ([^#]+)#*$")
+TAGS_RE = re.compile("<[\S\s]+?>")
 #INPUT_TRAINED_SCHEMA_HEADER = "## Input Trained Data Schema\s+?```(?:json)([\s\S]+?)```\s+?(?:#|\Z)"
 
 def is_readme_file(filename):
@@ -42,6 +59,7 @@ def is_readme_file(filename):
     return False
 
 def get_readme_contents(repo_object):
+    from github3.exceptions import NotFoundError
     try:
         readme = repo_object.readme()
     except NotFoundError as e:
@@ -52,8 +70,8 @@ def get_readme_contents(repo_object):
         contents = contents.decode('UTF-8')
     return contents
 
-def get_readme_contents_from_sha(repo_object, sha):
-    readme_blob = repo_object.blob(readme_sha)
+def get_readme_contents_from_sha(repo_object, sha, cache=None):
+    readme_blob = get_git_blob(repo_object, sha, cache)
     readme = readme_blob.decode_content()
     return readme
 
@@ -69,9 +87,11 @@ def get_readme_contents_from_path(repo_object, tree_path):
             break
     return readme
 
-def get_readme_contents_from_docstring(repo_object, sha):
-    code_blob = repo_object.blob(sha)
-    code = code_blob.decode_content()
+def get_readme_contents_from_docstring(repo_object, sha, cache=None):
+    code_blob = get_git_blob(repo_object, sha, cache)
+    return get_docstring(code_blob.decode_content())
+
+def get_docstring(code):
     # only read the docstring ('''....''')
     start = None
     end = None
@@ -105,11 +125,14 @@ def get_readme_contents_from_docstring(repo_object, sha):
         docstring += line + "\n"
     return docstring
 
-def get_readme_title(readme):
+def get_readme_title(readme, index=None):
     link_re = re.compile(LINK_PATTERN)
 
     # Use readme title as model name
-    lines = readme.splitlines()
+    if index is not None:
+        lines = [line for _, line in index.lines]
+    else:
+        lines = readme.splitlines()
     line_index = 0
     title = None
     while line_index < len(lines):
@@ -131,41 +154,19 @@ def get_readme_title(readme):
         if line.lower().startswith(".. ") or line.lower().startswith(":target:"):
             skip = True
 
-        # another special RST case
-        rst_table_re = re.compile("^(\|[^\|]+?\|_\s*)+")
-        matches = rst_table_re.search(line)
-        if matches:
-            skip = True
-
-        # skip if line is a link and image
-        link_image_re = re.compile("^\[!\[([^\]]+?)\]\(([^\)]+?)\)\]\(([^\)]+?)\)")
-        matches = link_image_re.search(line)
-        if matches:
-            skip = True
-
-        # skip if line is an Image
-        image_re = re.compile("^!\[([^\]]+?)\]\(([^\)]+?)\)")
-        matches = image_re.search(line)
-        if matches:
-            skip = True
-
-        # skip if line is nothing but "-" or "=" or "*" or "_"
-        lines_re = re.compile("^[-=\*_]+")
-        matches = lines_re.search(line)
-        if matches:
+        # another special RST case, links, images and rules
+        if not skip and TITLE_SKIP_RE.search(line):
             skip = True
 
         if not skip:
             title = line
             # remove hashes in front and/or back if they exist
-            title_re = re.compile("^#+ ([^#]+)#*$")
-            matches = title_re.search(title)
+            matches = TITLE_HASHES_RE.search(title)
             if (matches):
                 title = matches.group(1).strip()
 
             # remove <tags> if they exist
-            tags_re = re.compile("<[\S\s]+?>")
-            matches = tags_re.findall(title)
+            matches = TAGS_RE.findall(title)
             if (matches and len(matches) > 0):
                 for m in matches:
                     title = title.replace(m, "")
@@ -185,7 +186,8 @@ def get_dataset_links(readme, blob_link):
     link_re = re.compile(LINK_PATTERN)
 
     # extract out links and look for "dataset or data set" and an actual link
-    matches = link_re.findall(readme)
+    with span("regex:links"):
+        matches = link_re.findall(readme)
     datasets = {}
     if (matches and len(matches) > 0):
         for m in matches:
@@ -203,11 +205,18 @@ def get_dataset_links(readme, blob_link):
                     datasets[m[0]] = local_link
     return datasets
 
-def check_codeblock(readme, header, metadata_path, metadata, to_object=False):
-    header_pattern = SCHEMA_HEADER_PATTERN_PRE + header + SCHEMA_HEADER_PATTERN_POST
-    header_re = re.compile(header_pattern, re.M | re.I)
+# the header patterns are compiled once, they are only matched at the headers of a ReadmeIndex
+@lru_cache(maxsize=None)
+def compile_header_pattern(pattern):
+    return re.compile(pattern, re.M | re.I)
 
-    result = header_re.search(readme)
+def check_codeblock(readme, header, metadata_path, metadata, to_object=False, index=None):
+    if index is None:
+        index = ReadmeIndex(readme)
+    header_re = compile_header_pattern(SCHEMA_HEADER_PATTERN_PRE + header + SCHEMA_HEADER_PATTERN_POST)
+
+    with span("regex:codeblock:" + header):
+        result = index.match_header(header_re)
     if (result and len(result.groups()) > 0):
         code_block = result.group(1).strip()
         block_result = path_to_object({}, code_block, metadata_path, to_object)
@@ -215,13 +224,36 @@ def check_codeblock(readme, header, metadata_path, metadata, to_object=False):
 
     return metadata
 
-def check_table(readme, header, metadata_path, metadata, header_value_dict=None):
-    header_pattern = TABLE_HEADER_PATTERN_PRE + header + TABLE_HEADER_PATTERN_POST
-    header_re = re.compile(header_pattern, re.M | re.I)
-
-    result = header_re.search(readme)
-    if (result and len(result.groups()) > 0):
-        table_block = result.group(1).strip()
+# the block TABLE_HEADER_PATTERN_POST matches when the table under the header ends
+# with "|" followed by a blank line, None if the pattern has to be run to find out
+def closed_table_block(index, table):
+    text = index.text
+    if table.end - table.start >= 2 and text[table.end - 1] == "|" and text.startswith("\n\n", table.end):
+        return text[table.start:table.end]
+    return None
+
+def check_table(readme, header, metadata_path, metadata, header_value_dict=None, index=None):
+    if index is None:
+        index = ReadmeIndex(readme)
+    header_re = compile_header_pattern(TABLE_HEADER_PATTERN_PRE + header + "\\s")
+
+    table_block = None
+    with span("regex:table:" + header):
+        for result in index.match_headers(header_re):
+            table = index.table_after(result.end())
+            # the pattern needs a "|" at the start of the first line after the header
+            if table is None or index.text[table.start] != "|":
+                continue
+            table_block = closed_table_block(index, table)
+            if table_block is not None:
+                break
+            # a table without the blank line, the pattern runs on to the next "|" followed by one
+            table_re = compile_header_pattern(TABLE_HEADER_PATTERN_PRE + header + TABLE_HEADER_PATTERN_POST)
+            match = table_re.match(index.text, result.start())
+            if match:
+                table_block = match.group(1).strip()
+                break
+    if table_block is not None:
         table_result = parse_markdown_table(table_block, header_value_dict)
         if len(table_result) > 0:
             table_result = path_to_object(metadata, table_result, metadata_path)
@@ -255,16 +287,20 @@ def parse_markdown_table(metric_table_md, header_value_dict=None):
 
     return metadata_objects
 
-def check_model_value_table(readme):
+def check_model_value_table(readme, index=None):
+    if index is None:
+        index = ReadmeIndex(readme)
     metadata = {}
-    header_re = re.compile(MODEL_VALUE_HEADER_PATTERN, re.M | re.I)
-    result = header_re.search(readme)
+    header_re = compile_header_pattern(MODEL_VALUE_HEADER_PATTERN)
+    with span("regex:model_value_header"):
+        result = index.match_header(header_re)
     evaluations = []
     if (result and len(result.groups()) > 0):
         # add newlines for the regex pattern matching
         raw_table = result.group(1).strip() + "\n\n"
-        table_re = re.compile(TABLE_PATTERN, re.M | re.I)
-        results = table_re.findall(raw_table)
+        table_re = compile_header_pattern(TABLE_PATTERN)
+        with span("regex:model_value_table"):
+            results = table_re.findall(raw_table)
         metric_metadata = {
             "evaluation_type": "training_evaluation",
             "method": MODEL_METRIC_SPECIAL_CASE
@@ -305,10 +341,13 @@ def check_model_value_table(readme):
         metadata["evaluations"] = evaluations
     return metadata
 
-def check_model_metadata_table(readme):
+def check_model_metadata_table(readme, index=None):
+    if index is None:
+        index = ReadmeIndex(readme)
     metadata = { "domain": {} }
-    header_re = re.compile(MODEL_HEADER_PATTERN, re.M | re.I)
-    result = header_re.search(readme)
+    header_re = compile_header_pattern(MODEL_HEADER_PATTERN)
+    with span("regex:model_metadata_header"):
+        result = index.match_header(header_re)
     if (result and len(result.groups()) > 0):
         raw_table = result.group(1).strip()
         rows = raw_table.split("\n")
@@ -359,13 +398,26 @@ def check_model_metadata_table(readme):
 
     return metadata
 
-def readme_parse_text(readme, blob_link, check_datasets=False):
-    refs = detect_references(readme)
-    metadata = check_model_metadata_table(readme)
+# reference_time_budget is the time_budget of detect_references
+def readme_parse_text(readme, blob_link, check_datasets=False, check_references=True, reference_time_budget=None):
+    with span("readme_parse_text", readme_length=len(readme)):
+        return _readme_parse_text(readme, blob_link, check_datasets, check_references, reference_time_budget)
+
+def _readme_parse_text(readme, blob_link, check_datasets, check_references, reference_time_budget):
+    # the README is parsed once, every extractor below queries the index
+    with span("readme_index"):
+        index = ReadmeIndex(readme)
+    refs = {}
+    if check_references:
+        with span("detect_references"):
+            refs = detect_references(readme, index=index, time_budget=reference_time_budget)
+    with span("check_model_metadata_table"):
+        metadata = check_model_metadata_table(readme, index=index)
     #print(refs)
     result = merge_metadata(refs, metadata)
 
-    metadata = check_model_value_table(readme)
+    with span("check_model_value_table"):
+        metadata = check_model_value_table(readme, index=index)
     result = merge_metadata(result, metadata)
 
     author_header_dict = {
@@ -374,14 +426,14 @@ def readme_parse_text(readme, blob_link, check_datasets=False):
         "Github Profile": "github_id",
         "organization": "organization"
     }
-    result = check_table(readme, "Contributors", "authors", result, author_header_dict)
+    result = check_table(readme, "Contributors", "authors", result, author_header_dict, index=index)
 
     # check for special codeblocks
     for header, path in CODE_BLOCK_HEADERS_DICT.items():
-        result = check_codeblock(readme, header, path, result, to_object=True)
+        result = check_codeblock(readme, header, path, result, to_object=True, index=index)
 
     # special case of a codeblock containing published docker image address
-    docker_result = check_codeblock(readme, "Published Docker Image:", "trained_model/binaries", {})
+    docker_result = check_codeblock(readme, "Published Docker Image:", "trained_model/binaries", {}, index=index)
     if "trained_model" in docker_result and "binaries" in docker_result["trained_model"]:
         docker_address = docker_result["trained_model"]["binaries"]
         docker_result["trained_model"]["binaries"] = [{
@@ -397,12 +449,14 @@ def readme_parse_text(readme, blob_link, check_datasets=False):
         }]
         result = merge_metadata(result, docker_result)
 
-    title = get_readme_title(readme)
+    with span("get_readme_title"):
+        title = get_readme_title(readme, index=index)
     if title:
         result["name"] = title
 
     if check_datasets:
-        datasets = detect_datasets(readme, blob_link)
+        with span("detect_datasets"):
+            datasets = detect_datasets(readme, blob_link, index=index)
         if len(datasets) > 0:
             if "training" not in result:
                 result["training"] = {
@@ -416,7 +470,7 @@ def readme_parse_text(readme, blob_link, check_datasets=False):
     return result
 
 
-def readme_parse(repo_object, branch_name=None, tree_path=None, check_datasets=False):
+def readme_parse(repo_object, branch_name=None, tree_path=None, check_datasets=False, check_references=True):
     result = {}
     blob_link = get_blob_link(repo_object, tree_path=tree_path, branch_name=branch_name)
     if not tree_path:
@@ -427,4 +481,4 @@ def readme_parse(repo_object, branch_name=None, tree_path=None, check_datasets=F
     if not readme:
         return result
 
-    return readme_parse_text(readme, blob_link, check_datasets)
+    return readme_parse_text(readme, blob_link, check_datasets, check_references)
@@ -2,9 +2,15 @@
     Utility functions to lookup arxiv papers given a url or id
 """
 
-import arxiv
+import collections
+import copy
+import os
 import re
-from dateutil import parser
+import threading
+import time
+
+from ..util.instrumentation import span
+from ..util.stage_cache import mark_incomplete
 
 # http://arxiv.org/abs/1502.05698
 # https://arxiv.org/pdf/1512.03385.pdf
@@ -13,6 +19,42 @@ ARXIV_ABS_PATTERN = "https?:\/\/arxiv.org\/abs\/(\d+\.\d+)"
 ARXIV_PDF_PATTERN = "https?:\/\/arxiv.org\/pdf\/(\d+\.\d+)\.pdf"
 ARXIV_ID_PATTERN = "arXiv:(\d+\.\d+)"
 
+# path of a SQLite file to keep arXiv records in, used unless configure_arxiv_cache is called
+ARXIV_CACHE_ENV = "AIMMX_ARXIV_CACHE"
+DEFAULT_ARXIV_TTL = 30 * 24 * 60 * 60
+# ids that were not found are looked up again after this many seconds, they can be
+# papers cited before their announcement or lookups that failed
+NOT_FOUND_TTL = 60 * 60
+MAX_MEMORY_RECORDS = 10000
+
+_MISSING = object()
+_arxiv_cache = None
+_arxiv_cache_configured = False
+# most recently used last
+_memory_records = collections.OrderedDict()
+_arxiv_lock = threading.Lock()
+
+def configure_arxiv_cache(path=None, ttl=DEFAULT_ARXIV_TTL, cache=None):
+    """ Keeps arXiv lookups in a persistent cache shared by all clients in this process.
+
+    Either a path to a SQLite file (which can be shared across processes) or a cache
+    object with get(key, default) and set(key, value). ttl is in seconds, None to keep
+    records forever. Calling it with no arguments disables the persistent cache.
+    """
+    global _arxiv_cache, _arxiv_cache_configured
+    if cache is None and path is not None:
+        from ..util.sqlite_cache import SqliteCache
+        cache = SqliteCache(path, ttl=ttl)
+    with _arxiv_lock:
+        _arxiv_cache = cache
+        _arxiv_cache_configured = True
+        _memory_records.clear()
+
+def get_arxiv_cache():
+    if not _arxiv_cache_configured and os.getenv(ARXIV_CACHE_ENV):
+        configure_arxiv_cache(os.getenv(ARXIV_CACHE_ENV))
+    return _arxiv_cache
+
 # Given url, returns None if not arxiv or id if is
 def parse_arxiv_url(url):
     arxiv_abs_re = re.compile(ARXIV_ABS_PATTERN)
@@ -33,12 +75,14 @@ def look_for_arxiv_fulltext(text):
     arxiv_pdf_re = re.compile(ARXIV_PDF_PATTERN)
 
     ids = set()
-    found = arxiv_abs_re.findall(text)
+    with span("regex:arxiv_abs"):
+        found = arxiv_abs_re.findall(text)
     if found and len(found) > 0:
         for f in found:
             ids.add(f)
 
-    found = arxiv_pdf_re.findall(text)
+    with span("regex:arxiv_pdf"):
+        found = arxiv_pdf_re.findall(text)
     if found and len(found) > 0:
         for f in found:
             ids.add(f)
@@ -86,7 +130,46 @@ def look_for_arxiv_id(text):
         return arxiv_info
     return None
 
+# Returns the paper info of an arXiv id (None if not found). Lookups are kept in
+# memory and in the persistent cache if configured, ids that were not found only
+# for NOT_FOUND_TTL
 def get_arxiv_id(id):
+    key = "arxiv:" + id
+    with _arxiv_lock:
+        record = _memory_records.get(key, _MISSING)
+        if record is not _MISSING:
+            _memory_records.move_to_end(key)
+    if record is _MISSING or _is_expired(record):
+        record = _MISSING
+        cache = get_arxiv_cache()
+        if cache is not None:
+            record = cache.get(key, _MISSING)
+            if record is not _MISSING and _is_expired(record):
+                record = _MISSING
+        if record is _MISSING:
+            with span("arxiv_search"):
+                record = search_arxiv_id(id)
+            if record is None:
+                record = {"not_found_at": time.time()}
+            if cache is not None:
+                cache.set(key, record)
+        with _arxiv_lock:
+            _memory_records[key] = record
+            _memory_records.move_to_end(key)
+            while len(_memory_records) > MAX_MEMORY_RECORDS:
+                _memory_records.popitem(last=False)
+    if "not_found_at" in record:
+        # the id may be found on the next extraction
+        mark_incomplete("arxiv:" + id)
+        return None
+    # callers may modify the returned info
+    return copy.deepcopy(record)
+
+def _is_expired(record):
+    return "not_found_at" in record and time.time() - record["not_found_at"] > NOT_FOUND_TTL
+
+def search_arxiv_id(id):
+    import arxiv
     search = arxiv.Search(id_list=[id])
     paper_info = None
     for result in search.results():
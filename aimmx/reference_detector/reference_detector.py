@@ -4,7 +4,11 @@
 
 from .arxiv_reader import look_for_arxiv_fulltext, parse_arxiv_url, look_for_arxiv_id
 import re
-import bibtexparser
+import time
+from functools import lru_cache
+
+from ..util.instrumentation import span
+from ..util.stage_cache import mark_incomplete
 
 REF_PATTERNS = {
     # IBM MAX 1, ex:* _S. Hershey, S. Chaudhuri, D. P. W. Ellis, J. F. Gemmeke, A. Jansen,\nR. C. Moore, M. Plakal, D. Platt, R. A. Saurous, B. Seybold et  al._,\n["CNN architectures for large-scale audio classification,"](https://arxiv.org/pdf/1609.09430.pdf) arXiv preprint\narXiv:1609.09430, 2016.
@@ -26,11 +30,28 @@ REF_PATTERNS = {
     # GitHub, ex:  - Raissi, Maziar, Paris Perdikaris, and George Em Karniadakis. "[Physics Informed Deep Learning (Part I): Data-driven Solutions of Nonlinear Partial Differential Equations](https://arxiv.org/abs/1711.10561)." arXiv preprint arXiv:1711.10561 (2017).
     '\s*?-\s?([A-Za-z,\-\.\s]+?).\s?"\["?(.+?)"?\]\((\S+?)\)."\s?arXiv preprint\s?(arXiv:\d+\.\d+)\s?\((\d+?)\)\.': ["authors", "title", "url", "arxiv", "year"],
 }
-URL_PATTERN = "^(?:http(s)?:\/\/)?[\w.-]+(?:\.[\w\.-]+)+[\w\-\._~:/?#[\]@!\$&'\(\)\*\+,;=.]+$"
+# accepts the same URLs as ^(?:http(s)?:\/\/)?[\w.-]+(?:\.[\w\.-]+)+[...]+$ without its exponential
+# backtracking: the first "." after the first character splits the host as well as any other
+URL_PATTERN = "^(?:https?:\/\/)?[\w.-][\w-]*\.[\w.-][\w\-\._~:/?#[\]@!\$&'\(\)\*\+,;=.]+$"
 URL_ENDER_EXCEPTIONS = (".json", ".yaml", ".py", ".ipynb")
 ANCHOR_PATTERN = "^#\S+"
 CODEBLOCK_PATTERN = "\s+?```(?:bibtex|)([\s\S]+?)```"
 
+# the longest author list, title, URL or venue REF_PATTERNS match, so that every match
+# attempt stops after a bounded number of characters
+MAX_FIELD_LENGTH = 1000
+# seconds regex_search may spend on a README (None for no limit), the references found
+# until then are kept and the result of detect_references is marked as truncated
+DEFAULT_TIME_BUDGET = None
+# references are matched within paragraphs, longer ones are cut at line ends (and
+# longer lines anywhere) into parts of at most MAX_PARAGRAPH_LENGTH so that the time
+# budget is checked often enough
+PARAGRAPH_SPLIT_PATTERN = "\n[ \t]*\n"
+MAX_PARAGRAPH_LENGTH = 20000
+# characters of a README regex_search looks at, references are near the end but
+# READMEs this long are rather generated listings
+MAX_README_LENGTH = 1000000
+
 def make_paper_key(ref_info):
     title = ref_info["title"] if "title" in ref_info else ""
     authors = ""
@@ -42,18 +63,23 @@ def make_paper_key(ref_info):
             authors = ref_info["authors"]
     return title + authors
 
-def detect_references(readme):
+# index is the ReadmeIndex of readme if it was already built, time_budget limits
+# the seconds spent matching REF_PATTERNS (None for no limit). When it runs out the
+# result has "references_truncated": True, with the references found until then
+def detect_references(readme, index=None, time_budget=DEFAULT_TIME_BUDGET):
     found = {}
 
     arxiv_ids = set()
-    arxiv_papers = look_for_arxiv_fulltext(readme)
+    with span("look_for_arxiv_fulltext"):
+        arxiv_papers = look_for_arxiv_fulltext(readme)
 
     for a in arxiv_papers:
         arxiv_ids.add(a["arxiv"])
         paper_key = make_paper_key(a)
         found[paper_key] = a
 
-    bibtex_papers = codeblock_search(readme)
+    with span("codeblock_search"):
+        bibtex_papers = codeblock_search(readme, index)
     for b in bibtex_papers:
         # skip if arxiv already found
         if "arxiv" in b:
@@ -70,7 +96,8 @@ def detect_references(readme):
             if len(b.keys()) > len(found[paper_key].keys()):
                 found[paper_key] = b
 
-    regex_papers = regex_search(readme)
+    with span("regex_search"):
+        regex_papers, truncated = regex_search_within(readme, time_budget)
     for r in regex_papers:
         # skip entire ref if arxiv already found
         if "arxiv" in r:
@@ -92,27 +119,78 @@ def detect_references(readme):
             if len(r.keys()) > len(found[paper_key].keys()):
                 found[paper_key] = r
 
+    result = {}
     if len(found.values()) > 0:
         refs = []
         for ref in found.values():
             if "authors" in ref and isinstance(ref["authors"], str):
                 ref["authors"] = ref["authors"].split(",")
             refs.append(ref)
-        return {
-            "references": refs
-        }
+        result["references"] = refs
+    if truncated:
+        result["references_truncated"] = True
+        mark_incomplete("references_truncated")
+
+    return result
+
+# Returns [(compiled pattern, field names)] of REF_PATTERNS with their lazy
+# repetitions limited to max_field_length characters
+@lru_cache(maxsize=None)
+def get_ref_patterns(max_field_length=MAX_FIELD_LENGTH):
+    patterns = []
+    for pattern, headers in REF_PATTERNS.items():
+        bounded = pattern.replace("+?", "{1,%d}?" % max_field_length).replace("*?", "{0,%d}?" % max_field_length)
+        bounded = bounded.replace("(?:.*)", "(?:.{0,%d})" % max_field_length)
+        patterns.append((re.compile(bounded, re.M), headers))
+    return patterns
 
-    return {}
+def split_paragraphs(readme, max_length=MAX_PARAGRAPH_LENGTH):
+    paragraphs = []
+    for paragraph in re.split(PARAGRAPH_SPLIT_PATTERN, readme):
+        if len(paragraph) <= max_length:
+            paragraphs.append(paragraph)
+            continue
+        part = []
+        part_length = 0
+        for line in paragraph.split("\n"):
+            if part and part_length + len(line) > max_length:
+                paragraphs.append("\n".join(part))
+                part = []
+                part_length = 0
+            # a line too long for a part is cut anywhere
+            while len(line) > max_length:
+                paragraphs.append(line[:max_length])
+                line = line[max_length:]
+            part.append(line)
+            part_length += len(line) + 1
+        paragraphs.append("\n".join(part))
+    return paragraphs
+
+def regex_search(readme, time_budget=DEFAULT_TIME_BUDGET):
+    return regex_search_within(readme, time_budget)[0]
 
-def regex_search(readme):
-    ref_res = []
-    for r in REF_PATTERNS.keys():
-        ref_res.append(re.compile(r, re.M))
+# Returns the references regex_search finds and whether time_budget ran out before
+# all of REF_PATTERNS were matched on all of readme
+def regex_search_within(readme, time_budget=DEFAULT_TIME_BUDGET):
+    url_re = re.compile(URL_PATTERN)
+    anchor_re = re.compile(ANCHOR_PATTERN)
+
+    # every pattern ends with a [title](url) link, only paragraphs with one are scanned
+    paragraphs = [p for p in split_paragraphs(readme[:MAX_README_LENGTH]) if "](" in p]
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
 
     found_refs = []
-    for r in ref_res:
-        result = r.findall(readme)
-        headers = REF_PATTERNS[r.pattern]
+    truncated = False
+    for i, (r, headers) in enumerate(get_ref_patterns()):
+        with span("regex:ref_pattern[{}]".format(i)) as s:
+            result = []
+            for paragraph in paragraphs:
+                if deadline is not None and time.perf_counter() > deadline:
+                    # the budget is spent, keep what was found
+                    s.set_attribute("time_budget_exceeded", True)
+                    truncated = True
+                    break
+                result += r.findall(paragraph)
         for match in result:
             ref = {}
             for i in range(len(headers)):
@@ -120,7 +198,6 @@ def regex_search(readme):
                 ref[header] = match[i]
             if "url" in ref:
                 # skip if not actual URL
-                url_re = re.compile(URL_PATTERN)
                 urls = url_re.search(ref["url"])
                 if not urls:
                     continue
@@ -128,18 +205,26 @@ def regex_search(readme):
                 if ref["url"].endswith(URL_ENDER_EXCEPTIONS):
                     continue
             # skip entire ref if url is an anchor (i.e. just #)
-                anchor_re = re.compile(ANCHOR_PATTERN)
                 anchors = anchor_re.search(ref["url"])
                 if anchors:
                     continue
 
             found_refs.append(ref)
-    return found_refs
+    return found_refs, truncated
 
-def codeblock_search(readme):
+def codeblock_search(readme, index=None):
     found_refs = []
-    codeblock_re = re.compile(CODEBLOCK_PATTERN, re.M)
-    result = codeblock_re.findall(readme)
+    if index is not None:
+        # only code blocks with an @ can hold BibTeX entries
+        result = [block.content for block in index.code_blocks_with("@")]
+    else:
+        codeblock_re = re.compile(CODEBLOCK_PATTERN, re.M)
+        with span("regex:bibtex_codeblock"):
+            result = codeblock_re.findall(readme)
+    if not result:
+        return found_refs
+    import bibtexparser
+    import bibtexparser.customization
     for match in result:
         # print("regex match\n", match)
         try:
@@ -0,0 +1,217 @@
+"""
+    A RepoSnapshot read from the repository archive (tarball) instead of the
+    REST API and a clone.
+
+    The archive is downloaded once (or read from a local .tar.gz) and streamed
+    through in a single pass without extracting it to disk. The pass lists the
+    whole tree, computes the git SHAs of every file and folder, keeps the
+    contents of the files the extraction reads (READMEs, special files) and
+    scans the Python files and notebooks for imports.
+"""
+
+import fnmatch
+import hashlib
+import os
+import tarfile
+
+from .gh_utils import TreeEntry, get_git_blob
+from .repo_snapshot import RepoSnapshot
+from .special_file_detector import is_special_file
+from ..framework_detector.clone import SOURCE_PATTERNS, CAFFE2_FILES, DEFAULT_MAX_FILE_SIZE, DEFAULT_MAX_TOTAL_SIZE
+from ..framework_detector.import_scanner import ImportRecord, scan_bytes
+
+# files whose contents are kept, besides READMEs and special files
+KEPT_FILES = ("value_info.json",)
+CHUNK_SIZE = 1024 * 1024
+
+class ArchiveBlob:
+    """ File contents kept from an archive, read like a github3 Blob. """
+
+    def __init__(self, sha, content):
+        self.sha = sha
+        self.content = content
+        self.size = len(content)
+
+    def decode_content(self):
+        return self.content.decode("utf-8")
+
+class ArchiveSnapshot(RepoSnapshot):
+    """ Repository contents at one commit, read from its archive on first use.
+
+    path is a local .tar.gz (its first path component is stripped, as in the archives
+    GitHub and `git archive --prefix` make), otherwise the tarball of ref is
+    downloaded. keep_paths are extra files whose contents are kept, e.g. the file a
+    blob URL points to. Python files and notebooks above max_file_size are not scanned
+    for imports, nor any after max_total_size of them, as for the clone. Blobs that
+    were not kept are fetched from the API.
+    """
+
+    def __init__(self, repo_object, ref=None, cache=None, path=None, keep_paths=(),
+        max_file_size=DEFAULT_MAX_FILE_SIZE, max_total_size=DEFAULT_MAX_TOTAL_SIZE):
+        super().__init__(repo_object, ref=ref, cache=cache)
+        self.path = path
+        self.keep_paths = set(keep_paths)
+        self.max_file_size = max_file_size
+        self.max_total_size = max_total_size
+        self._imports = None
+
+    @property
+    def sha(self):
+        """ The commit SHA of the archive, from its pax header. """
+        with self._lock:
+            self._read()
+            if self._sha is None:
+                # archives of a tree rather than a commit have no commit SHA
+                return super().sha
+            return self._sha
+
+    def _load(self):
+        self._read()
+
+    def imports(self):
+        """ Returns the ImportRecords of the Python files and notebooks of the archive. """
+        with self._lock:
+            self._read()
+            return self._imports
+
+    def blob(self, sha):
+        with self._lock:
+            self._read()
+            if sha not in self._blobs:
+                self._blobs[sha] = get_git_blob(self.repo, sha, self.cache)
+            return self._blobs[sha]
+
+    def _read(self):
+        if self._entries is not None:
+            return
+        if self.path is not None:
+            with open(self.path, mode="rb") as f:
+                self._read_archive(f)
+            return
+        response = self.repo.session.get(self.repo.url + "/tarball/" + self.ref, stream=True)
+        try:
+            response.raise_for_status()
+            self._read_archive(response.raw)
+        finally:
+            response.close()
+
+    def _read_archive(self, fileobj):
+        entries = {}
+        imports = []
+        scanned_size = 0
+        with tarfile.open(fileobj=fileobj, mode="r|gz") as archive:
+            for member in archive:
+                if self._sha is None:
+                    self._sha = archive.pax_headers.get("comment")
+                path = member.name.partition("/")[2].rstrip("/")
+                if not path:
+                    continue
+                if member.isdir():
+                    entries[path] = TreeEntry(path, "dir", None, None, "040000")
+                    continue
+                if member.issym():
+                    content = member.linkname.encode("utf-8", "surrogateescape")
+                    mode = "120000"
+                elif member.isfile():
+                    content = None
+                    mode = "100755" if member.mode & 0o111 else "100644"
+                else:
+                    continue
+
+                if content is None:
+                    name = path.rpartition("/")[2]
+                    is_source = (not path.startswith(".") and any(fnmatch.fnmatch(name, p) for p in SOURCE_PATTERNS)
+                        and member.size <= self.max_file_size and scanned_size + member.size <= self.max_total_size)
+                    keep = member.size <= self.max_file_size and (path in self.keep_paths
+                        or name.lower().startswith("readme") or is_special_file(name) or name in KEPT_FILES)
+                    content, sha = _read_member(archive.extractfile(member), member.size, is_source or keep)
+                else:
+                    # symbolic links are blobs of their target path
+                    is_source = keep = False
+                    sha = _git_blob_sha(content)
+
+                entries[path] = TreeEntry(path, "file", sha, member.size if mode != "120000" else len(content), mode)
+                if keep:
+                    self._blobs[sha] = ArchiveBlob(sha, content)
+                if is_source:
+                    scanned_size += member.size
+                    imports += scan_bytes(content, path)
+
+        _drop_empty_folders(entries)
+        _add_tree_shas(entries)
+        caffe2_path = _find_caffe2(entries)
+        if caffe2_path is not None:
+            imports.insert(0, ImportRecord("caffe2", caffe2_path, None))
+
+        self._entries = {}
+        self._children = {"": []}
+        for entry in entries.values():
+            self._add(entry)
+        self._imports = imports
+
+# Reads a file of the archive in chunks, returns its contents (None unless keep)
+# and its git blob SHA
+def _read_member(f, size, keep):
+    sha = hashlib.sha1(b"blob %d\0" % size)
+    chunks = []
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+        sha.update(chunk)
+        if keep:
+            chunks.append(chunk)
+    return (b"".join(chunks) if keep else None), sha.hexdigest()
+
+def _git_blob_sha(content):
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+# git does not store empty folders, those of an archive are submodules (git archive
+# and GitHub write them as empty folders), which are skipped as by iter_tree. The
+# archive does not have their commit SHAs, so the folders above them get other SHAs
+# than git's.
+def _drop_empty_folders(entries):
+    num_children = {}
+    for path in entries:
+        parent = path.rpartition("/")[0]
+        num_children[parent] = num_children.get(parent, 0) + 1
+    # deepest first, a folder holding only empty folders is empty too
+    for path in sorted(entries, key=lambda p: p.count("/"), reverse=True):
+        if entries[path].type == "dir" and not num_children.get(path):
+            del entries[path]
+            parent = path.rpartition("/")[0]
+            num_children[parent] -= 1
+
+# Sets the SHA of every folder of entries (adding the folders the archive does not
+# list), computed from the SHAs of their contents as git does
+def _add_tree_shas(entries):
+    children = {}
+    for path in list(entries):
+        while path:
+            parent, _, name = path.rpartition("/")
+            children.setdefault(parent, {})[name] = path
+            if not parent or parent in entries:
+                break
+            entries[parent] = TreeEntry(parent, "dir", None, None, "040000")
+            path = parent
+    # deepest folders first, so that the SHAs of subfolders are known
+    for folder in sorted(children, key=lambda p: p.count("/") if p else -1, reverse=True):
+        if not folder:
+            continue
+        tree = b""
+        # git orders folders as if their names ended with a slash
+        for name, path in sorted(children[folder].items(),
+                key=lambda item: item[0] + "/" if entries[item[1]].type == "dir" else item[0]):
+            entry = entries[path]
+            mode = "40000" if entry.type == "dir" else entry.mode
+            tree += mode.encode() + b" " + name.encode("utf-8", "surrogateescape") + b"\0" + bytes.fromhex(entry.sha)
+        sha = hashlib.sha1(b"tree %d\0" % len(tree) + tree).hexdigest()
+        entries[folder] = entries[folder]._replace(sha=sha)
+
+def _find_caffe2(entries):
+    folders = {}
+    for path, entry in entries.items():
+        parent, _, name = path.rpartition("/")
+        if entry.type == "file" and name in CAFFE2_FILES and not path.startswith("."):
+            folders.setdefault(parent, set()).add(name)
+    for parent, names in folders.items():
+        if len(names) == len(CAFFE2_FILES):
+            return os.path.join(parent, CAFFE2_FILES[0])
+    return None
@@ -0,0 +1,22 @@
+"""
+    Utility functions for running inference over batches of documents
+"""
+
+DEFAULT_BATCH_SIZE = 256
+
+def split_batches(items, batch_size=DEFAULT_BATCH_SIZE):
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+# applies func (which takes and returns a list) to items, optionally sharding
+# the items into batches that are processed on n_jobs worker processes
+def map_batches(func, items, n_jobs=None, batch_size=DEFAULT_BATCH_SIZE):
+    items = list(items)
+    if not n_jobs or n_jobs == 1 or len(items) <= batch_size:
+        return func(items)
+
+    from joblib import Parallel, delayed
+    batch_results = Parallel(n_jobs=n_jobs)(delayed(func)(b) for b in split_batches(items, batch_size))
+    results = []
+    for r in batch_results:
+        results += r
+    return results
@@ -0,0 +1,131 @@
+"""
+    Helpers for extracting many repositories in one run: bounded worker threads
+    that stream results as they complete, a bounded filter of repeated items
+    and a checkpoint file of completed items to resume an interrupted run from.
+"""
+
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+DEFAULT_MAX_WORKERS = 8
+# number of distinct items skip_repeated remembers
+DEFAULT_REPEAT_WINDOW = 10000
+
+_END = object()
+
+def imap_completed(func, items, max_workers=DEFAULT_MAX_WORKERS, max_pending=None, timeout=None,
+    max_abandoned=None):
+    """ Applies func to items on worker threads, yields (item, result, error) in completion order.
+
+    items can be a lazy iterator, only max_pending (2 * max_workers by default) items are
+    taken from it at a time. error is the exception raised by func (result is then None),
+    an error does not stop the other items. Closing the generator drops the items that
+    have not started.
+
+    An item still running timeout seconds after it started is yielded with a TimeoutError.
+    Its call cannot be interrupted, it goes on in the background and its result is dropped,
+    while another worker takes its place. Up to max_abandoned (max_workers by default) such
+    calls are replaced, past that the run goes on with fewer workers until they finish.
+    The workers are daemon threads, so calls still running do not keep the process alive.
+    """
+    if max_pending is None:
+        max_pending = 2 * max_workers
+    if max_abandoned is None:
+        max_abandoned = max_workers
+    items = iter(items)
+    results = queue.Queue()
+    # items taken from items that have not started
+    waiting = deque()
+    # call id to (item, start time) of the running calls
+    running = {}
+    # ids of the calls given up on that are still running
+    abandoned = set()
+    call_ids = itertools.count()
+
+    def call(call_id, item):
+        try:
+            results.put((call_id, func(item), None))
+        except BaseException as e:
+            results.put((call_id, None, e))
+
+    exhausted = False
+    while True:
+        while not exhausted and len(waiting) + len(running) < max_pending:
+            item = next(items, _END)
+            if item is _END:
+                exhausted = True
+                break
+            waiting.append(item)
+        while waiting and len(running) < max_workers and len(running) + len(abandoned) < max_workers + max_abandoned:
+            call_id = next(call_ids)
+            item = waiting.popleft()
+            running[call_id] = (item, time.monotonic())
+            threading.Thread(target=call, args=(call_id, item), daemon=True).start()
+        if not running and not waiting:
+            return
+
+        wait_timeout = None
+        if timeout is not None and running:
+            first_start = min(start for _, start in running.values())
+            wait_timeout = max(0, first_start + timeout - time.monotonic())
+        try:
+            call_id, result, error = results.get(timeout=wait_timeout)
+        except queue.Empty:
+            pass
+        else:
+            if call_id in abandoned:
+                abandoned.discard(call_id)
+            else:
+                item, _ = running.pop(call_id)
+                yield item, result, error
+
+        if timeout is not None:
+            now = time.monotonic()
+            for call_id, (item, start) in list(running.items()):
+                if now - start > timeout:
+                    del running[call_id]
+                    abandoned.add(call_id)
+                    yield item, None, TimeoutError("still running after {:g} seconds".format(timeout))
+
+def skip_repeated(items, window=DEFAULT_REPEAT_WINDOW):
+    """ Lazily yields the items that are not among the last window distinct items, so
+    that memory stays bounded on an endless stream. """
+    recent = OrderedDict()
+    for item in items:
+        if item in recent:
+            recent.move_to_end(item)
+            continue
+        recent[item] = True
+        if len(recent) > window:
+            recent.popitem(last=False)
+        yield item
+
+class Checkpoint:
+    """ Completed items and their status (e.g. "ok" or "error"), kept across runs in a
+    SQLite file (see SqliteCache). Items are looked up on disk, not held in memory. """
+
+    def __init__(self, path):
+        from .sqlite_cache import SqliteCache
+        self.path = path
+        self._cache = SqliteCache(path)
+        # nothing is evicted from a checkpoint, reads never need to update access times
+        self._cache.access_resolution = float("inf")
+
+    def __contains__(self, item):
+        return self.status(item) is not None
+
+    def __len__(self):
+        return len(self._cache)
+
+    def status(self, item):
+        """ Returns the status item was added with, None if it was not. """
+        return self._cache.get(item)
+
+    def add(self, item, status="ok"):
+        self._cache.set(item, status)
+
+    def close(self):
+        self._cache.close()
@@ -2,13 +2,16 @@
     Utility functions specific to caffe2
 """
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 def value_json_to_schema(schema_contents):
     try:
         value_info = json.loads(schema_contents)
     except json.decoder.JSONDecodeError as e:
         # This is to catch the case where value_info.json is stored in LFS
-        print(e)
+        logger.warning("Unable to parse value_info.json: %s", e)
         return None
     #print(value_info)
     dimensions = None
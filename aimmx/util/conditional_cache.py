@@ -0,0 +1,83 @@
+"""
+    Conditional GitHub requests.
+
+    GET responses carrying an ETag or Last-Modified are kept in a store and
+    revalidated with If-None-Match / If-Modified-Since on the next request.
+    A 304 Not Modified (which GitHub does not count against the rate limit)
+    is answered with the stored response.
+"""
+
+import base64
+
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# headers of the 304 that replace the stored ones, so rate limit tracking stays current
+FRESH_HEADER_PREFIXES = ("x-ratelimit-", "date")
+DEFAULT_MAX_BODY_BYTES = 1024 * 1024
+
+class ConditionalCacheAdapter(HTTPAdapter):
+    """ Transport adapter sending conditional GET requests.
+
+    cache is any object with get(key, default) and set(key, value) storing JSON
+    values. Every ETag'd response is stored, so it should be bounded, e.g. a
+    SqliteCache with max_bytes. Responses above max_body_bytes are not stored.
+    """
+
+    def __init__(self, cache, max_body_bytes=DEFAULT_MAX_BODY_BYTES, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.max_body_bytes = max_body_bytes
+
+    def send(self, request, stream=False, **kwargs):
+        if request.method != "GET" or stream:
+            return super().send(request, stream=stream, **kwargs)
+
+        key = "http:" + request.headers.get("Accept", "") + " " + request.url
+        stored = self.cache.get(key)
+        if stored is not None:
+            if stored.get("etag") and "If-None-Match" not in request.headers:
+                request.headers["If-None-Match"] = stored["etag"]
+            if stored.get("last_modified") and "If-Modified-Since" not in request.headers:
+                request.headers["If-Modified-Since"] = stored["last_modified"]
+
+        response = super().send(request, stream=stream, **kwargs)
+        if response.status_code == 304 and stored is not None:
+            return self._stored_response(request, stored, response)
+        if response.status_code == 200:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if (etag or last_modified) and len(response.content) <= self.max_body_bytes:
+                self.cache.set(key, {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "headers": dict(response.headers),
+                    "content": base64.b64encode(response.content).decode("ascii")
+                })
+        return response
+
+    def _stored_response(self, request, stored, not_modified):
+        headers = CaseInsensitiveDict(stored["headers"])
+        for name, value in not_modified.headers.items():
+            if name.lower().startswith(FRESH_HEADER_PREFIXES):
+                headers[name] = value
+        response = Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.headers = headers
+        response.encoding = get_encoding_from_headers(headers)
+        response._content = base64.b64decode(stored["content"])
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = not_modified.elapsed
+        return response
+
+def enable_conditional_requests(session, cache, **kwargs):
+    """ Mounts a ConditionalCacheAdapter on a requests (or github3) session. """
+    adapter = ConditionalCacheAdapter(cache, **kwargs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return adapter
@@ -0,0 +1,126 @@
+"""
+    Resolves the contributors of a repository into author metadata.
+
+    GitHub user lookups are cached across repositories (with a TTL) and cache
+    misses are fetched concurrently instead of one after the other.
+"""
+
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .instrumentation import span, run_in_context
+
+DEFAULT_USER_TTL = 24 * 60 * 60
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_USERS = 100000
+
+class ContributorResolver:
+    """ Resolves contributors to authors, can be shared by several AIMMX clients.
+
+    max_contributors: only resolve the top N contributors (by contributions), None for all
+    ttl: seconds a looked up user is reused for
+    max_workers: number of concurrent user lookups
+    max_users: number of users kept, the ones fetched first are dropped first
+    """
+
+    def __init__(self, max_contributors=None, ttl=DEFAULT_USER_TTL, max_workers=DEFAULT_MAX_WORKERS,
+            max_users=DEFAULT_MAX_USERS):
+        self.max_contributors = max_contributors
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.max_users = max_users
+        # (api url, login) -> (time fetched, user info), in the order they were fetched
+        self._users = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, gh, repo_object):
+        """ Returns the author metadata for the contributors of repo_object. """
+        number = self.max_contributors if self.max_contributors else -1
+        logins = [c.login for c in repo_object.contributors(number=number)]
+
+        users = {}
+        misses = []
+        for login in logins:
+            user = self._get_cached(gh, login)
+            if user is None:
+                misses.append(login)
+            else:
+                users[login] = user
+
+        misses = list(dict.fromkeys(misses))
+        if len(misses) <= 1 or self.max_workers <= 1:
+            for login in misses:
+                users[login] = self._fetch(gh, login)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(misses))) as executor:
+                fetch = run_in_context(lambda l: self._fetch(gh, l))
+                for login, user in zip(misses, executor.map(fetch, misses)):
+                    users[login] = user
+
+        authors = []
+        for login in logins:
+            user = users[login]
+            author = {}
+            if (user["name"] and len(user["name"]) > 0):
+                author["name"] = user["name"]
+            else:
+                author["name"] = login
+            if (user["email"] and len(user["email"]) > 0):
+                author["email"] = user["email"]
+            author["github_id"] = login
+            authors.append(author)
+        return authors
+
+    def clear(self):
+        with self._lock:
+            self._users = collections.OrderedDict()
+
+    def _get_cached(self, gh, login):
+        key = (gh.session.base_url, login)
+        with self._lock:
+            cached = self._users.get(key)
+            if cached is None:
+                return None
+            if self.ttl is not None and time.time() - cached[0] > self.ttl:
+                del self._users[key]
+                return None
+            return cached[1]
+
+    def _fetch(self, gh, login):
+        from github3.exceptions import NotFoundError
+        try:
+            with span("user_lookup"):
+                gh_user = gh.user(login)
+            user = {
+                "name": gh_user.name,
+                "email": gh_user.email
+            }
+        except NotFoundError:
+            # NOTE: deleted accounts can still show up as contributors
+            user = {
+                "name": None,
+                "email": None
+            }
+        self._store((gh.session.base_url, login), user)
+        return user
+
+    def _store(self, key, user):
+        now = time.time()
+        with self._lock:
+            self._users.pop(key, None)
+            self._users[key] = (now, user)
+            # expired users are the first ones, then the oldest are dropped past max_users
+            while self._users:
+                fetched, _ = next(iter(self._users.values()))
+                if self.ttl is not None and now - fetched > self.ttl:
+                    self._users.popitem(last=False)
+                elif self.max_users is not None and len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+                else:
+                    break
+
+    def __len__(self):
+        with self._lock:
+            return len(self._users)
@@ -2,8 +2,8 @@
     Utility functions used by the various parsers.
 """
 
-from github3.exceptions import NotFoundError
-import base64, json, yaml
+import base64, fnmatch, json, subprocess
+from collections import namedtuple
 
 BINARY_EXTS = (".checkpoint", "Dockerfile", ".caffemodel", ".pb", ".pbtxt",
     ".prototxt", ".ckpt", ".meta", ".index", ".onnx", ".joblib", ",pkl", ".h5",
@@ -11,6 +11,7 @@ BINARY_EXTS = (".checkpoint", "Dockerfile", ".caffemodel", ".pb", ".pbtxt",
 
 # Expects repo object from github.repo, returns None if not found
 def get_file_from_repo(repo_object, filepath):
+    from github3.exceptions import NotFoundError
     file_contents = None
     try:
         file_contents = repo_object.file_contents(filepath)
@@ -77,25 +78,144 @@ def get_tree_link(repo_object, tree_path=None, branch_name=None):
         url += "/tree/" + branch
     return url
 
-# returns all files in folder in tuples of (path, type, blob/tree)
-# NOTE: only the first tree (at least for now, due to performance reasons)
-def get_all_files_from_folder(repo_object, tree_path=None, exceptions=[]):
-    if tree_path:
-        folder_name = "/".join(tree_path)
+# Blobs and trees are immutable by SHA, so when a cache is given (any object with
+# get(key, default) and set(key, value), e.g. SqliteCache) they are only fetched once
+def get_git_blob(repo_object, sha, cache=None):
+    key = "blob:" + sha
+    if cache is not None:
+        blob_json = cache.get(key)
+        if blob_json is not None:
+            from github3.git import Blob
+            return Blob(blob_json, repo_object.session)
+    blob = repo_object.blob(sha)
+    if cache is not None and blob is not None:
+        cache.set(key, blob.as_dict())
+    return blob
+
+def get_git_tree(repo_object, sha, cache=None):
+    key = "tree:" + sha
+    if cache is not None:
+        tree_json = cache.get(key)
+        if tree_json is not None:
+            from github3.git import Tree
+            return Tree(tree_json, repo_object.session)
+    tree = repo_object.tree(sha)
+    if cache is not None and tree is not None:
+        cache.set(key, tree.as_dict())
+    return tree
+
+# lightweight entry of a repository tree listing, type is "file" or "dir", path is
+# relative to the listed folder, size is None for folders, num_entries is only set
+# by get_all_files_from_folder (number of direct entries of a folder)
+TreeEntry = namedtuple("TreeEntry", ["path", "type", "sha", "size", "mode", "num_entries"], defaults=[None])
+
+GIT_ENTRY_TYPES = {
+    "blob": "file",
+    "tree": "dir"
+}
+
+def iter_tree(repo_object, ref=None, tree_path=None, max_depth=None, include=None, exclude=None,
+    local_path=None, cache=None):
+    """ Lazily yields a TreeEntry for every file and folder under tree_path.
+
+    The listing comes from a local clone at local_path if given, otherwise from a
+    single recursive git trees request (walking subtrees one request at a time only
+    if GitHub truncates the response). max_depth limits how deep entries are listed
+    (1 is the folder itself), include/exclude are fnmatch patterns on the relative
+    path. Submodules are skipped.
+    """
+    if local_path:
+        entries = _iter_local_tree(local_path, ref, tree_path)
     else:
-        folder_name = "/"
-    contents = repo_object.directory_contents(folder_name)
-    file_contents = []
-    for c in contents:
-        try:
-            if c[1].type == "dir" and c[0] not in exceptions:
-                file_contents.append( (c[0], "dir", repo_object.tree(c[1].sha)) )
-            else:
-                file_contents.append( (c[0], "file", repo_object.blob(c[1].sha)) )
-        except NotFoundError as e:
-            # NOTE: seems to trigger for submodules, for now, go ahead and skip
-            print(e)
+        entries = _iter_remote_tree(repo_object, ref, tree_path, max_depth, cache)
+
+    for entry in entries:
+        depth = entry.path.count("/") + 1
+        if max_depth is not None and depth > max_depth:
+            continue
+        if include and not any(fnmatch.fnmatch(entry.path, p) for p in include):
             continue
+        if exclude and any(fnmatch.fnmatch(entry.path, p) for p in exclude):
+            continue
+        yield entry
+
+def _iter_remote_tree(repo_object, ref, tree_path, max_depth, cache):
+    if not ref:
+        ref = repo_object.default_branch
+    prefix = "/".join(tree_path) + "/" if tree_path else ""
+
+    tree_json = repo_object.tree(ref, recursive=True).as_dict()
+    if not tree_json.get("truncated"):
+        for t in tree_json["tree"]:
+            if t["type"] not in GIT_ENTRY_TYPES or not t["path"].startswith(prefix):
+                continue
+            yield TreeEntry(t["path"][len(prefix):], GIT_ENTRY_TYPES[t["type"]], t["sha"], t.get("size"), t["mode"])
+        return
+
+    # too large for a single request, walk the subtrees instead
+    tree_sha = tree_json["sha"]
+    for folder in (tree_path or []):
+        tree_sha = _find_subtree(repo_object, tree_sha, folder, cache)
+        if tree_sha is None:
+            return
+    yield from _walk_remote_tree(repo_object, tree_sha, "", 1, max_depth, cache)
+
+def _find_subtree(repo_object, tree_sha, name, cache):
+    for t in get_git_tree(repo_object, tree_sha, cache).as_dict()["tree"]:
+        if t["path"] == name and t["type"] == "tree":
+            return t["sha"]
+    return None
+
+def _walk_remote_tree(repo_object, tree_sha, path, depth, max_depth, cache):
+    subtrees = []
+    for t in get_git_tree(repo_object, tree_sha, cache).as_dict()["tree"]:
+        if t["type"] not in GIT_ENTRY_TYPES:
+            continue
+        entry = TreeEntry(path + t["path"], GIT_ENTRY_TYPES[t["type"]], t["sha"], t.get("size"), t["mode"])
+        yield entry
+        if entry.type == "dir":
+            subtrees.append(entry)
+    if max_depth is not None and depth >= max_depth:
+        return
+    for entry in subtrees:
+        yield from _walk_remote_tree(repo_object, entry.sha, entry.path + "/", depth + 1, max_depth, cache)
+
+# streams `git ls-tree` of a local clone
+def _iter_local_tree(local_path, ref, tree_path):
+    args = ["git", "-C", local_path, "ls-tree", "-r", "-t", "-l", "-z", ref or "HEAD"]
+    prefix = ""
+    if tree_path:
+        prefix = "/".join(tree_path) + "/"
+        args += ["--", prefix]
+    with subprocess.Popen(args, stdout=subprocess.PIPE) as proc:
+        pending = b""
+        for chunk in iter(lambda: proc.stdout.read(65536), b""):
+            records = (pending + chunk).split(b"\0")
+            pending = records.pop()
+            for record in records:
+                info, path = record.decode("utf-8", "surrogateescape").split("\t", 1)
+                mode, git_type, sha, size = info.split()
+                if git_type not in GIT_ENTRY_TYPES or not path.startswith(prefix):
+                    continue
+                size = None if size == "-" else int(size)
+                yield TreeEntry(path[len(prefix):], GIT_ENTRY_TYPES[git_type], sha, size, mode)
+
+# returns all files in folder in tuples of (name, type, TreeEntry), folders include
+# the number of their direct entries, blobs can be fetched with get_git_blob
+def get_all_files_from_folder(repo_object, tree_path=None, exceptions=[], cache=None, ref=None):
+    file_contents = []
+    entries = {}
+    for entry in iter_tree(repo_object, ref=ref, tree_path=tree_path, max_depth=2, cache=cache):
+        if "/" in entry.path:
+            parent = entries.get(entry.path.split("/")[0])
+            if parent is not None and parent.type == "dir":
+                entries[parent.path] = parent._replace(num_entries=parent.num_entries + 1)
+        elif entry.type == "dir" and entry.path not in exceptions:
+            entries[entry.path] = entry._replace(num_entries=0)
+        else:
+            entries[entry.path] = entry._replace(type="file")
+    for name, entry in entries.items():
+        file_contents.append( (name, entry.type, entry) )
     return file_contents
 
 # given path and metadata_object, traverses object and inserts value into path
@@ -115,6 +235,7 @@ def path_to_object(metadata_object, value, path, to_object=False, is_yaml=False)
             # last part path
             if to_object:
                 if is_yaml:
+                    import yaml
                     value = yaml.safe_load(value)
                 else:
                     value = json.loads(value)
@@ -0,0 +1,157 @@
+"""
+    Timing spans for the stages of an extraction.
+
+    Code wraps its stages in `with span("name"):`. Spans are only recorded while
+    a Tracer is active in the current context (see tracing), otherwise span()
+    returns a shared no-op object, so instrumented code costs next to nothing
+    when nobody is listening. Each span records its wall time and the CPU time
+    of the thread it ran on.
+"""
+
+import contextvars
+import threading
+import time
+
+_tracer = contextvars.ContextVar("aimmx_tracer", default=None)
+_parent = contextvars.ContextVar("aimmx_span", default=None)
+
+class Span:
+    """ A timed stage, parent is the enclosing span (None at the top). """
+
+    __slots__ = ("name", "attributes", "parent", "start", "end", "wall", "cpu", "_tracer", "_tokens", "_cpu_start")
+
+    def __init__(self, tracer, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.parent = None
+        self.start = None
+        self.end = None
+        self.wall = None
+        self.cpu = None
+        self._tracer = tracer
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.parent = _parent.get()
+        self._tokens = _parent.set(self)
+        self._tracer.on_start(self)
+        self.start = time.time()
+        self._cpu_start = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cpu = time.thread_time() - self._cpu_start
+        self.end = time.time()
+        self.wall = self.end - self.start
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        _parent.reset(self._tokens)
+        self._tracer.on_end(self)
+        return False
+
+class _NoSpan:
+    """ Returned by span() when no tracer is active. """
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def span(name, **attributes):
+    """ Returns a context manager timing the stage name in the active tracer. """
+    tracer = _tracer.get()
+    if tracer is None:
+        return _NO_SPAN
+    return Span(tracer, name, attributes)
+
+class Tracer:
+    """ Totals the spans of the code run under tracing(tracer) by name.
+
+    callback(span) is called as each span ends, keep_spans also keeps every span
+    in spans. Subclasses can override on_start and on_end, e.g. to forward the
+    spans to another tracing system.
+    """
+
+    def __init__(self, callback=None, keep_spans=False):
+        self.callback = callback
+        self.keep_spans = keep_spans
+        self.spans = []
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def on_start(self, span):
+        pass
+
+    def on_end(self, span):
+        with self._lock:
+            total = self._totals.get(span.name)
+            if total is None:
+                total = self._totals[span.name] = {"count": 0, "wall": 0.0, "cpu": 0.0}
+            total["count"] += 1
+            total["wall"] += span.wall
+            total["cpu"] += span.cpu
+            if self.keep_spans:
+                self.spans.append(span)
+        if self.callback is not None:
+            self.callback(span)
+
+    def summary(self):
+        """ Returns {name: {"count", "wall", "cpu"}}, the totals of the spans so far. """
+        with self._lock:
+            return {name: dict(total) for name, total in self._totals.items()}
+
+class tracing:
+    """ Context manager making tracer the active tracer of the current context. """
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def __enter__(self):
+        self._tokens = (_tracer.set(self.tracer), _parent.set(None))
+        return self.tracer
+
+    def __exit__(self, exc_type, exc, tb):
+        _parent.reset(self._tokens[1])
+        _tracer.reset(self._tokens[0])
+        return False
+
+def run_in_context(func):
+    """ Wraps func to run in a copy of the current context, e.g. on a worker thread,
+    so that its spans are recorded by the active tracer. """
+    context = contextvars.copy_context()
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+class OpenTelemetryTracer(Tracer):
+    """ Tracer that also reports the spans to an OpenTelemetry tracer (opentelemetry-api
+    is only needed when this class is used). """
+
+    def __init__(self, otel_tracer, callback=None):
+        super().__init__(callback)
+        self.otel_tracer = otel_tracer
+        self._otel_spans = {}
+
+    def on_start(self, span):
+        from opentelemetry import trace
+        parent = self._otel_spans.get(id(span.parent)) if span.parent is not None else None
+        context = trace.set_span_in_context(parent) if parent is not None else None
+        otel_span = self.otel_tracer.start_span(span.name, context=context, attributes=span.attributes)
+        self._otel_spans[id(span)] = otel_span
+
+    def on_end(self, span):
+        otel_span = self._otel_spans.pop(id(span), None)
+        if otel_span is not None:
+            otel_span.set_attribute("aimmx.cpu_time", span.cpu)
+            for k, v in span.attributes.items():
+                otel_span.set_attribute(k, v)
+            otel_span.end()
+        super().on_end(span)
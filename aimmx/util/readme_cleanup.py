@@ -1,12 +1,131 @@
-from os.path import join, dirname
-from github3 import login, GitHubEnterprise, exceptions
-import base64, re, os, json
-from bs4 import BeautifulSoup
-from markdown import markdown, Markdown
+"""
+    Converts README Markdown to the plain text the inference models are run on.
+
+    readme_cleanup reads the Markdown line by line, keeping the text of code
+    blocks as is and removing the markup of the other lines with one regular
+    expression, then drops URLs, emails and symbol runs in a final pass. It
+    keeps no state between calls, so it can be used from several threads.
+
+    markdownToText is the previous implementation (Markdown rendered to HTML,
+    text extracted with BeautifulSoup and re-parsed as Markdown). Both give the
+    same words, which is what the models use, see benchmarks/cleanup_parity.py,
+    except for some entities the re-parse left in code (&gt; as "gt").
+"""
+
+import html
+import html.entities
+import re
+import threading
 from io import StringIO
 
+# opening line of a fenced code block, the info string is kept as text
+FENCE_PATTERN = re.compile(r"^\s*(`{3,}|~{3,})(.*)$")
+# [id]: url lines only define the target of reference links
+LINK_DEFINITION_PATTERN = re.compile(r"^\s{0,3}\[[^\]]+\]:\s*\S+")
+ORDERED_LIST_PATTERN = re.compile(r"^(\s*)\d+\.\s")
+
+# link text, one level of brackets deep so that badges ([![alt](img)](url)) match
+_LINK_TEXT = r"((?:[^\[\]\n]|\[[^\[\]\n]*\])*)"
+_LINK_URL = r"\((?:[^()\n]|\([^()\n]*\))*\)"
+INLINE_PATTERN = re.compile("|".join([
+    # code spans are removed when they fit on a line
+    r"(?P<code>(?P<ticks>`+)[^\n]*?[^`\n](?P=ticks)(?!`))",
+    r"(?P<image>!\[[^\]\n]*\](?:" + _LINK_URL + r"|\[[^\]\n]*\]))",
+    r"\[(?P<link>" + _LINK_TEXT[1:-1] + r")\](?:" + _LINK_URL + r"|\[[^\]\n]*\])",
+    r"<(?P<autolink>(?:https?|ftp)://[^>\s]*|[^>@\s]+@[^>\s]+)>",
+    r"<!--(?P<comment>.*?)-->",
+    r"(?P<tag></?[A-Za-z][^<>]*>)",
+    # an email between escaped brackets is an autolink once unescaped, obfuscated as entities
+    r"&lt;(?P<obfuscated>[^&@\s]+@[^&\s]+?)&gt;",
+    r"\\(?P<escape>[\\`*_{}\[\]()#+\-.!])",
+    r"(?P<entity>&(?:#\d+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);)",
+    # underscores are word characters, the others do not change the words
+    r"(?<!\w)(?P<underscores>_{1,3})(?=\S)(?P<emphasis>[^\n]+?)(?<=\S)(?P=underscores)(?!\w)",
+]), re.DOTALL)
+
+URL_PATTERN = r"\(?http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+\)?"
+EMAIL_PATTERN = r"\S*@\S*\s?"
+SYMBOLS_PATTERN = r"(?:=|:|\t|\"|_|-){2,}"
+CLEANUP_PATTERN = re.compile("|".join([
+    "(?P<url>" + URL_PATTERN + ")",
+    "(?P<email>" + EMAIL_PATTERN + ")",
+    "(?P<symbols>" + SYMBOLS_PATTERN + ")",
+    r"(?P<space>\s{2,})",
+]))
+
+def readme_cleanup(markdown_readme):
+    return markdown_to_plaintext(markdown_readme)
+
+def markdown_to_plaintext(md):
+    """ Converts a markdown string to plaintext for the inference models. """
+    segments = []
+    lines = []
+    fence = None
+    for line in md.strip().split("\n"):
+        if fence is not None:
+            if line.strip().startswith(fence):
+                lines.append(line.strip().lstrip(fence[0]))
+                code = "\n".join(lines).strip()
+                # as a Markdown code span, a block of one line is removed like inline code
+                segments.append(code if "\n" in code else "")
+                lines = []
+                fence = None
+            else:
+                lines.append(line)
+            continue
+        stripped = line.lstrip()
+        if stripped[:3] in ("```", "~~~"):
+            match = FENCE_PATTERN.match(line)
+            # the code is kept verbatim, markup is only removed from the text around it
+            segments.append(_strip_inline("\n".join(lines)))
+            lines = [match.group(2)]
+            fence = match.group(1)
+            continue
+        if stripped.startswith("["):
+            if LINK_DEFINITION_PATTERN.match(line):
+                continue
+        elif stripped.startswith("#"):
+            line = stripped.strip("#")
+        elif stripped[:1].isdigit():
+            line = ORDERED_LIST_PATTERN.sub(r"\1", line, count=1)
+        lines.append(line)
+    if fence is None:
+        segments.append(_strip_inline("\n".join(lines)))
+    else:
+        segments.append("\n".join(lines))
+    text = "\n".join(segments)
+    return CLEANUP_PATTERN.sub(_cleanup_replacement, text).strip()
+
+def _strip_inline(text):
+    return INLINE_PATTERN.sub(_inline_replacement, text)
+
+def _inline_replacement(match):
+    kind = match.lastgroup
+    if kind == "link":
+        return _strip_inline(match.group("link"))
+    if kind == "emphasis":
+        return _strip_inline(match.group("emphasis"))
+    if kind == "autolink" or kind == "comment" or kind == "escape":
+        return match.group(kind)
+    if kind == "obfuscated":
+        return "".join("&" + html.entities.codepoint2name.get(ord(c), "#%d" % ord(c)) + ";"
+            for c in html.unescape(match.group(kind)))
+    if kind == "entity":
+        return html.unescape(match.group(kind))
+    # code, image, tag
+    return " " if kind == "tag" else ""
+
+def _cleanup_replacement(match):
+    kind = match.lastgroup
+    if kind == "space":
+        space = match.group(kind)
+        return "\n" if "\n" in space else space[0]
+    return ""
+
 def markdown_to_text(markdown_string):
     """ Converts a markdown string to plaintext """
+    from bs4 import BeautifulSoup
+    from markdown import markdown
     # md -> html -> text since BeautifulSoup can extract text cleanly
     html = markdown(markdown_string)
     #print("html", html)
@@ -34,12 +153,21 @@ def unmark_element(element, stream=None):
         stream.write(element.tail)
     return stream.getvalue()
 
-Markdown.output_formats["plain"] = unmark_element
-__md = Markdown(output_format="plain")
-__md.stripTopLevelTags = False
+# Markdown instances keep state while converting, each thread gets its own
+_local = threading.local()
+
+def get_plain_markdown():
+    md = getattr(_local, "md", None)
+    if md is None:
+        from markdown import Markdown
+        Markdown.output_formats["plain"] = unmark_element
+        md = Markdown(output_format="plain")
+        md.stripTopLevelTags = False
+        _local.md = md
+    return md
 
 def unmark(text):
-    return __md.convert(text)
+    return get_plain_markdown().convert(text)
 
 def markdownToText(md):
 
@@ -64,8 +192,3 @@ def markdownToText(md):
     text = re.sub(r'(\s|\n)\1+', r'\1', text)
 
     return text.strip()
-
-def readme_cleanup(markdown_readme):
-    plain_readme = markdownToText(markdown_readme)
-
-    return plain_readme
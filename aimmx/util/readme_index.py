@@ -0,0 +1,136 @@
+"""
+    Index of the structure of a README (headers and their sections, fenced
+    code blocks, tables and links), built in one pass over the text so that
+    the readme_parsers extractors query it instead of each searching the
+    whole README with its own regular expression: their patterns are only
+    tried at the headers, and tables are read from the index.
+"""
+
+import re
+from collections import namedtuple
+
+LINK_PATTERN = re.compile(r"\[([^\]]+?)\]\(([^\)]+?)\)")
+FENCE_PATTERN = re.compile(r"(`{3,}|~{3,})\s*(.*)")
+
+# start is the offset of the first "#", end the offset where its section ends
+Header = namedtuple("Header", ["level", "title", "start", "end", "line"])
+# content is the text between the fences, language the first word of the info string
+CodeBlock = namedtuple("CodeBlock", ["language", "info", "content", "start", "end"])
+Table = namedtuple("Table", ["rows", "start", "end"])
+Link = namedtuple("Link", ["text", "url", "start"])
+
+class ReadmeIndex:
+    """ Headers, code blocks and tables of a README, and its links on first use.
+
+    Headers are ATX ("#") headers outside code blocks, the section of a header runs
+    to the next header of the same or a higher level. Tables are runs of lines
+    starting with "|". An index is read-only once built.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.lines = []
+        self.headers = []
+        self.code_blocks = []
+        self.tables = []
+        self._links = None
+        self._parse()
+
+    def _parse(self):
+        text = self.text
+        fence = None
+        block_start = None
+        table_rows = []
+        table_start = None
+        offset = 0
+        for line in text.split("\n"):
+            start = offset
+            offset += len(line) + 1
+            self.lines.append((start, line))
+            stripped = line.strip()
+
+            if fence is not None:
+                if stripped.startswith(fence) and not stripped.lstrip(fence[0]):
+                    self.code_blocks.append(CodeBlock(language, info,
+                        text[block_start:start], block_start, start + len(line)))
+                    fence = None
+                continue
+
+            if stripped.startswith("|"):
+                if table_start is None:
+                    table_start = start
+                table_rows.append(stripped)
+                continue
+            if table_start is not None:
+                self.tables.append(Table(table_rows, table_start, start - 1))
+                table_rows = []
+                table_start = None
+
+            if stripped[:3] in ("```", "~~~"):
+                match = FENCE_PATTERN.match(stripped)
+                fence = match.group(1)
+                info = match.group(2).strip()
+                language = info.split()[0].lower() if info else ""
+                block_start = offset
+            elif stripped.startswith("#"):
+                title = stripped.lstrip("#")
+                level = len(stripped) - len(title)
+                self.headers.append(Header(level, title.strip().strip("#").strip(),
+                    start + line.index("#"), None, len(self.lines) - 1))
+
+        if table_start is not None:
+            self.tables.append(Table(table_rows, table_start, len(text)))
+        if fence is not None:
+            # an unclosed block runs to the end, as in GitHub's rendering
+            self.code_blocks.append(CodeBlock(language, info, text[block_start:], block_start, len(text)))
+
+        # a section ends where the next header of its level or above starts
+        open_headers = []
+        for i, header in enumerate(self.headers):
+            while open_headers and self.headers[open_headers[-1]].level >= header.level:
+                j = open_headers.pop()
+                self.headers[j] = self.headers[j]._replace(end=header.start)
+            open_headers.append(i)
+        for j in open_headers:
+            self.headers[j] = self.headers[j]._replace(end=len(text))
+
+    @property
+    def links(self):
+        """ [text](url) links, images included, in order. """
+        if self._links is None:
+            self._links = [Link(m.group(1), m.group(2), m.start()) for m in LINK_PATTERN.finditer(self.text)]
+        return self._links
+
+    def match_headers(self, pattern, min_level=2):
+        """ Yields the matches of the compiled pattern starting at a header, in order.
+
+        The pattern is matched from the last min_level "#" of each header of at
+        least that level, e.g. "##\\s*Models" matches "### Models" as it would
+        when searched for in the whole text.
+        """
+        for header in self.headers:
+            if header.level < min_level:
+                continue
+            match = pattern.match(self.text, header.start + header.level - min_level)
+            if match:
+                yield match
+
+    def match_header(self, pattern, min_level=2):
+        """ Returns the first match of the compiled pattern starting at a header. """
+        return next(self.match_headers(pattern, min_level), None)
+
+    def table_after(self, offset):
+        """ Returns the table starting after offset with only whitespace between.
+
+        The table is returned whatever follows it, see readme_parsers.check_table
+        for the blank line a table has to end with to be read.
+        """
+        for table in self.tables:
+            if table.start >= offset:
+                if self.text[offset:table.start].strip():
+                    return None
+                return table
+        return None
+
+    def code_blocks_with(self, substring):
+        return [block for block in self.code_blocks if substring in block.content]
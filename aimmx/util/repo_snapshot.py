@@ -0,0 +1,167 @@
+"""
+    A view of a GitHub repository pinned to a single commit, shared by all the
+    stages of one extraction so that every path and blob is fetched at most once.
+"""
+
+import threading
+
+from .gh_utils import TreeEntry, GIT_ENTRY_TYPES, get_git_blob, get_git_tree
+from ..readme_parsers import README_FILES
+
+# folders GitHub also looks in for the repository README
+ROOT_README_FOLDERS = [[], [".github"], ["docs"]]
+
+class RepoSnapshot:
+    """ Repository contents at one commit.
+
+    The commit SHA is resolved once from ref (default branch if None) and the full
+    tree is listed with a single request on first use. If GitHub truncates that
+    listing, only the folders that are read are listed, one request each. Files
+    that are not in the listing are known to be missing without a request, blobs
+    are memoized (and stored in cache if given, see get_git_blob).
+    """
+
+    def __init__(self, repo_object, ref=None, cache=None):
+        self.repo = repo_object
+        self.ref = ref or repo_object.default_branch
+        self.cache = cache
+        self._sha = None
+        self._entries = None
+        self._children = None
+        self._listed = None
+        self._blobs = {}
+        self._lock = threading.RLock()
+
+    @property
+    def sha(self):
+        """ The commit SHA every read of this snapshot is pinned to. """
+        with self._lock:
+            if self._sha is None:
+                response = self.repo.session.get(self.repo.url + "/commits/" + self.ref,
+                    headers={"Accept": "application/vnd.github.sha"})
+                response.raise_for_status()
+                self._sha = response.text.strip()
+            return self._sha
+
+    def entries(self):
+        """ Returns a dict of repository path to TreeEntry for the whole tree. """
+        with self._lock:
+            self._load()
+            if self._listed is not None:
+                # the listing was truncated, every folder is listed now
+                pending = [""]
+                while pending:
+                    folder = pending.pop()
+                    pending += [path for path in self._list_folder(folder) if self._entries[path].type == "dir"]
+                self._listed = None
+            return self._entries
+
+    @property
+    def complete(self):
+        """ Whether entries() needs no more requests. """
+        with self._lock:
+            self._load()
+            return self._listed is None
+
+    def entry(self, path):
+        with self._lock:
+            self._list_folder(path.rpartition("/")[0])
+            return self._entries.get(path)
+
+    def listing(self, tree_path=None):
+        """ Returns the folder contents as get_all_files_from_folder does. """
+        files = []
+        with self._lock:
+            for path in self._list_folder("/".join(tree_path) if tree_path else ""):
+                entry = self._entries[path]
+                name = entry.path.rpartition("/")[2]
+                if entry.type == "dir":
+                    entry = entry._replace(path=name, num_entries=len(self._list_folder(path)))
+                else:
+                    entry = entry._replace(path=name)
+                files.append( (name, entry.type, entry) )
+        return files
+
+    def _load(self):
+        # a single recursive request lists the whole tree, unless GitHub truncates
+        # it, then folders are listed one request each when first read
+        if self._entries is not None:
+            return
+        tree_json = self.repo.tree(self.sha, recursive=True).as_dict()
+        self._entries = {}
+        self._children = {"": []}
+        if tree_json.get("truncated"):
+            self._listed = set()
+            self._root_sha = tree_json["sha"]
+            return
+        for t in tree_json["tree"]:
+            if t["type"] in GIT_ENTRY_TYPES:
+                self._add(TreeEntry(t["path"], GIT_ENTRY_TYPES[t["type"]], t["sha"], t.get("size"), t["mode"]))
+
+    def _add(self, entry):
+        self._entries[entry.path] = entry
+        self._children.setdefault(entry.path.rpartition("/")[0], []).append(entry.path)
+        if entry.type == "dir":
+            self._children.setdefault(entry.path, [])
+
+    # Returns the paths of the direct entries of folder ("" for the root), listing it
+    # first if the tree was truncated
+    def _list_folder(self, folder):
+        self._load()
+        if self._listed is not None and folder not in self._listed:
+            self._listed.add(folder)
+            if folder:
+                self._list_folder(folder.rpartition("/")[0])
+                entry = self._entries.get(folder)
+                tree_sha = entry.sha if entry is not None and entry.type == "dir" else None
+            else:
+                tree_sha = self._root_sha
+            if tree_sha is not None:
+                prefix = folder + "/" if folder else ""
+                for t in get_git_tree(self.repo, tree_sha, self.cache).as_dict()["tree"]:
+                    if t["type"] in GIT_ENTRY_TYPES:
+                        self._add(TreeEntry(prefix + t["path"], GIT_ENTRY_TYPES[t["type"]], t["sha"], t.get("size"), t["mode"]))
+        return self._children.get(folder, [])
+
+    def blob(self, sha):
+        with self._lock:
+            if sha not in self._blobs:
+                self._blobs[sha] = get_git_blob(self.repo, sha, self.cache)
+            return self._blobs[sha]
+
+    def read(self, path):
+        """ Returns the decoded contents of the file at path, None if there is no such file. """
+        entry = self.entry(path)
+        if entry is None or entry.type != "file":
+            return None
+        return self.blob(entry.sha).decode_content()
+
+    def readme(self, tree_path=None):
+        """ Returns the README of the folder (or of the repository if tree_path is None). """
+        path = self.readme_path(tree_path)
+        if path is None:
+            return None
+        return self.read(path)
+
+    def readme_path(self, tree_path=None):
+        """ Returns the path of the README readme() returns, None if there is none. """
+        if tree_path:
+            folders = [tree_path]
+        else:
+            folders = ROOT_README_FOLDERS
+        for folder in folders:
+            prefix = "/".join(folder) + "/" if folder else ""
+            for name in README_FILES:
+                entry = self.entry(prefix + name)
+                if entry is not None and entry.type == "file":
+                    return prefix + name
+            if tree_path:
+                continue
+            # GitHub also accepts any README.* for the repository README
+            with self._lock:
+                paths = sorted(self._list_folder("/".join(folder)))
+            for path in paths:
+                name = path.rpartition("/")[2]
+                if self._entries[path].type == "file" and name.lower().startswith("readme"):
+                    return path
+        return None
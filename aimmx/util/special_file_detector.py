@@ -36,13 +36,18 @@ def is_special_file(filename):
             return True
     return False
 
-def get_special_file(repo_object, filepath, propertypath, metadata, is_yaml=False):
-    contents = get_file_from_repo(repo_object, filepath)
+# with a RepoSnapshot, files are read from its tree listing so that missing special
+# files cost no request, otherwise every name is probed
+def get_special_file(repo_object, filepath, propertypath, metadata, is_yaml=False, snapshot=None):
+    if snapshot is not None:
+        contents = snapshot.read(filepath)
+    else:
+        contents = get_file_from_repo(repo_object, filepath)
     if contents is None:
         return metadata
     return path_to_object(metadata, contents, propertypath, to_object=True, is_yaml=is_yaml)
 
-def detect_special_files(repo_object, tree_path=None):
+def detect_special_files(repo_object, tree_path=None, snapshot=None):
     result = {}
 
     for k, v in SPECIAL_FILES.items():
@@ -54,7 +59,19 @@ def detect_special_files(repo_object, tree_path=None):
             json_file = k + ".json"
             yaml_file = k + ".yaml"
         path = v
-        result = get_special_file(repo_object, json_file, path, result)
-        result = get_special_file(repo_object, yaml_file, path, result, is_yaml=True)
+        result = get_special_file(repo_object, json_file, path, result, snapshot=snapshot)
+        result = get_special_file(repo_object, yaml_file, path, result, is_yaml=True, snapshot=snapshot)
 
     return result
+
+# Returns the (path, blob SHA) pairs of the special files of a folder, which
+# change exactly when detect_special_files could return something else
+def special_files_fingerprint(snapshot, tree_path=None):
+    prefix = "/".join(tree_path) + "/" if tree_path else ""
+    fingerprint = []
+    for k in SPECIAL_FILES.keys():
+        for path in (prefix + k + ".json", prefix + k + ".yaml"):
+            entry = snapshot.entry(path)
+            if entry is not None and entry.type == "file":
+                fingerprint.append([path, entry.sha])
+    return fingerprint
@@ -0,0 +1,161 @@
+"""
+    Persistent key-value cache backed by a SQLite file.
+
+    Values are JSON serializable objects. The file can be shared by several
+    threads and processes. Entries can expire after a TTL and the cache can
+    be bounded in size, evicting the least recently used entries first.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('total_size', 0);
+"""
+
+# seconds between updates of the access time of an entry, reads of entries used
+# more recently than that do not write
+ACCESS_RESOLUTION = 60
+
+class SqliteCache:
+    """ Key-value cache stored in a SQLite file.
+
+    max_bytes bounds the total size of the stored values (LRU eviction),
+    max_item_bytes skips values that are too large to be worth caching and
+    ttl (in seconds) makes entries older than that count as missing. Sizes
+    are in bytes of the UTF-8 encoded JSON.
+    """
+
+    def __init__(self, path, max_bytes=None, max_item_bytes=None, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.ttl = ttl
+        self.access_resolution = ACCESS_RESOLUTION
+        self._local = threading.local()
+        # every connection opened, so that close() can close those of all threads
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+
+    # one connection per thread and per process
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """ Closes the connections of every thread of this process. """
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def get(self, key, default=None):
+        conn = self._connection()
+        row = conn.execute("SELECT value, created, accessed FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return default
+        now = time.time()
+        if self.ttl is not None and now - row[1] > self.ttl:
+            self.delete(key)
+            return default
+        if now - row[2] >= self.access_resolution:
+            conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        data = json.dumps(value)
+        size = len(data.encode("utf-8"))
+        if self.max_item_bytes is not None and size > self.max_item_bytes:
+            return
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+            old_size = row[0] if row else 0
+            conn.execute("INSERT OR REPLACE INTO cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, data, size, now, now))
+            conn.execute("UPDATE cache_meta SET value = value + ? WHERE name = 'total_size'", (size - old_size,))
+            if self.max_bytes is not None:
+                self._evict(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, key):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                conn.execute("UPDATE cache_meta SET value = value - ? WHERE name = 'total_size'", (row[0],))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM cache")
+            conn.execute("UPDATE cache_meta SET value = 0 WHERE name = 'total_size'")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def total_size(self):
+        row = self._connection().execute("SELECT value FROM cache_meta WHERE name = 'total_size'").fetchone()
+        return row[0]
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    # removes least recently used entries until the cache fits in max_bytes,
+    # must be called inside a write transaction
+    def _evict(self, conn):
+        total = conn.execute("SELECT value FROM cache_meta WHERE name = 'total_size'").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        keys = []
+        freed = 0
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed"):
+            keys.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in keys])
+        conn.execute("UPDATE cache_meta SET value = value - ? WHERE name = 'total_size'", (freed,))
@@ -0,0 +1,97 @@
+"""
+    Outputs of the repo_parse stages of previous extractions, reused when the
+    inputs of a stage (its fingerprint, e.g. the SHA of the README blob) did
+    not change since the previous extraction of the same URL.
+"""
+
+import contextvars
+import json
+
+# reasons the output of the stage running in this context is incomplete, None outside a stage
+_incomplete = contextvars.ContextVar("aimmx_stage_incomplete", default=None)
+
+def mark_incomplete(reason):
+    """ Keeps the output of the running stage from being reused by the next extraction,
+    e.g. when it was cut short by a time budget or a lookup found nothing. """
+    reasons = _incomplete.get()
+    if reasons is not None:
+        reasons.append(reason)
+
+class StageCache:
+    """ Stage outputs kept in store, any object with get(key, default) and
+    set(key, value) storing JSON values such as SqliteCache.
+
+    salt(stage) returns what the output of a stage depends on besides its inputs
+    (e.g. the code and model versions), it is part of every fingerprint so that
+    outputs stored by another version are not reused.
+    """
+
+    def __init__(self, store, salt=None):
+        self.store = store
+        self.salt = salt
+
+    def begin(self, repo_url):
+        """ Returns the StageRun of a new extraction of repo_url. """
+        return StageRun(self.store, "stages:" + repo_url, self.salt)
+
+class StageRun:
+    """ Stages of one extraction, save() stores them for the next one.
+
+    With no store every stage runs, see enabled.
+    """
+
+    def __init__(self, store, key, salt=None):
+        self.store = store
+        self.key = key
+        self.salt = salt
+        self._previous = {}
+        if store is not None:
+            self._previous = store.get(key, None) or {}
+        self._current = {}
+        # names of the stages whose output was reused
+        self.reused = []
+        # stages whose output was not stored, with the reasons they were marked incomplete
+        self.incomplete = {}
+
+    @property
+    def enabled(self):
+        return self.store is not None
+
+    def run(self, stage, fingerprint, func, *args, **kwargs):
+        """ Returns func(*args, **kwargs), or its previous output if fingerprint is the same.
+
+        An output func marked incomplete (see mark_incomplete) is not stored.
+        """
+        if self.store is None:
+            return func(*args, **kwargs)
+        if self.salt is not None:
+            fingerprint = [self.salt(stage), fingerprint]
+        # compared the way it is stored, e.g. tuples become lists
+        fingerprint = json.loads(json.dumps(fingerprint))
+        previous = self._previous.get(stage)
+        if previous is not None and previous["fingerprint"] == fingerprint:
+            self.reused.append(stage)
+            output = previous["output"]
+        else:
+            reasons = []
+            token = _incomplete.set(reasons)
+            try:
+                output = func(*args, **kwargs)
+            finally:
+                _incomplete.reset(token)
+            if reasons:
+                self.incomplete[stage] = reasons
+                return output
+        try:
+            data = json.dumps(output)
+        except TypeError:
+            # not storable, always rerun
+            return output
+        self._current[stage] = {"fingerprint": fingerprint, "output": json.loads(data)}
+        return json.loads(data)
+
+    def save(self):
+        if self.store is None or not self._current:
+            return
+        # stages that did not run this time (e.g. not in fields) are kept
+        self.store.set(self.key, {**self._previous, **self._current})
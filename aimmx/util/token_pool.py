@@ -0,0 +1,127 @@
+"""
+    Pool of GitHub tokens shared by the requests of a client.
+
+    Every request is sent with the token that has the most rate limit budget
+    left, as reported by the X-RateLimit headers of its last response. Requests
+    only wait when every token is exhausted, and requests rejected by the rate
+    limit are retried with another token.
+"""
+
+import logging
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# budget assumed for a token until a response reports it
+DEFAULT_LIMIT = 5000
+DEFAULT_MAX_RETRIES = 3
+# GitHub returns the reset time in whole seconds
+RESET_MARGIN = 1
+
+class TokenPool:
+    """ Tracks the remaining requests and reset time of each token. """
+
+    def __init__(self, tokens, sleep=time.sleep):
+        tokens = list(dict.fromkeys(t for t in tokens if t))
+        if not tokens:
+            raise ValueError("TokenPool needs at least one token")
+        self.tokens = tokens
+        self._sleep = sleep
+        # token -> [remaining, reset timestamp]
+        self._budget = {t: [DEFAULT_LIMIT, 0] for t in tokens}
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """ Returns the token with the most budget, waits for a reset if all are exhausted. """
+        while True:
+            with self._lock:
+                now = time.time()
+                for budget in self._budget.values():
+                    # a reset of 0 is unknown, the token is tried again
+                    if budget[0] <= 0 and now >= budget[1]:
+                        budget[0] = DEFAULT_LIMIT
+                        budget[1] = 0
+                token = max(self.tokens, key=lambda t: self._budget[t][0])
+                budget = self._budget[token]
+                if budget[0] > 0:
+                    # counted before the response arrives so that concurrent requests spread out
+                    budget[0] -= 1
+                    return token
+                wait = min(b[1] for b in self._budget.values()) - now + RESET_MARGIN
+            logger.warning("All GitHub tokens are rate limited, waiting %d seconds", int(wait))
+            self._sleep(max(wait, RESET_MARGIN))
+
+    def update(self, token, response):
+        """ Records the budget reported by a response sent with token. """
+        headers = response.headers
+        # search and graphql have budgets of their own
+        if headers.get("X-RateLimit-Resource", "core") != "core":
+            return
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or token not in self._budget:
+            return
+        with self._lock:
+            self._budget[token][0] = int(remaining)
+            if reset is not None:
+                self._budget[token][1] = int(reset)
+
+    def exhaust(self, token, reset):
+        """ Marks token as unusable until the reset timestamp. """
+        with self._lock:
+            if token in self._budget:
+                self._budget[token] = [0, reset]
+
+    def remaining(self):
+        """ Returns the known remaining requests of each token. """
+        with self._lock:
+            return {t: b[0] for t, b in self._budget.items()}
+
+class TokenPoolAuth(requests.auth.AuthBase):
+    """ requests auth that signs each request with a token of the pool. """
+
+    def __init__(self, pool, max_retries=DEFAULT_MAX_RETRIES):
+        self.pool = pool
+        self.max_retries = max_retries
+
+    def __call__(self, request):
+        request.headers["Authorization"] = "token " + self.pool.acquire()
+        request.register_hook("response", self.handle_response)
+        return request
+
+    def handle_response(self, response, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            token = response.request.headers["Authorization"][len("token "):]
+            self.pool.update(token, response)
+            reset = rate_limit_reset(response)
+            if reset is None or attempt == self.max_retries:
+                return response
+            self.pool.exhaust(token, reset)
+
+            # resend on the adapter directly, response hooks are not run again
+            retry = response.request.copy()
+            retry.headers["Authorization"] = "token " + self.pool.acquire()
+            response.content
+            response.close()
+            new_response = response.connection.send(retry, **kwargs)
+            # every rejected response, oldest first like redirects
+            new_response.history = response.history + [response]
+            new_response.request = retry
+            response = new_response
+        return response
+
+# Returns when the token used for response can be used again if the request was
+# rejected by the rate limit, None otherwise
+def rate_limit_reset(response):
+    if response.status_code not in (403, 429):
+        return None
+    headers = response.headers
+    if "Retry-After" in headers:
+        # secondary rate limits
+        return time.time() + int(headers["Retry-After"])
+    if headers.get("X-RateLimit-Remaining") == "0" and "X-RateLimit-Reset" in headers:
+        return int(headers["X-RateLimit-Reset"])
+    return None
@@ -0,0 +1,72 @@
+"""
+    Checks that readme_cleanup gives the inference models the same input as
+    the previous implementation (markdownToText) on the benchmark READMEs.
+
+    The models only see the counts of the lowercased words of the text (their
+    CountVectorizer token pattern, without English stop words), so these are
+    compared rather than the strings. The score of a README is the share of its
+    words found in both outputs.
+
+    Usage: python benchmarks/cleanup_parity.py [--min-score SCORE] [-v]
+"""
+
+import argparse
+import collections
+import os
+import re
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+import corpus
+
+# token_pattern of the CountVectorizers of the domain inference models
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+DEFAULT_MIN_SCORE = 0.98
+
+def words(text, stop_words):
+    return collections.Counter(w for w in TOKEN_PATTERN.findall(text.lower()) if w not in stop_words)
+
+def score(old, new):
+    """ Share of the words of the two bags found in both. """
+    common = sum((old & new).values())
+    total = max(sum(old.values()), sum(new.values()))
+    return common / total if total else 1.0
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--min-score", type=float, default=DEFAULT_MIN_SCORE,
+        help="fail if a README scores below this")
+    arg_parser.add_argument("-v", "--verbose", action="store_true",
+        help="print the words that differ")
+    args = arg_parser.parse_args(argv)
+
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    from aimmx.util.readme_cleanup import markdownToText, readme_cleanup
+
+    failed = False
+    for name, text in corpus.readme_inputs().items():
+        start = time.perf_counter()
+        old = words(markdownToText(text), ENGLISH_STOP_WORDS)
+        old_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        new = words(readme_cleanup(text), ENGLISH_STOP_WORDS)
+        new_seconds = time.perf_counter() - start
+
+        result = score(old, new)
+        print("{:<28} {:.4f}   markdownToText {:>7.1f} ms   readme_cleanup {:>7.1f} ms".format(
+            name, result, old_seconds * 1000, new_seconds * 1000))
+        if args.verbose and result < 1:
+            print("    missing:", dict((old - new).most_common(10)))
+            print("    extra:  ", dict((new - old).most_common(10)))
+        if result < args.min_score:
+            print("FAIL: {} scores {:.4f}, below {}".format(name, result, args.min_score))
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+    The inputs of the benchmarks: the READMEs in benchmarks/corpus (real_*.md
+    are READMEs of published model and machine learning projects, with their
+    citations, see SOURCES.txt, the others are written to exercise the
+    extractors), documents generated from a fixed seed (a very long
+    autogenerated README ending in a bibtex section, one made of very long
+    lines, one of almost-references) and the fake repository in
+    benchmarks/fixtures.
+"""
+
+import os
+import random
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BENCHMARKS_DIR, "corpus")
+FAKE_REPO_DIR = os.path.join(BENCHMARKS_DIR, "fixtures", "fake_repo")
+
+DEFAULT_SEED = 20190801
+
+WORDS = ("model network training dataset image text accuracy layer convolutional "
+    "attention embedding transformer loss optimizer gradient batch inference "
+    "pretrained weights checkpoint evaluation benchmark classification detection "
+    "segmentation translation the a of and to in for with on is are we this that "
+    "using from by our results table figure see below").split()
+
+DATASET_NAMES = ["ImageNet", "COCO", "CIFAR-10", "MNIST", "SQuAD", "Cityscapes",
+    "Penn Treebank", "WikiText-103", "LibriSpeech", "Pascal VOC"]
+
+LANGUAGES = ["python", "bash", "json", "", "yaml"]
+
+# python 2 code, which ast cannot parse, kept here so that the tree still compiles
+PY2_SOURCE = """\
+# python 2 code that does not parse with ast on python 3
+import cPickle as pickle
+import urllib2
+from itertools import izip
+
+import caffe
+from caffe import layers as L, params as P
+
+
+def load(path):
+    print "loading", path
+    with open(path) as f:
+        return pickle.load(f)
+
+
+def fetch(url):
+    try:
+        return urllib2.urlopen(url).read()
+    except urllib2.URLError, e:
+        print >>sys.stderr, e
+        return None
+"""
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    """ Returns {name: text} of the bundled READMEs, sorted by name. """
+    corpus = {}
+    for filename in sorted(os.listdir(corpus_dir)):
+        if filename.endswith(".md"):
+            with open(os.path.join(corpus_dir, filename), encoding="utf-8") as f:
+                corpus[os.path.splitext(filename)[0]] = f.read()
+    return corpus
+
+def generate_long_readme(seed=DEFAULT_SEED, sections=400):
+    """ A README as produced by API documentation generators: hundreds of sections
+    with parameter tables, code samples, links and arXiv references. """
+    rnd = random.Random(seed)
+    lines = ["# Autogenerated API reference", "", _paragraph(rnd, 5), ""]
+    for i in range(sections):
+        lines.append("{} `module_{}.function_{}`".format(rnd.choice(["##", "###"]), i % 37, i))
+        lines.append("")
+        lines.append(_paragraph(rnd, rnd.randint(2, 6)))
+        lines.append("")
+        if rnd.random() < 0.6:
+            lines.append("| Parameter | Type | Default | Description |")
+            lines.append("| --------- | ---- | ------- | ----------- |")
+            for j in range(rnd.randint(2, 8)):
+                lines.append("| `arg_{}` | {} | `{}` | {} |".format(j, rnd.choice(["int", "float", "str", "Tensor"]),
+                    rnd.randint(0, 100), _sentence(rnd)))
+            lines.append("")
+        if rnd.random() < 0.5:
+            lines.append("```" + rnd.choice(LANGUAGES))
+            for j in range(rnd.randint(3, 12)):
+                lines.append("result_{} = module_{}.function_{}(arg_{}={})".format(j, i % 37, i, j, rnd.randint(0, 9)))
+            lines.append("```")
+            lines.append("")
+        if rnd.random() < 0.3:
+            lines.append("Trained on the [{0} dataset](https://example.org/datasets/{1}) as described in "
+                "[the paper](https://arxiv.org/abs/{2}.{3:05d}).".format(rnd.choice(DATASET_NAMES), i,
+                rnd.randint(1501, 2012), rnd.randint(1, 20000)))
+            lines.append("")
+        if rnd.random() < 0.1:
+            lines.append("* _A. Author, B. Author_, [\"{}\"](https://arxiv.org/abs/{}.{:05d}) arXiv preprint, {}.".format(
+                _sentence(rnd), rnd.randint(1501, 2012), rnd.randint(1, 20000), rnd.randint(2015, 2020)))
+            lines.append("")
+    lines.append("## References")
+    lines.append("")
+    lines.append("```bibtex")
+    for i in range(60):
+        lines.append("@article{{ref{},".format(i))
+        lines.append("  title={{{}}},".format(_sentence(rnd)))
+        lines.append("  author={Author, A. and Author, B.},")
+        lines.append("  journal={{arXiv preprint arXiv:{}.{:05d}}},".format(rnd.randint(1501, 2012), rnd.randint(1, 20000)))
+        lines.append("  year={{{}}}".format(rnd.randint(2015, 2020)))
+        lines.append("}")
+        lines.append("")
+    lines.append("```")
+    return "\n".join(lines) + "\n"
+
+def generate_long_lines(seed=DEFAULT_SEED, lines=20, line_length=8000):
+    """ A README of a few very long lines (minified HTML, base64 images, one-line
+    tables) that stress patterns scanning to the end of a line. """
+    rnd = random.Random(seed)
+    out = ["# Long lines", ""]
+    for i in range(lines):
+        kind = i % 4
+        if kind == 0:
+            out.append("".join("<td>[{}](https://example.org/{})</td>".format(rnd.choice(WORDS), j)
+                for j in range(line_length // 40)))
+        elif kind == 1:
+            out.append("![badge](data:image/png;base64," + "".join(rnd.choice("ABCDEFabcdef0123456789+/")
+                for _ in range(line_length)) + ")")
+        elif kind == 2:
+            out.append("| " + " | ".join(rnd.choice(WORDS) for _ in range(line_length // 8)) + " |")
+        else:
+            out.append(" ".join(rnd.choice(WORDS + ["(", ")", "[", "]", "*", "_"]) for _ in range(line_length // 6)))
+        out.append("")
+    return "\n".join(out)
+
+def generate_reference_stress(seed=DEFAULT_SEED, lines=1000):
+    """ A README of reference-like lines that never complete a reference (no year,
+    no link after the title), which made the reference patterns backtrack over the
+    rest of the document from every line. """
+    rnd = random.Random(seed)
+    out = ["# References", ""]
+    for i in range(lines):
+        if i % 2 == 0:
+            out.append("* _{}_, [{}](https://example.org/{}). {}".format(_sentence(rnd), _sentence(rnd), i,
+                _sentence(rnd)))
+        else:
+            out.append("[{}] {} [\"{}".format(i, _sentence(rnd), _sentence(rnd)))
+    return "\n".join(out) + "\n"
+
+def generate_python_source(seed=DEFAULT_SEED, functions=2000):
+    """ A large python module for the import scanner. """
+    rnd = random.Random(seed)
+    lines = ["import os", "import sys", "from collections import defaultdict", ""]
+    for i in range(functions):
+        if i % 50 == 0:
+            lines.append("import pkg_{}.sub as sub_{}".format(i, i))
+        lines.append("def function_{}(x, y={}):".format(i, rnd.randint(0, 9)))
+        lines.append("    \"\"\" {} \"\"\"".format(_sentence(rnd)))
+        lines.append("    return [v * y for v in range(x) if v % {} == 0]".format(rnd.randint(1, 7)))
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+def readme_inputs(seed=DEFAULT_SEED):
+    """ Returns {name: text} of every README the benchmarks run on. """
+    inputs = load_corpus()
+    inputs["generated_long_readme"] = generate_long_readme(seed)
+    inputs["generated_long_lines"] = generate_long_lines(seed)
+    inputs["generated_reference_stress"] = generate_reference_stress(seed)
+    return inputs
+
+def fake_repo_files(fake_repo_dir=FAKE_REPO_DIR):
+    """ Returns the paths of the python files and notebooks of the fake repository. """
+    paths = []
+    for root, dirs, files in os.walk(fake_repo_dir):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.endswith(".py") or filename.endswith(".ipynb"):
+                paths.append(os.path.join(root, filename))
+    return paths
+
+def _sentence(rnd):
+    words = [rnd.choice(WORDS) for _ in range(rnd.randint(6, 16))]
+    return " ".join(words).capitalize()
+
+def _paragraph(rnd, sentences):
+    return ". ".join(_sentence(rnd) for _ in range(sentences)) + "."
@@ -0,0 +1,24 @@
+import math
+
+import tensorflow as tf
+from tensorflow.keras import layers, Model
+import keras.backend as K
+
+
+class SegNet(Model):
+    def __init__(self, num_classes=19):
+        super().__init__()
+        self.encoder = [layers.Conv2D(64 * 2 ** i, 3, padding="same", activation="relu") for i in range(4)]
+        self.decoder = [layers.Conv2DTranspose(64 * 2 ** (3 - i), 3, strides=2, padding="same") for i in range(4)]
+        self.head = layers.Conv2D(num_classes, 1)
+
+    def call(self, x):
+        for conv in self.encoder:
+            x = layers.MaxPool2D()(conv(x))
+        for deconv in self.decoder:
+            x = deconv(x)
+        return self.head(x)
+
+
+def init_scale(fan_in):
+    return math.sqrt(2.0 / fan_in)
@@ -0,0 +1,63 @@
+"""
+    Training entry point of the fake repository used by the benchmarks.
+"""
+
+import argparse
+import os
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+import torchvision.transforms as T
+
+from model.network import SegNet
+from .utils import AverageMeter
+
+try:
+    import apex
+    from apex import amp
+except ImportError:
+    amp = None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--lr", type=float, default=0.01)
+    parser.add_argument("--data-dir", default="data/")
+    return parser.parse_args()
+
+
+def train_epoch(model, loader, optimizer, device):
+    model.train()
+    meter = AverageMeter()
+    for images, labels in loader:
+        images, labels = images.to(device), labels.to(device)
+        optimizer.zero_grad()
+        loss = F.cross_entropy(model(images), labels, ignore_index=255)
+        loss.backward()
+        optimizer.step()
+        meter.update(loss.item(), images.size(0))
+    return meter.avg
+
+
+def main():
+    args = parse_args()
+    import tensorboardX
+    writer = tensorboardX.SummaryWriter(os.path.join(args.data_dir, "runs"))
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = SegNet(num_classes=19).to(device)
+    optimizer = torch.optim.SGD(model.parameters(), lr=args.lr, momentum=0.9)
+    text = "import fake_module_in_string"
+    for epoch in range(args.epochs):
+        loss = train_epoch(model, None, optimizer, device)
+        writer.add_scalar("loss", loss, epoch)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import logging
+import time
+from functools import wraps
+
+import yaml
+import mxnet as mx
+import \
+    chainer, \
+    theano
+
+log = logging.getLogger(__name__)
+
+
+class AverageMeter(object):
+    def __init__(self):
+        self.sum = 0.0
+        self.count = 0
+
+    def update(self, value, n=1):
+        self.sum += value * n
+        self.count += n
+
+    @property
+    def avg(self):
+        return self.sum / max(self.count, 1)
+
+
+def timed(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.time()
+        result = func(*args, **kwargs)
+        log.debug("%s took %.3fs", func.__name__, time.time() - start)
+        return result
+    return wrapper
@@ -0,0 +1,62 @@
+"""
+    Measures how long `import aimmx` takes and checks that heavy third-party
+    modules and the inference models are not loaded at import time.
+
+    Usage: python benchmarks/import_time.py [--runs N] [--max-ms MS]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that should only be imported when the functionality is used
+HEAVY_MODULES = ["github3", "arxiv", "bibtexparser", "bs4", "markdown", "git",
+    "joblib", "sklearn", "numpy", "yaml"]
+
+DEFAULT_MAX_MS = 250
+
+def measure_import_ms():
+    """ Returns the cumulative import time of aimmx in a fresh interpreter. """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import aimmx"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == "aimmx":
+            return int(parts[1].strip()) / 1000.0
+    raise RuntimeError("aimmx not found in -X importtime output")
+
+def loaded_heavy_modules():
+    code = "import sys, json, aimmx; print(json.dumps([m for m in {} if m in sys.modules]))".format(HEAVY_MODULES)
+    proc = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT,
+        capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout)
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--runs", type=int, default=5)
+    arg_parser.add_argument("--max-ms", type=float, default=DEFAULT_MAX_MS,
+        help="fail if the median import time is above this")
+    args = arg_parser.parse_args(argv)
+
+    timings = [measure_import_ms() for _ in range(args.runs)]
+    median = statistics.median(timings)
+    print("import aimmx: median {:.1f} ms, min {:.1f} ms, max {:.1f} ms over {} runs".format(
+        median, min(timings), max(timings), args.runs))
+
+    failed = False
+    heavy = loaded_heavy_modules()
+    if heavy:
+        print("FAIL: heavy modules imported by `import aimmx`:", ", ".join(heavy))
+        failed = True
+    if median > args.max_ms:
+        print("FAIL: import time above {:.1f} ms".format(args.max_ms))
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
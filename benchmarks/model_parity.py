@@ -0,0 +1,72 @@
+"""
+    Checks that the compact models (aimmx.domain_inference.compact_models)
+    give the same probabilities as the joblib pipelines they were exported
+    from, on the benchmark READMEs.
+
+    The joblib models are exported to a temporary folder unless --compact-dir
+    points to an existing export. Needs a scikit-learn that can load the
+    shipped pickles, otherwise the check is skipped and exits with status 2
+    (0 with --allow-skip). tests/test_compact_models.py checks the export on
+    small pipelines fitted with the installed scikit-learn.
+
+    Usage: python benchmarks/model_parity.py [--compact-dir DIR] [--max-diff DIFF] [--allow-skip]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+import corpus
+
+DEFAULT_MAX_DIFF = 1e-9
+SKIPPED_STATUS = 2
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--compact-dir", help="compare with this export instead of exporting")
+    arg_parser.add_argument("--max-diff", type=float, default=DEFAULT_MAX_DIFF,
+        help="fail if a probability differs by more than this")
+    arg_parser.add_argument("--allow-skip", action="store_true",
+        help="exit with status 0 if the joblib models do not load")
+    args = arg_parser.parse_args(argv)
+
+    import numpy as np
+    from aimmx.domain_inference.domain_inference import load_joblib_models
+    from aimmx.domain_inference.compact_models import export_models, load_compact_models
+
+    try:
+        original = load_joblib_models()
+    except Exception as e:
+        print("SKIPPED: the joblib models do not load, {}: {}".format(type(e).__name__, e))
+        return 0 if args.allow_skip else SKIPPED_STATUS
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        compact_dir = args.compact_dir
+        if compact_dir is None:
+            compact_dir = tmp_dir
+            # exporting shares the featurization steps of original, which does not change them
+            export_models(original, compact_dir)
+        compact = load_compact_models(compact_dir)
+
+        readmes = list(corpus.readme_inputs().values())
+        failed = False
+        for name, model in sorted(original.items()):
+            if not hasattr(model, "steps"):
+                if list(model.classes_) != list(compact[name].classes_):
+                    print("FAIL: {} classes differ".format(name))
+                    failed = True
+                continue
+            diff = np.abs(model.predict_proba(readmes) - compact[name].predict_proba(readmes)).max()
+            print("{:<24} max difference {:.3g}".format(name, diff))
+            if diff > args.max_diff:
+                print("FAIL: {} differs by more than {}".format(name, args.max_diff))
+                failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
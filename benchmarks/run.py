@@ -0,0 +1,374 @@
+"""
+    Offline benchmarks of the README analysis pipeline: runs readme_parse_text,
+    detect_references (with arXiv stubbed), detect_datasets, readme_cleanup,
+    domain_inference and extract_modules on the inputs of benchmarks/corpus.py,
+    reports their throughput and peak memory and compares them to a baseline.
+
+    Timings are the median of --repeat calls (garbage collection off), each
+    relative to a calibration loop run after it. When the shipped domain models
+    do not load (e.g. pickles of another scikit-learn version), domain_inference
+    runs on stand-in models of the same structure fitted on the corpus, and is
+    only compared to a baseline recorded with the same kind of models.
+
+    The baseline is recorded over --runs runs of the suite and keeps how much
+    each benchmark varied between them, which widens its tolerance. A benchmark
+    over its tolerance is measured again (--confirm times) and only fails if it
+    is over every time, so that a burst of load on the machine is not reported.
+
+    Usage: python benchmarks/run.py [--only NAME] [--repeat N] [--save-baseline]
+        [--runs N] [--confirm N] [--baseline PATH] [--tolerance RATIO]
+        [--memory-tolerance RATIO]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+import corpus
+
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+DEFAULT_REPEAT = 7
+# runs of the suite a baseline is recorded over
+DEFAULT_BASELINE_RUNS = 3
+# measurements of a regressed benchmark before it fails
+DEFAULT_CONFIRM = 2
+# a benchmark regresses if it is this much slower (or bigger) than its baseline
+DEFAULT_TOLERANCE = 0.3
+DEFAULT_MEMORY_TOLERANCE = 0.3
+# timings are scaled by the time of a pure-python loop of this many iterations run
+# after every timed call, so that a baseline recorded on another machine (or while
+# this one ran at another speed) stays usable
+CALIBRATION_ITERATIONS = 50000
+# differences below these are noise, whatever the ratio
+MIN_SECONDS_DELTA = 0.01
+MIN_PEAK_KB_DELTA = 256
+
+BLOB_LINK = "https://github.com/example/repo/blob/master/"
+
+def stub_arxiv():
+    """ Answers arXiv lookups locally so detect_references measures the parsing only. """
+    from aimmx.reference_detector import arxiv_reader
+    def search_arxiv_id(id):
+        return {
+            "title": "Paper " + id,
+            "arxiv": id,
+            "year": 2000 + int(id[:2]),
+            "url": "http://arxiv.org/abs/" + id,
+            "abstract": "Abstract of paper " + id,
+            "authors": ["A. Author", "B. Author"]
+        }
+    arxiv_reader.search_arxiv_id = search_arxiv_id
+
+def reset_arxiv():
+    # every call does the same (stubbed) lookups instead of hitting the in-memory records
+    from aimmx.reference_detector.arxiv_reader import configure_arxiv_cache
+    configure_arxiv_cache()
+
+def bench_readme_parse_text(text):
+    from aimmx.readme_parsers import readme_parse_text
+    reset_arxiv()
+    return readme_parse_text(text, BLOB_LINK, check_datasets=True)
+
+def bench_detect_references(text):
+    from aimmx.reference_detector.reference_detector import detect_references
+    reset_arxiv()
+    return detect_references(text)
+
+def bench_detect_datasets(text):
+    from aimmx.dataset_detector.dataset_detector import detect_datasets
+    return detect_datasets(text, BLOB_LINK)
+
+def bench_readme_cleanup(text):
+    from aimmx.util.readme_cleanup import readme_cleanup
+    return readme_cleanup(text)
+
+def bench_domain_inference(text):
+    from aimmx.domain_inference.domain_inference import domain_inference
+    return domain_inference(text)
+
+def bench_extract_modules(text):
+    from aimmx.framework_detector.clone import extract_modules
+    return extract_modules(text)
+
+def bench_scan_files(paths):
+    from aimmx.framework_detector.import_scanner import scan_file, top_level_modules
+    return [top_level_modules(scan_file(path)) for path in paths]
+
+# words the corpus paragraphs are labelled by to fit the stand-in models
+STANDIN_DOMAIN_WORDS = {
+    "vision_domain_pipeline": ["image", "images", "vision", "pixel", "detection", "segmentation"],
+    "nlp_domain_pipeline": ["text", "language", "translation", "token", "sentence", "word"],
+    "other_domain_pipeline": ["graph", "audio", "speech", "reinforcement", "tabular", "series"],
+}
+STANDIN_TASK_WORDS = {
+    "vision": ["classification", "detection", "segmentation", "generation"],
+    "nlp": ["translation", "classification", "summarization", "embedding"],
+    "other": ["graph", "audio", "reinforcement", "tabular"],
+}
+
+def setup_domain_inference():
+    """ Loads the shipped models, or fits stand-in models if they do not load (e.g.
+    pickles of another scikit-learn version). Returns "shipped" or "standin". """
+    from aimmx.domain_inference import domain_inference
+    try:
+        domain_inference.warmup()
+        return "shipped"
+    except Exception as e:
+        print("{:<20} the shipped models do not load ({}: {}), using stand-in models".format(
+            "domain_inference", type(e).__name__, e))
+    loaded = fit_standin_models()
+    domain_inference._featurizations = domain_inference.share_featurizations(loaded,
+        domain_inference.DOMAIN_PIPELINES)
+    domain_inference._models = loaded
+    return "standin"
+
+def fit_standin_models(seed=corpus.DEFAULT_SEED):
+    """ Returns models named as the shipped ones, with the same steps (CountVectorizer,
+    TfidfTransformer and sigmoid-calibrated LinearSVC), fitted on the corpus paragraphs. """
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import LabelEncoder
+    from sklearn.svm import LinearSVC
+
+    paragraphs = [p for text in corpus.readme_inputs(seed).values() for p in text.split("\n\n") if p.strip()]
+    paragraphs = random.Random(seed).sample(paragraphs, min(len(paragraphs), 2000))
+    words = [set(p.lower().split()) for p in paragraphs]
+
+    def fit(labels):
+        pipeline = Pipeline([
+            ("cv", CountVectorizer(strip_accents="unicode", stop_words="english")),
+            ("tf", TfidfTransformer()),
+            ("clf", CalibratedClassifierCV(LinearSVC(random_state=0), method="sigmoid", cv=3)),
+        ])
+        return pipeline.fit(paragraphs, labels)
+
+    loaded = {}
+    # fitted on the same paragraphs, the domain pipelines share their featurization
+    for name, domain_words in STANDIN_DOMAIN_WORDS.items():
+        loaded[name] = fit([int(any(w in ws for w in domain_words)) for ws in words])
+    for domain, task_words in STANDIN_TASK_WORDS.items():
+        # the first task word of the paragraph, or else one in turn so that every task has examples
+        labels = [next((w for w in task_words if w in ws), task_words[i % len(task_words)])
+            for i, ws in enumerate(words)]
+        le = LabelEncoder().fit(task_words)
+        loaded["other_pipeline" if domain == "other" else domain + "_task_pipeline"] = fit(le.transform(labels))
+        loaded[domain + "_le"] = le
+    return loaded
+
+def build_cases():
+    """ Returns [(benchmark, input name, func, input, size in bytes)] and {benchmark: setup}. """
+    readmes = corpus.readme_inputs()
+    cases = []
+    for bench, func in [("readme_parse_text", bench_readme_parse_text),
+            ("detect_references", bench_detect_references),
+            ("detect_datasets", bench_detect_datasets),
+            ("readme_cleanup", bench_readme_cleanup),
+            ("domain_inference", bench_domain_inference)]:
+        for name, text in readmes.items():
+            cases.append((bench, name, func, text, len(text.encode("utf-8"))))
+
+    sources = {}
+    for path in corpus.fake_repo_files():
+        if path.endswith(".py"):
+            with open(path, encoding="utf-8") as f:
+                sources[os.path.relpath(path, corpus.FAKE_REPO_DIR)] = f.read()
+    sources["legacy_py2.py"] = corpus.PY2_SOURCE
+    sources["generated_module.py"] = corpus.generate_python_source()
+    for name, text in sources.items():
+        cases.append(("extract_modules", name, bench_extract_modules, text, len(text.encode("utf-8"))))
+
+    paths = corpus.fake_repo_files()
+    cases.append(("extract_modules", "fake_repo", bench_scan_files, paths,
+        sum(os.path.getsize(path) for path in paths)))
+    return cases, {"domain_inference": setup_domain_inference}
+
+def calibrate(iterations=CALIBRATION_ITERATIONS):
+    """ Seconds taken by a fixed pure-python workload. """
+    start = time.perf_counter()
+    total = 0
+    words = {}
+    for i in range(iterations):
+        total += i * i % 7
+        words[str(i % 1000)] = total
+    return time.perf_counter() - start
+
+def measure(func, data, repeat):
+    """ Returns (median seconds of repeat calls, median of their ratios to the
+    calibration run after each, peak bytes allocated by a call). """
+    func(data)
+    seconds = []
+    calibrations = []
+    for _ in range(repeat):
+        # as timeit does, the garbage collections of earlier calls are not timed
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func(data)
+            seconds.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+        calibrations.append(calibrate())
+    tracemalloc.start()
+    try:
+        func(data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    ratios = [s / c for s, c in zip(seconds, calibrations)]
+    return statistics.median(seconds), statistics.median(ratios), peak
+
+def run(cases, setups, repeat, only=None, keys=None, variants=None, skipped=None, quiet=False):
+    """ Measures the cases of the benchmarks in only (all if None), or of the keys
+    ("benchmark/input") if given. variants is what the setup of each benchmark returned,
+    e.g. the kind of models it runs on, and skipped why the benchmarks whose setup
+    failed are skipped, setups that already ran are removed from setups. """
+    results = {}
+    if variants is None:
+        variants = {}
+    if skipped is None:
+        skipped = {}
+    for bench, name, func, data, size in cases:
+        if only and bench not in only:
+            continue
+        if keys is not None and bench + "/" + name not in keys:
+            continue
+        if bench in skipped:
+            continue
+        setup = setups.pop(bench, None)
+        if setup is not None:
+            try:
+                variants[bench] = setup()
+            except Exception as e:
+                skipped[bench] = "{}: {}".format(type(e).__name__, e)
+                print("{:<20} skipped: {}".format(bench, skipped[bench]))
+                continue
+        seconds, relative, peak = measure(func, data, repeat)
+        key = bench + "/" + name
+        results[key] = {
+            "bytes": size,
+            "seconds": seconds,
+            "mb_per_s": size / seconds / 1e6 if seconds > 0 else None,
+            "relative": relative,
+            "peak_kb": peak / 1024.0
+        }
+        if variants.get(bench) is not None:
+            results[key]["variant"] = variants[bench]
+        if not quiet:
+            print("{:<20} {:<28} {:>9.1f} ms {:>9.2f} MB/s {:>10.0f} KB peak".format(
+                bench, name, seconds * 1000, results[key]["mb_per_s"] or 0, results[key]["peak_kb"]))
+    return results, skipped
+
+def merge_runs(runs):
+    """ Returns the baseline results of several runs: the median timings, the largest
+    peak and in noise how far the slowest run was above the median relative timing. """
+    merged = {}
+    for key in runs[0]:
+        results = [r[key] for r in runs if key in r]
+        relatives = [r["relative"] for r in results]
+        result = dict(results[0])
+        result["relative"] = statistics.median(relatives)
+        result["seconds"] = statistics.median(r["seconds"] for r in results)
+        result["mb_per_s"] = result["bytes"] / result["seconds"] / 1e6 if result["seconds"] > 0 else None
+        result["peak_kb"] = max(r["peak_kb"] for r in results)
+        result["noise"] = max(relatives) / result["relative"] - 1 if result["relative"] > 0 else 0
+        merged[key] = result
+    return merged
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """ Returns the descriptions of the results that regressed from the baseline. """
+    regressions = []
+    for key, result in sorted(results.items()):
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        if base.get("variant") != result.get("variant"):
+            print("{}: not compared, the baseline ran on {} and this run on {}".format(
+                key, base.get("variant"), result.get("variant")))
+            continue
+        # relative to the speed of the machine at the time of each call, with the
+        # tolerance widened by how much the benchmark varied while recording the baseline
+        expected = base["relative"] * result["seconds"] / result["relative"]
+        allowed = 1 + tolerance + base.get("noise", 0)
+        if result["seconds"] > expected * allowed and result["seconds"] - expected > MIN_SECONDS_DELTA:
+            regressions.append((key, "{}: {:.1f} ms, baseline {:.1f} ms (scaled), allowed {:.0f}% more".format(
+                key, result["seconds"] * 1000, expected * 1000, (allowed - 1) * 100)))
+        if (result["peak_kb"] > base["peak_kb"] * (1 + memory_tolerance)
+                and result["peak_kb"] - base["peak_kb"] > MIN_PEAK_KB_DELTA):
+            regressions.append((key, "{}: {:.0f} KB peak, baseline {:.0f} KB".format(
+                key, result["peak_kb"], base["peak_kb"])))
+    return regressions
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--only", action="append",
+        help="only run this benchmark (repeatable)")
+    arg_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    arg_parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    arg_parser.add_argument("--save-baseline", action="store_true",
+        help="record the results as the new baseline instead of comparing")
+    arg_parser.add_argument("--runs", type=int, default=DEFAULT_BASELINE_RUNS,
+        help="runs of the suite a baseline is recorded over (default {})".format(DEFAULT_BASELINE_RUNS))
+    arg_parser.add_argument("--confirm", type=int, default=DEFAULT_CONFIRM,
+        help="measurements of a regressed benchmark before it fails (default {})".format(DEFAULT_CONFIRM))
+    arg_parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+        help="fail if a benchmark is slower than its baseline by more than this ratio")
+    arg_parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE,
+        help="fail if a peak is above its baseline by more than this ratio")
+    args = arg_parser.parse_args(argv)
+
+    stub_arxiv()
+    cases, setups = build_cases()
+    variants = {}
+    skipped = {}
+    results, _ = run(cases, setups, args.repeat, args.only, variants=variants, skipped=skipped)
+
+    if args.save_baseline:
+        runs = [results]
+        for i in range(1, args.runs):
+            print("run {} of {}".format(i + 1, args.runs))
+            runs.append(run(cases, setups, args.repeat, args.only, variants=variants, skipped=skipped,
+                quiet=True)[0])
+        baseline = {"python": platform.python_version(), "results": merge_runs(runs)}
+        if args.only and os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                previous = json.load(f)
+            previous["results"].update(results)
+            baseline["results"] = previous["results"]
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("baseline saved to", args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline at {}, run with --save-baseline first".format(args.baseline))
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+    for attempt in range(args.confirm):
+        if not regressions:
+            break
+        keys = set(key for key, _ in regressions)
+        print("measuring again:", ", ".join(sorted(keys)))
+        results, _ = run(cases, setups, args.repeat, keys=keys, variants=variants, skipped=skipped)
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+    for _, regression in regressions:
+        print("FAIL:", regression)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
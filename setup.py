@@ -1,4 +1,4 @@
-from setuptools import setup
+from setuptools import setup, find_packages
 
 VERSION="0.0.1"
 setup(
@@ -9,7 +9,12 @@ setup(
     author='Jason Tsay',
     author_email='jason.tsay@ibm.com',
     license='IBM',
-    packages=['aimmx'],
+    packages=find_packages(include=['aimmx', 'aimmx.*']),
+    package_data={
+        'aimmx': ['frameworks.txt', 'sota-datasets.csv'],
+        'aimmx.domain_inference.models': ['*.joblib', 'compact/*'],
+        'aimmx.is_ai_inference.models': ['*.joblib'],
+    },
     install_requires=[
         'requests',
         'bs4',
@@ -24,5 +29,8 @@ setup(
         'markdown',
         'importlib_resources'
     ],
+    entry_points={
+        'console_scripts': ['aimmx=aimmx.cli:main']
+    },
     zip_safe=False
 )
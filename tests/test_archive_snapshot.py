@@ -0,0 +1,60 @@
+import io
+import shutil
+import subprocess
+import tarfile
+import types
+
+import pytest
+
+from aimmx.util.archive_snapshot import ArchiveSnapshot
+
+REPO = types.SimpleNamespace(default_branch="master")
+
+def write_archive(path, files, folders):
+    with tarfile.open(path, mode="w:gz", format=tarfile.PAX_FORMAT, pax_headers={"comment": "ab" * 20}) as archive:
+        for folder in ["repo-abc"] + ["repo-abc/" + f for f in folders]:
+            info = tarfile.TarInfo(folder + "/")
+            info.type = tarfile.DIRTYPE
+            archive.addfile(info)
+        for name, content in files.items():
+            info = tarfile.TarInfo("repo-abc/" + name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+
+def test_submodules_are_skipped(tmp_path):
+    path = str(tmp_path / "repo.tar.gz")
+    write_archive(path, {"README.md": b"# Title\n", "sub/train.py": b"import torch\n"},
+        ["sub", "sub/emptymod", "othermod"])
+    snapshot = ArchiveSnapshot(REPO, path=path)
+
+    entries = snapshot.entries()
+    assert sorted(entries) == ["README.md", "sub", "sub/train.py"]
+    assert entries["sub"].sha is not None
+    assert snapshot.sha == "ab" * 20
+    assert snapshot.read("README.md") == "# Title\n"
+    assert [r.module for r in snapshot.imports()] == ["torch"]
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+def test_tree_shas_match_git(tmp_path):
+    work = tmp_path / "work"
+    (work / "sub" / "deeper").mkdir(parents=True)
+    (work / "README.md").write_text("# Title\n")
+    (work / "sub" / "train.py").write_text("import torch\n")
+    (work / "sub" / "deeper" / "run.sh").write_text("#!/bin/sh\n")
+    (work / "sub" / "deeper" / "run.sh").chmod(0o755)
+    (work / "sub-a.txt").write_text("sorts between sub and sub/\n")
+
+    def git(*args):
+        return subprocess.run(["git", "-C", str(work)] + list(args), check=True,
+            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    git("init", "-q")
+    git("add", ".")
+    git("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-q", "-m", "test")
+    path = str(tmp_path / "repo.tar.gz")
+    git("archive", "--format=tar.gz", "--prefix=repo-abc/", "-o", path, "HEAD")
+
+    snapshot = ArchiveSnapshot(REPO, path=path)
+    for line in git("ls-tree", "-r", "-t", "HEAD").splitlines():
+        info, name = line.split("\t")
+        assert snapshot.entry(name).sha == info.split()[2]
+    assert snapshot.sha == git("rev-parse", "HEAD").strip()
@@ -0,0 +1,37 @@
+import pytest
+
+from aimmx.reference_detector import arxiv_reader
+
+@pytest.fixture
+def searches(monkeypatch, tmp_path):
+    calls = []
+    def search_arxiv_id(id):
+        calls.append(id)
+        if id == "1512.03385":
+            return {"title": "Deep Residual Learning for Image Recognition", "arxiv": id}
+        return None
+    monkeypatch.setattr(arxiv_reader, "search_arxiv_id", search_arxiv_id)
+    arxiv_reader.configure_arxiv_cache(str(tmp_path / "arxiv.db"))
+    yield calls
+    arxiv_reader.configure_arxiv_cache()
+
+def test_found_ids_are_cached(searches):
+    assert arxiv_reader.get_arxiv_id("1512.03385")["title"] == "Deep Residual Learning for Image Recognition"
+    arxiv_reader._memory_records.clear()
+    assert arxiv_reader.get_arxiv_id("1512.03385")["arxiv"] == "1512.03385"
+    assert searches == ["1512.03385"]
+
+def test_ids_not_found_are_looked_up_again(searches, monkeypatch):
+    assert arxiv_reader.get_arxiv_id("2999.00001") is None
+    assert arxiv_reader.get_arxiv_id("2999.00001") is None
+    assert searches == ["2999.00001"]
+
+    monkeypatch.setattr(arxiv_reader, "NOT_FOUND_TTL", -1)
+    assert arxiv_reader.get_arxiv_id("2999.00001") is None
+    assert searches == ["2999.00001", "2999.00001"]
+
+def test_least_recently_used_records_are_dropped(searches, monkeypatch):
+    monkeypatch.setattr(arxiv_reader, "MAX_MEMORY_RECORDS", 2)
+    for id in ["2999.00001", "2999.00002", "2999.00001", "2999.00003"]:
+        arxiv_reader.get_arxiv_id(id)
+    assert list(arxiv_reader._memory_records) == ["arxiv:2999.00001", "arxiv:2999.00003"]
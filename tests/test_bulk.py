@@ -0,0 +1,124 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from aimmx.aimmx import AIMMX
+from aimmx.util.bulk import Checkpoint, imap_completed, skip_repeated
+
+def test_skip_repeated_is_bounded():
+    assert list(skip_repeated(["a", "b", "a", "c", "b"])) == ["a", "b", "c"]
+    # "a" is forgotten once 2 other items came after it
+    assert list(skip_repeated(["a", "b", "c", "a"], window=2)) == ["a", "b", "c", "a"]
+
+def test_checkpoint_is_kept_across_runs(tmp_path):
+    path = str(tmp_path / "done.db")
+    checkpoint = Checkpoint(path)
+    checkpoint.add("https://github.com/org/a")
+    checkpoint.add("https://github.com/org/b", "error")
+    checkpoint.close()
+    assert checkpoint._cache._connections == []
+
+    checkpoint = Checkpoint(path)
+    assert "https://github.com/org/a" in checkpoint
+    assert checkpoint.status("https://github.com/org/b") == "error"
+    assert "https://github.com/org/c" not in checkpoint
+    assert len(checkpoint) == 2
+
+def test_checkpoint_reads_do_not_write(tmp_path, monkeypatch):
+    checkpoint = Checkpoint(str(tmp_path / "done.db"))
+    checkpoint.add("https://github.com/org/a")
+    monkeypatch.setattr(time, "time", lambda: 1e12)
+    changes = checkpoint._cache._connection().total_changes
+    assert checkpoint.status("https://github.com/org/a") == "ok"
+    assert checkpoint._cache._connection().total_changes == changes
+    checkpoint.close()
+
+def make_client(calls):
+    client = AIMMX.__new__(AIMMX)
+    def repo_parse(url, fields=None):
+        calls.append(url)
+        if url.endswith("/bad"):
+            raise ValueError("bad repository")
+        return {"name": url.rsplit("/", 1)[1]}
+    client.repo_parse = repo_parse
+    return client
+
+def test_resumed_run_skips_done_and_failed_urls(tmp_path):
+    path = str(tmp_path / "done.db")
+    urls = ["https://github.com/org/a", "https://github.com/org/bad", "https://github.com/org/a"]
+    calls = []
+    records = list(make_client(calls).repo_parse_many(urls, checkpoint_path=path))
+    assert sorted(calls) == ["https://github.com/org/a", "https://github.com/org/bad"]
+    assert sorted("error" in r for r in records) == [False, True]
+
+    calls = []
+    assert list(make_client(calls).repo_parse_many(urls + ["https://github.com/org/c"], checkpoint_path=path)) == [
+        {"url": "https://github.com/org/c", "result": {"name": "c"}}]
+    assert calls == ["https://github.com/org/c"]
+
+    calls = []
+    list(make_client(calls).repo_parse_many(urls, checkpoint_path=path, retry_errors=True))
+    assert calls == ["https://github.com/org/bad"]
+
+def test_items_running_past_the_timeout_are_given_up():
+    release = threading.Event()
+    def func(item):
+        if item == "hung":
+            release.wait(10)
+        return item
+    try:
+        start = time.monotonic()
+        results = {item: (result, error) for item, result, error in
+            imap_completed(func, ["a", "hung", "b"], max_workers=2, timeout=0.2)}
+        assert time.monotonic() - start < 5
+    finally:
+        release.set()
+    assert results["a"] == ("a", None) and results["b"] == ("b", None)
+    assert results["hung"][0] is None and isinstance(results["hung"][1], TimeoutError)
+
+def test_hung_calls_do_not_starve_the_workers():
+    release = threading.Event()
+    def func(item):
+        if item.startswith("hung"):
+            release.wait(10)
+        return item
+    items = ["hung1", "hung2", "hung3", "a", "b", "c"]
+    try:
+        start = time.monotonic()
+        results = {item: error for item, result, error in
+            imap_completed(func, items, max_workers=2, timeout=0.2, max_abandoned=3)}
+        assert time.monotonic() - start < 5
+    finally:
+        release.set()
+    assert [item for item, error in results.items() if error is None] == ["a", "b", "c"]
+    assert all(isinstance(results[item], TimeoutError) for item in ["hung1", "hung2", "hung3"])
+
+def test_abandoned_calls_are_capped():
+    release = threading.Event()
+    running = []
+    def func(item):
+        running.append(item)
+        if item.startswith("hung"):
+            release.wait(10)
+        return item
+    results = imap_completed(func, ["hung1", "hung2", "hung3", "a"], max_workers=1, timeout=0.1, max_abandoned=1)
+    try:
+        assert [next(results)[0] for _ in range(2)] == ["hung1", "hung2"]
+        # hung1 was replaced by hung2, which is past the cap and holds the only worker
+        time.sleep(0.3)
+        assert running == ["hung1", "hung2"]
+    finally:
+        release.set()
+    assert sorted(item for item, _, _ in results) == ["a", "hung3"]
+
+def test_hung_calls_do_not_block_the_exit():
+    script = ("import threading\n"
+        "from aimmx.util.bulk import imap_completed\n"
+        "print(list(imap_completed(lambda item: threading.Event().wait(60), ['hung'], timeout=0.1)))\n")
+    start = time.monotonic()
+    output = subprocess.run([sys.executable, "-c", script], stdout=subprocess.PIPE, universal_newlines=True,
+        timeout=30, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    assert "TimeoutError" in output
+    assert time.monotonic() - start < 20
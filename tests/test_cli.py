@@ -0,0 +1,26 @@
+import json
+import logging
+import sys
+
+from aimmx import aimmx, cli
+
+class FakeAIMMX:
+    def __init__(self, token, **kwargs):
+        pass
+
+    def repo_parse_many(self, urls, **kwargs):
+        for url in urls:
+            logging.getLogger("aimmx.aimmx").warning("Extracting %s", url)
+            yield {"url": url, "result": {"name": url.rsplit("/", 1)[1]}}
+
+def test_only_records_go_to_stdout(monkeypatch, capsys, caplog, tmp_path):
+    monkeypatch.setattr(aimmx, "AIMMX", FakeAIMMX)
+    urls = tmp_path / "urls.txt"
+    urls.write_text("https://github.com/org/a\n# comment\n{\"url\": \"https://github.com/org/b\"}\n")
+    stdout = sys.stdout
+    assert cli.main(["--token", "t", "-q", str(urls)]) == 0
+    assert sys.stdout is stdout
+    out, err = capsys.readouterr()
+    assert [json.loads(line)["url"] for line in out.splitlines()] == ["https://github.com/org/a",
+        "https://github.com/org/b"]
+    assert "Extracting https://github.com/org/a" in caplog.text
@@ -0,0 +1,52 @@
+import random
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import LabelEncoder
+from sklearn.svm import LinearSVC
+
+from aimmx.domain_inference.compact_models import export_models, load_compact_models
+
+WORDS = ("image vision pixel convolution text language token translation graph reward "
+    "robot audio speech the of and café Über naïve").split()
+
+def make_readmes(rnd, count):
+    return [" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(0, 40))) for _ in range(count)]
+
+# the steps of the shipped pipelines
+def make_pipeline():
+    return Pipeline([
+        ("cv", CountVectorizer(strip_accents="unicode", stop_words="english")),
+        ("tf", TfidfTransformer()),
+        ("clf", CalibratedClassifierCV(LinearSVC(), method="sigmoid", cv=3)),
+    ])
+
+@pytest.fixture(scope="module")
+def models():
+    rnd = random.Random(0)
+    readmes = make_readmes(rnd, 300)
+    binary = [int(sum(r.count(w) for w in ("image", "vision", "pixel")) > 3) for r in readmes]
+    le = LabelEncoder().fit(["classification", "detection", "segmentation", "generation"])
+    tasks = le.transform([rnd.choice(le.classes_) for _ in readmes])
+    return {
+        "vision_domain_pipeline": make_pipeline().fit(readmes, binary),
+        "vision_task_pipeline": make_pipeline().fit(readmes, tasks),
+        "vision_le": le,
+    }
+
+def test_predict_proba_matches(models, tmp_path):
+    export_models(models, str(tmp_path))
+    compact = load_compact_models(str(tmp_path))
+
+    readmes = make_readmes(random.Random(1), 200) + ["", "Café IMAGE naïve vision"]
+    for name in ("vision_domain_pipeline", "vision_task_pipeline"):
+        expected = models[name].predict_proba(readmes)
+        assert compact[name].predict_proba(readmes).shape == expected.shape
+        assert np.abs(compact[name].predict_proba(readmes) - expected).max() < 1e-9
+    assert list(compact["vision_le"].inverse_transform([0, 3])) == list(models["vision_le"].inverse_transform([0, 3]))
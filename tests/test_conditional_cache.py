@@ -0,0 +1,68 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from aimmx.util.conditional_cache import enable_conditional_requests
+from aimmx.util.sqlite_cache import SqliteCache
+
+URL = "https://api.github.com/repos/org/repo"
+
+class FakeServer:
+    """ Answers GETs with body and etag, 304 when If-None-Match matches. """
+
+    def __init__(self, monkeypatch):
+        self.body = b'{"name": "repo"}'
+        self.etag = '"v1"'
+        self.requests = []
+        monkeypatch.setattr(HTTPAdapter, "send", lambda adapter, request, **kwargs: self.send(request))
+
+    def send(self, request):
+        self.requests.append(dict(request.headers))
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        response.headers["X-RateLimit-Remaining"] = str(5000 - len(self.requests))
+        if request.headers.get("If-None-Match") == self.etag:
+            response.status_code = 304
+            response._content = b""
+        else:
+            response.status_code = 200
+            response.headers["ETag"] = self.etag
+            response.headers["Content-Type"] = "application/json; charset=utf-8"
+            response._content = self.body
+        return response
+
+def make_session(cache, **kwargs):
+    session = requests.Session()
+    enable_conditional_requests(session, cache, **kwargs)
+    return session
+
+def test_not_modified_responses_are_served_from_the_store(monkeypatch, tmp_path):
+    server = FakeServer(monkeypatch)
+    session = make_session(SqliteCache(str(tmp_path / "github.db")))
+    assert session.get(URL).json() == {"name": "repo"}
+    assert "If-None-Match" not in server.requests[0]
+
+    response = session.get(URL)
+    assert server.requests[1]["If-None-Match"] == '"v1"'
+    assert response.status_code == 200 and response.json() == {"name": "repo"}
+    # rate limit headers come from the 304
+    assert response.headers["X-RateLimit-Remaining"] == "4998"
+
+    server.body, server.etag = b'{"name": "renamed"}', '"v2"'
+    assert session.get(URL).json() == {"name": "renamed"}
+    assert session.get(URL).json() == {"name": "renamed"}
+    assert server.requests[3]["If-None-Match"] == '"v2"'
+
+def test_store_is_bounded(monkeypatch, tmp_path):
+    server = FakeServer(monkeypatch)
+    cache = SqliteCache(str(tmp_path / "github.db"), max_bytes=1000)
+    session = make_session(cache, max_body_bytes=100)
+    for i in range(20):
+        session.get(URL + str(i))
+    assert cache.total_size() <= 1000
+    assert 0 < len(cache) < 20
+
+    assert cache.get("http:*/* " + URL + "19") is not None
+    server.body = b"x" * 101
+    session.get(URL + "large")
+    assert cache.get("http:*/* " + URL + "large") is None
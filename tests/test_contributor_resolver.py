@@ -0,0 +1,40 @@
+import types
+
+from aimmx.util import contributor_resolver
+from aimmx.util.contributor_resolver import ContributorResolver
+
+class FakeGitHub:
+    def __init__(self):
+        self.session = types.SimpleNamespace(base_url="https://api.github.com")
+        self.lookups = []
+
+    def user(self, login):
+        self.lookups.append(login)
+        return types.SimpleNamespace(name=login.upper(), email=None)
+
+def repo(*logins):
+    return types.SimpleNamespace(contributors=lambda number: [types.SimpleNamespace(login=l) for l in logins])
+
+def test_users_are_bounded_and_reused():
+    gh = FakeGitHub()
+    resolver = ContributorResolver(max_users=2, max_workers=1)
+    assert resolver.resolve(gh, repo("a", "b")) == [{"name": "A", "github_id": "a"}, {"name": "B", "github_id": "b"}]
+    resolver.resolve(gh, repo("a", "c"))
+    assert gh.lookups == ["a", "b", "c"]
+    # "a" was fetched first and dropped for "c"
+    assert len(resolver) == 2
+    resolver.resolve(gh, repo("a"))
+    assert gh.lookups == ["a", "b", "c", "a"]
+
+def test_expired_users_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(contributor_resolver.time, "time", lambda: now[0])
+    gh = FakeGitHub()
+    resolver = ContributorResolver(ttl=10, max_workers=1)
+    resolver.resolve(gh, repo("a", "b"))
+    now[0] += 20
+    resolver.resolve(gh, repo("c"))
+    # a and b expired, removed without being read again
+    assert len(resolver) == 1
+    resolver.resolve(gh, repo("a"))
+    assert gh.lookups == ["a", "b", "c", "a"]
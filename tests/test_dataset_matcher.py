@@ -0,0 +1,51 @@
+import glob
+import os
+import random
+import re
+
+from aimmx.dataset_detector.dataset_detector import load_dataset_list, find_dataset_from_list, get_dataset_matcher
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "corpus")
+
+DATASETS = load_dataset_list()
+
+# the regex find_dataset_from_list used before the matcher, with the names escaped
+# since the matcher takes them literally (the same for names without special characters)
+def regex_find(readme, dataset_list):
+    found = []
+    for dataset in dataset_list:
+        boundry_re = re.compile("(\\W|\\A)" + re.escape(dataset.lower()) + "(\\W|\\Z)", re.M)
+        if boundry_re.search(readme.lower()):
+            found.append({"name": dataset})
+    return found
+
+def make_text(rnd, count):
+    words = []
+    for _ in range(count):
+        name = rnd.choice(DATASETS)
+        # exact, other case, inside a word, next to punctuation, on its own line
+        name = rnd.choice([name, name.upper(), name.lower(), name.title()])
+        words.append(rnd.choice(["{}", "x{}", "{}s", "_{}", "{}_", "({})", "{}.", "\n{}\n", "[{}](url)", "{}-v2"])
+            .format(name))
+        words.append(rnd.choice(["the", "on", "and", "\n", "", "-"]))
+    return " ".join(words)
+
+def texts():
+    rnd = random.Random(0)
+    texts = [make_text(rnd, 50) for _ in range(20)]
+    texts += ["", "mnist", "MNIST", "xmnist", "mnistx", "mnist_", "(mnist)", "\nImageNet\n", "imagenet1k"]
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.md"))):
+        with open(path, encoding="utf-8") as f:
+            texts.append(f.read())
+    return texts
+
+def test_matcher_finds_the_same_datasets_as_the_regex():
+    for text in texts():
+        assert find_dataset_from_list(text, get_dataset_matcher()) == regex_find(text, DATASETS)
+
+def test_boundaries_and_case():
+    names = ["MNIST", "CIFAR-10", "COCO", "Penn Treebank"]
+    assert find_dataset_from_list("Trained on cifar-10, mnist and the penn treebank.", names) == [
+        {"name": "MNIST"}, {"name": "CIFAR-10"}, {"name": "Penn Treebank"}]
+    assert find_dataset_from_list("MNISTs cifar-100 coco_2017 xcoco", names) == []
+    assert find_dataset_from_list("COCO\nMNIST", names) == [{"name": "MNIST"}, {"name": "COCO"}]
@@ -0,0 +1,18 @@
+import logging
+
+import pytest
+
+from aimmx.domain_inference import domain_inference
+
+def test_missing_domain_pipelines_are_named():
+    loaded = {"vision_domain_pipeline": object()}
+    with pytest.raises(FileNotFoundError) as excinfo:
+        domain_inference.check_models(loaded)
+    assert "nlp-domain-pipeline.joblib, other-domain-pipeline.joblib" in str(excinfo.value)
+
+def test_missing_task_models_are_logged(caplog):
+    loaded = {name: object() for name in domain_inference.MODEL_FILES if name != "vision_task_pipeline"}
+    with caplog.at_level(logging.WARNING, logger=domain_inference.__name__):
+        domain_inference.check_models(loaded)
+    assert [r.getMessage() for r in caplog.records] == [
+        "Missing task model file vision-task-pipeline.joblib, its domain gets no task"]
@@ -0,0 +1,57 @@
+from aimmx.framework_detector.import_scanner import MAX_AST_BYTES, scan_bytes, scan_file, scan_source, \
+    top_level_modules
+
+def modules(records):
+    return [(r.module, r.line) for r in records]
+
+def test_ast_imports_with_lines():
+    source = (
+        "import os, numpy.linalg as la\n"
+        "from torch import nn\n"
+        "from . import utils\n"
+        "def train():\n"
+        "    try:\n"
+        "        import tensorflow as tf\n"
+        "    except ImportError:\n"
+        "        from keras import layers\n"
+        "x = __import__('sys')\n"
+        "if x: import caffe\n"
+    )
+    records = scan_source(source, "train.py")
+    assert modules(records) == [("os", 1), ("numpy.linalg", 1), ("torch", 2), ("tensorflow", 6), ("keras", 8),
+        ("caffe", 10)]
+    assert {r.path for r in records} == {"train.py"}
+    assert top_level_modules(records) == ["os", "numpy", "torch", "tensorflow", "keras", "caffe"]
+
+# Python 2 does not parse, the tokenizer finds the same imports
+PYTHON2_SOURCE = (
+    "import os, numpy.linalg as la\n"
+    "from torch import (nn,\n"
+    "    optim)\n"
+    "from .models import net\n"
+    "print 'training'\n"
+    "if x: import caffe\n"
+    "try: import tensorflow as tf\n"
+    "except ImportError: from keras import layers\n"
+    "for i in range(3): import chainer; import mxnet\n"
+    "d = {'a': 1}; import sklearn\n"
+    "def f(a=lambda: 0) -> dict: import theano\n"
+    "s = x[1:2]\n"
+    "async def g(): import jax\n"
+)
+
+PYTHON2_MODULES = [("os", 1), ("numpy.linalg", 1), ("torch", 2), ("caffe", 6), ("tensorflow", 7), ("keras", 8),
+    ("chainer", 9), ("mxnet", 9), ("sklearn", 10), ("theano", 11), ("jax", 13)]
+
+def test_tokenizer_fallback():
+    assert modules(scan_source(PYTHON2_SOURCE, "train.py")) == PYTHON2_MODULES
+
+def test_large_files_are_scanned_line_by_line(tmp_path):
+    padding = "x = 1  # padding\n" * (MAX_AST_BYTES // 10)
+    source = PYTHON2_SOURCE + padding + "import pandas\n"
+    path = tmp_path / "big.py"
+    path.write_text(source)
+    assert path.stat().st_size > MAX_AST_BYTES
+    expected = PYTHON2_MODULES + [("pandas", PYTHON2_SOURCE.count("\n") + padding.count("\n") + 1)]
+    assert modules(scan_file(str(path))) == expected
+    assert modules(scan_bytes(source.encode("utf-8"), "big.py")) == expected
@@ -0,0 +1,50 @@
+import collections
+import glob
+import os
+import re
+
+import pytest
+
+pytest.importorskip("markdown")
+pytest.importorskip("bs4")
+
+from aimmx.util.readme_cleanup import markdownToText, readme_cleanup
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "corpus")
+README_PATHS = sorted(glob.glob(os.path.join(CORPUS_DIR, "*.md")))
+
+# token_pattern of the CountVectorizers of the domain inference models, which only
+# see the counts of these words (as in benchmarks/cleanup_parity.py)
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+MIN_SCORE = 0.98
+
+def words(text):
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return collections.Counter(w for w in TOKEN_PATTERN.findall(text.lower()) if w not in ENGLISH_STOP_WORDS)
+
+def score(old, new):
+    common = sum((old & new).values())
+    total = max(sum(old.values()), sum(new.values()))
+    return common / total if total else 1.0
+
+@pytest.mark.parametrize("path", README_PATHS, ids=[os.path.basename(p) for p in README_PATHS])
+def test_same_words_as_markdown_to_text(path):
+    pytest.importorskip("sklearn")
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    old = words(markdownToText(text))
+    new = words(readme_cleanup(text))
+    assert score(old, new) >= MIN_SCORE, (dict((old - new).most_common(10)), dict((new - old).most_common(10)))
+
+@pytest.mark.parametrize("markdown", [
+    "# Title\n\nSome *emphasis*, **strong** and `code` text.\n",
+    "[![Build](https://img.shields.io/badge.svg)](https://ci.example.org) A [link](https://example.org) here.\n",
+    "* item one\n* item two\n\n1. first\n2. second\n",
+    "```python\nimport torch\nmodel = torch.load(path)\n```\n",
+    "| Model | Accuracy |\n| --- | --- |\n| ResNet-50 | 76.1 |\n",
+    "Contact <someone@example.org> or see <https://example.org>.\n\n> quoted text\n",
+    "<p align=\"center\"><img src=\"logo.png\"></p>\n\nText with &amp; entity.\n",
+])
+def test_same_words_on_markdown_constructs(markdown):
+    assert sorted(TOKEN_PATTERN.findall(readme_cleanup(markdown).lower())) == \
+        sorted(TOKEN_PATTERN.findall(markdownToText(markdown).lower()))
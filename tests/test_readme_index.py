@@ -0,0 +1,128 @@
+import glob
+import os
+import re
+
+import pytest
+
+from aimmx.readme_parsers import (check_table, check_codeblock, check_model_metadata_table,
+    check_model_value_table, CODE_BLOCK_HEADERS_DICT, MODEL_HEADER_PATTERN, MODEL_VALUE_HEADER_PATTERN,
+    TABLE_HEADER_PATTERN_PRE, TABLE_HEADER_PATTERN_POST, SCHEMA_HEADER_PATTERN_PRE, SCHEMA_HEADER_PATTERN_POST)
+from aimmx.util.gh_utils import merge_metadata, path_to_object
+from aimmx.util.readme_index import ReadmeIndex
+import aimmx.readme_parsers as readme_parsers
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "corpus")
+README_PATHS = sorted(glob.glob(os.path.join(CORPUS_DIR, "*.md")))
+
+AUTHOR_HEADER_DICT = {
+    "name": "name",
+    "email": "email",
+    "Github Profile": "github_id",
+    "organization": "organization"
+}
+
+# the extractors as they were before the index, searching the whole README
+def old_check_table(readme, header, metadata_path, metadata, header_value_dict=None):
+    header_re = re.compile(TABLE_HEADER_PATTERN_PRE + header + TABLE_HEADER_PATTERN_POST, re.M | re.I)
+    result = header_re.search(readme)
+    if (result and len(result.groups()) > 0):
+        table_block = result.group(1).strip()
+        table_result = readme_parsers.parse_markdown_table(table_block, header_value_dict)
+        if len(table_result) > 0:
+            table_result = path_to_object(metadata, table_result, metadata_path)
+        return table_result
+    return metadata
+
+def old_check_codeblock(readme, header, metadata_path, metadata, to_object=False):
+    header_re = re.compile(SCHEMA_HEADER_PATTERN_PRE + header + SCHEMA_HEADER_PATTERN_POST, re.M | re.I)
+    result = header_re.search(readme)
+    if (result and len(result.groups()) > 0):
+        block_result = path_to_object({}, result.group(1).strip(), metadata_path, to_object)
+        return merge_metadata(metadata, block_result)
+    return metadata
+
+# the old header searches, the tables under the matched header are parsed as before
+def old_search(pattern):
+    def search(readme):
+        return re.compile(pattern, re.M | re.I).search(readme)
+    return search
+
+def outcome(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception as e:
+        return type(e)
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+def test_index_structure():
+    text = ("# Title\n\n## Usage\n\n```python\n# not a header\nimport torch\n```\n\n"
+        "### Install\n\n| a | b |\n|---|---|\n| 1 | 2 |\n\n## Links\n[docs](https://example.org)\n")
+    index = ReadmeIndex(text)
+    assert [(h.level, h.title) for h in index.headers] == [(1, "Title"), (2, "Usage"), (3, "Install"), (2, "Links")]
+    usage, install, links = index.headers[1], index.headers[2], index.headers[3]
+    assert usage.end == links.start and install.end == links.start
+    assert index.headers[0].end == len(text)
+    assert [b.language for b in index.code_blocks] == ["python"]
+    assert index.code_blocks[0].content == "# not a header\nimport torch\n"
+    assert [t.rows for t in index.tables] == [["| a | b |", "|---|---|", "| 1 | 2 |"]]
+    assert index.table_after(install.start + len("### Install")) == index.tables[0]
+    assert index.table_after(usage.start) is None
+    assert [(l.text, l.url) for l in index.links] == [("docs", "https://example.org")]
+
+@pytest.mark.parametrize("path", README_PATHS, ids=[os.path.basename(p) for p in README_PATHS])
+def test_extractors_match_the_old_parser(path):
+    readme = read(path)
+    index = ReadmeIndex(readme)
+    assert check_table(readme, "Contributors", "authors", {}, AUTHOR_HEADER_DICT, index=index) == \
+        old_check_table(readme, "Contributors", "authors", {}, AUTHOR_HEADER_DICT)
+    for header, metadata_path in CODE_BLOCK_HEADERS_DICT.items():
+        assert check_codeblock(readme, header, metadata_path, {}, to_object=True, index=index) == \
+            old_check_codeblock(readme, header, metadata_path, {}, to_object=True)
+    assert check_codeblock(readme, "Published Docker Image:", "trained_model/binaries", {}, index=index) == \
+        old_check_codeblock(readme, "Published Docker Image:", "trained_model/binaries", {})
+    for pattern in [MODEL_HEADER_PATTERN, MODEL_VALUE_HEADER_PATTERN]:
+        new = index.match_header(readme_parsers.compile_header_pattern(pattern))
+        old = old_search(pattern)(readme)
+        assert (new and new.span(), new and new.groups()) == (old and old.span(), old and old.groups())
+
+def test_corpus_has_the_extracted_sections():
+    # so that the parity above is not only between empty results
+    readme = read(os.path.join(CORPUS_DIR, "max_object_detector.md"))
+    assert len(check_table(readme, "Contributors", "authors", {}, AUTHOR_HEADER_DICT)["authors"]) == 2
+    assert "evaluations" in check_model_value_table(readme)
+    assert "domain" in check_model_metadata_table(readme)
+
+TABLE = "| name | email |\n| --- | --- |\n| Ada | ada@example.org |"
+
+@pytest.mark.parametrize("readme", [
+    "## Contributors\n" + TABLE + "\n\n## Next\n",
+    "## Contributors\n\n\n" + TABLE + "\n\n\n",
+    "### Contributors\n" + TABLE + "\n\ntext\n",
+    "##Contributors\n" + TABLE + "\n\n",
+    "## contributors\n" + TABLE + "\n\n",
+    # no blank line after the table, the old pattern runs on to a later one
+    "## Contributors\n" + TABLE + "\n## Next\n| x |\n\n",
+    "## Contributors\n" + TABLE + "\ntext | more | and more |\n\n",
+    "## Contributors\n" + TABLE + "\n",
+    "## Contributors\n" + TABLE,
+    "## Contributors\n" + TABLE + " \n\n",
+    "## Contributors\r\n" + TABLE.replace("\n", "\r\n") + "\r\n\r\n",
+    # not directly under the header
+    "## Contributors\nSome text\n" + TABLE + "\n\n",
+    "## Contributors\n  " + TABLE + "\n\n",
+    "## Contributors guide\n" + TABLE + "\n\n",
+    # the first header without a table, then one with
+    "## Contributors\nSee below\n\n## Contributors\n" + TABLE + "\n\n",
+    "## Contributors\n|\n\n" + TABLE + "\n\n",
+])
+def test_check_table_matches_the_old_parser(readme):
+    assert outcome(check_table, readme, "Contributors", "authors", {}, AUTHOR_HEADER_DICT) == \
+        outcome(old_check_table, readme, "Contributors", "authors", {}, AUTHOR_HEADER_DICT)
+
+def test_check_table_only_reads_headers():
+    # the old search also found the header inside code blocks
+    readme = "```\n## Contributors\n" + TABLE + "\n\n```\n"
+    assert check_table(readme, "Contributors", "authors", {}, AUTHOR_HEADER_DICT) == {}
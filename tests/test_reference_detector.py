@@ -0,0 +1,39 @@
+import time
+
+from aimmx.reference_detector import reference_detector
+from aimmx.reference_detector.reference_detector import (detect_references, regex_search, split_paragraphs,
+    MAX_PARAGRAPH_LENGTH)
+
+REFERENCE = ("[1] Jaderberg, Max, et al. [\"Spatial Transformer Networks\"]"
+    "(https://example.org/stn) arXiv preprint arXiv:1506.02025 (2015)\n")
+
+def test_long_lines_are_cut():
+    parts = split_paragraphs("a" * (2 * MAX_PARAGRAPH_LENGTH + 1) + "\nb")
+    assert all(len(part) <= MAX_PARAGRAPH_LENGTH for part in parts)
+    assert "".join(parts).replace("\n", "") == "a" * (2 * MAX_PARAGRAPH_LENGTH + 1) + "b"
+
+def test_time_budget_holds_on_a_single_line():
+    for readme in ["](" + "[1] abc [" * 40000, "[1] abc [](" * 40000, "* _a_, [](" * 40000]:
+        start = time.perf_counter()
+        regex_search(readme, time_budget=0.5)
+        # the budget is checked between parts of at most MAX_PARAGRAPH_LENGTH
+        assert time.perf_counter() - start < 1.5
+
+def test_references_are_found():
+    readme = ("## References\n\n[1] Jaderberg, Max, et al. [\"Spatial Transformer Networks\"]"
+        "(https://arxiv.org/pdf/1506.02025) arXiv preprint arXiv:1506.02025 (2015)\n")
+    refs = regex_search(readme)
+    assert {"title": "Spatial Transformer Networks", "url": "https://arxiv.org/pdf/1506.02025",
+        "arxiv": "arXiv:1506.02025", "year": "2015", "authors": "Jaderberg, Max, et al."} in refs
+
+def test_truncated_results_are_marked(monkeypatch):
+    readme = "## References\n\n" + REFERENCE
+    assert detect_references(readme)["references"]
+    assert "references_truncated" not in detect_references(readme)
+    # the clock runs out before the first paragraph
+    clock = iter(range(0, 1000, 10))
+    monkeypatch.setattr(reference_detector.time, "perf_counter", lambda: next(clock))
+    assert detect_references(readme, time_budget=1) == {"references_truncated": True}
+
+def test_no_time_budget_by_default():
+    assert reference_detector.DEFAULT_TIME_BUDGET is None
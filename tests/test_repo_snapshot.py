@@ -0,0 +1,86 @@
+import collections
+import hashlib
+import types
+
+import pytest
+
+from aimmx.util.repo_snapshot import RepoSnapshot
+
+FILES = {
+    "README.md": b"# Title\n",
+    "aimmx.yaml": b"name: test\n",
+    "docs/index.md": b"docs\n",
+    "src/model/train.py": b"import torch\n",
+    "src/model/README.md": b"# Model\n",
+    "src/data/load.py": b"import numpy\n",
+}
+
+def blob_sha(content):
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+class FakeRepo:
+    """ The git trees API of FILES, counting the requests. """
+
+    def __init__(self, truncated):
+        self.truncated = truncated
+        self.default_branch = "master"
+        self.url = "https://api.github.com/repos/org/repo"
+        self.requests = collections.Counter()
+        self.session = types.SimpleNamespace(get=self._get)
+
+    def _get(self, url, headers=None):
+        self.requests["commit"] += 1
+        return types.SimpleNamespace(text="c0ffee\n", raise_for_status=lambda: None)
+
+    def _tree(self, folder, recursive):
+        prefix = folder + "/" if folder else ""
+        items = {}
+        for path, content in sorted(FILES.items()):
+            if not path.startswith(prefix):
+                continue
+            parts = path[len(prefix):].split("/")
+            for i in range(1, len(parts) if recursive else min(len(parts), 2)):
+                name = "/".join(parts[:i])
+                items[name] = {"path": name, "type": "tree", "sha": "tree:" + prefix + name, "mode": "040000"}
+            if recursive or len(parts) == 1:
+                name = "/".join(parts)
+                items[name] = {"path": name, "type": "blob", "sha": blob_sha(content), "size": len(content),
+                    "mode": "100644"}
+        return list(items.values())
+
+    def tree(self, sha, recursive=False):
+        self.requests["recursive tree" if recursive else "tree"] += 1
+        if recursive:
+            tree_json = {"sha": "tree:", "truncated": self.truncated, "tree": self._tree("", True)}
+        else:
+            tree_json = {"sha": sha, "tree": self._tree(sha[len("tree:"):], False)}
+        return types.SimpleNamespace(as_dict=lambda: tree_json)
+
+    def blob(self, sha):
+        self.requests["blob"] += 1
+        content = [c for c in FILES.values() if blob_sha(c) == sha][0]
+        return types.SimpleNamespace(decode_content=lambda: content.decode("utf-8"))
+
+@pytest.mark.parametrize("truncated", [False, True])
+def test_reads_files_and_listings(truncated):
+    repo = FakeRepo(truncated)
+    snapshot = RepoSnapshot(repo)
+    assert snapshot.readme() == "# Title\n"
+    assert snapshot.readme_path() == "README.md"
+    assert snapshot.entry("src/model/train.py").sha == blob_sha(FILES["src/model/train.py"])
+    assert snapshot.entry("src/model/missing.py") is None
+    assert snapshot.entry("missing/train.py") is None
+    listing = {name: (filetype, entry.num_entries) for name, filetype, entry in snapshot.listing(["src"])}
+    assert listing == {"model": ("dir", 2), "data": ("dir", 1)}
+    assert sorted(path for path, entry in snapshot.entries().items() if entry.type == "file") == sorted(FILES)
+
+def test_truncated_listing_is_read_lazily():
+    repo = FakeRepo(True)
+    snapshot = RepoSnapshot(repo)
+    assert snapshot.readme_path(["src", "model"]) == "src/model/README.md"
+    # the root, src and src/model, not docs nor src/data
+    assert repo.requests["tree"] == 3
+    assert not snapshot.complete
+    snapshot.entries()
+    assert repo.requests["tree"] == 5
+    assert snapshot.complete
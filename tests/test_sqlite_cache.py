@@ -0,0 +1,55 @@
+import sqlite3
+import threading
+
+import pytest
+
+from aimmx.util.sqlite_cache import SqliteCache
+
+def accessed(cache, key):
+    return cache._connection().execute("SELECT accessed FROM cache WHERE key = ?", (key,)).fetchone()[0]
+
+def test_recent_reads_do_not_write(tmp_path):
+    cache = SqliteCache(str(tmp_path / "cache.db"))
+    cache.set("a", {"value": 1})
+    before = accessed(cache, "a")
+    changes = cache._connection().total_changes
+    assert cache.get("a") == {"value": 1}
+    assert cache._connection().total_changes == changes
+    assert accessed(cache, "a") == before
+
+    cache.access_resolution = 0
+    assert cache.get("a") == {"value": 1}
+    assert accessed(cache, "a") > before
+
+def test_sizes_are_in_bytes(tmp_path):
+    cache = SqliteCache(str(tmp_path / "cache.db"), max_item_bytes=10)
+    cache.set("a", "é")
+    assert cache.total_size() == len('"\\u00e9"')
+    cache.set("b", "abcdefghij")
+    assert cache.get("b") is None
+
+def test_clear_rolls_back_on_error(tmp_path):
+    cache = SqliteCache(str(tmp_path / "cache.db"))
+    cache.set("a", 1)
+    conn = cache._connection()
+    conn.execute("CREATE TRIGGER fail BEFORE DELETE ON cache BEGIN SELECT RAISE(ABORT, 'fail'); END")
+    with pytest.raises(sqlite3.IntegrityError):
+        cache.clear()
+    assert not conn.in_transaction
+    conn.execute("DROP TRIGGER fail")
+    cache.clear()
+    assert len(cache) == 0 and cache.total_size() == 0
+
+def test_close_closes_the_connections_of_every_thread(tmp_path):
+    cache = SqliteCache(str(tmp_path / "cache.db"))
+    cache.set("a", 1)
+    thread = threading.Thread(target=cache.get, args=("a",))
+    thread.start()
+    thread.join()
+    connections = list(cache._connections)
+    assert len(connections) == 2
+    cache.close()
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    assert cache.get("a") == 1
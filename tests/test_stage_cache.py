@@ -0,0 +1,75 @@
+from aimmx.aimmx import stage_salt
+from aimmx.reference_detector import arxiv_reader, reference_detector
+from aimmx.util.stage_cache import StageCache
+
+class DictStore(dict):
+    def set(self, key, value):
+        self[key] = value
+
+def extract(store, salt, calls):
+    stage_run = StageCache(store, salt=salt).begin("https://github.com/org/repo")
+    def stage(sha):
+        calls.append(sha)
+        return {"sha": sha}
+    output = stage_run.run("readme", ["abc"], stage, "abc")
+    stage_run.save()
+    return output
+
+def test_outputs_are_reused_until_the_salt_changes():
+    store = DictStore()
+    calls = []
+    assert extract(store, lambda stage: [stage, 1], calls) == {"sha": "abc"}
+    assert extract(store, lambda stage: [stage, 1], calls) == {"sha": "abc"}
+    assert calls == ["abc"]
+    assert extract(store, lambda stage: [stage, 2], calls) == {"sha": "abc"}
+    assert calls == ["abc", "abc"]
+
+def test_salt_covers_the_models_and_frameworks():
+    assert len(stage_salt("domain")) == 2
+    assert len(stage_salt("frameworks")) == 2
+    assert stage_salt("readme") == stage_salt("readme")
+
+def test_salt_covers_the_dataset_list(monkeypatch):
+    import aimmx.aimmx
+    salt = stage_salt("readme")
+    monkeypatch.setattr(aimmx.aimmx, "dataset_list_fingerprint", lambda: "other")
+    for stage in ["readme", "folder_readme", "docstring"]:
+        assert stage_salt(stage) != salt
+
+def parse_references(store, readme, calls, **kwargs):
+    stage_run = StageCache(store).begin("https://github.com/org/repo")
+    def stage():
+        calls.append(readme)
+        return reference_detector.detect_references(readme, **kwargs)
+    output = stage_run.run("readme", ["abc"], stage)
+    stage_run.save()
+    return output, stage_run
+
+def test_arxiv_ids_not_found_are_not_stored(monkeypatch):
+    monkeypatch.setattr(arxiv_reader, "_memory_records", arxiv_reader.collections.OrderedDict())
+    monkeypatch.setattr(arxiv_reader, "get_arxiv_cache", lambda: None)
+    monkeypatch.setattr(arxiv_reader, "search_arxiv_id", lambda id: None)
+    store = DictStore()
+    calls = []
+    readme = "See https://arxiv.org/abs/1506.02025 for details.\n"
+    output, stage_run = parse_references(store, readme, calls)
+    assert output == {} and stage_run.incomplete == {"readme": ["arxiv:1506.02025"]}
+    # the id is still not found, from the not found record in memory, and looked up again later
+    parse_references(store, readme, calls)
+    assert len(calls) == 2
+    monkeypatch.setattr(arxiv_reader, "search_arxiv_id", lambda id: {"title": "STN", "arxiv": id})
+    monkeypatch.setattr(arxiv_reader, "_memory_records", arxiv_reader.collections.OrderedDict())
+    output, stage_run = parse_references(store, readme, calls)
+    assert output["references"][0]["title"] == "STN" and stage_run.incomplete == {}
+    assert parse_references(store, readme, calls)[0] == output
+    assert len(calls) == 3
+
+def test_truncated_references_are_not_stored(monkeypatch):
+    clock = iter(range(0, 1000, 10))
+    monkeypatch.setattr(reference_detector.time, "perf_counter", lambda: next(clock))
+    store = DictStore()
+    calls = []
+    readme = "[1] Jaderberg, Max, et al. [\"STN\"](https://example.org/stn) arXiv preprint arXiv:1506.02025 (2015)\n"
+    output, stage_run = parse_references(store, readme, calls, time_budget=1)
+    assert output == {"references_truncated": True}
+    assert "readme" in stage_run.incomplete and store == {}
@@ -0,0 +1,83 @@
+import logging
+import time
+
+import requests
+
+from aimmx.util import token_pool
+from aimmx.util.token_pool import TokenPool, TokenPoolAuth
+
+def make_response(request, status_code=200, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = b"{}"
+    response.request = request
+    return response
+
+def budget(remaining, reset=0):
+    return {"X-RateLimit-Remaining": str(remaining), "X-RateLimit-Reset": str(reset)}
+
+def test_token_with_most_budget_is_used():
+    pool = TokenPool(["a", "b", "c"])
+    request = requests.Request("GET", "https://api.github.com/").prepare()
+    pool.update("a", make_response(request, headers=budget(10)))
+    pool.update("b", make_response(request, headers=budget(300)))
+    pool.update("c", make_response(request, headers=budget(20)))
+    # other resources have budgets of their own
+    pool.update("a", make_response(request, headers=dict(budget(5000), **{"X-RateLimit-Resource": "search"})))
+    assert pool.acquire() == "b"
+    assert pool.remaining() == {"a": 10, "b": 299, "c": 20}
+
+def test_waits_for_a_reset_when_every_token_is_exhausted(caplog, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(token_pool.time, "time", lambda: now[0])
+    sleeps = []
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+    pool = TokenPool(["a", "b"], sleep=sleep)
+    pool.exhaust("a", 1100)
+    pool.exhaust("b", 1030)
+    with caplog.at_level(logging.WARNING, logger=token_pool.__name__):
+        assert pool.acquire() == "b"
+    assert sleeps == [31.0]
+    assert [r.getMessage() for r in caplog.records] == ["All GitHub tokens are rate limited, waiting 31 seconds"]
+
+class FakeAdapter:
+    """ Answers with the given (status, headers), records the tokens used. """
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.tokens = []
+
+    def send(self, request, **kwargs):
+        self.tokens.append(request.headers["Authorization"])
+        status_code, headers = self.answers.pop(0)
+        response = make_response(request, status_code, headers)
+        response.connection = self
+        return response
+
+def send(auth, adapter):
+    request = auth(requests.Request("GET", "https://api.github.com/repos/org/repo").prepare())
+    response = adapter.send(request)
+    return request.hooks["response"][0](response)
+
+def test_rate_limited_requests_are_retried_with_another_token():
+    pool = TokenPool(["a", "b", "c"])
+    pool.update("a", make_response(None, headers=budget(50)))
+    pool.update("b", make_response(None, headers=budget(100)))
+    pool.update("c", make_response(None, headers=budget(10)))
+    reset = int(time.time()) + 3600
+    adapter = FakeAdapter([(403, budget(0, reset)), (429, {"Retry-After": "60"}), (200, budget(9))])
+    response = send(TokenPoolAuth(pool), adapter)
+    assert response.status_code == 200
+    assert adapter.tokens == ["token b", "token a", "token c"]
+    assert [r.status_code for r in response.history] == [403, 429]
+    assert pool.remaining() == {"a": 0, "b": 0, "c": 9}
+
+def test_retries_are_bounded():
+    pool = TokenPool(["a", "b"])
+    adapter = FakeAdapter([(429, {"Retry-After": "0"})] * 3)
+    response = send(TokenPoolAuth(pool, max_retries=2), adapter)
+    assert response.status_code == 429
+    assert len(adapter.tokens) == 3